@@ -1,4 +1,6 @@
 import uuid
+from datetime import date
+
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
@@ -45,6 +47,7 @@ class CashFlowItem(OrgObject):
         AccountingBucketHiCat,
         on_delete=models.PROTECT
     )
+    date = models.DateField(default=date.today)
     amount = models.FloatField(blank=True, null=True)
     currency = models.CharField(
         max_length=3,
@@ -52,3 +55,64 @@ class CashFlowItem(OrgObject):
         default=settings.DEFAULT_CURRENCY
     )
     history = HistoricalRecords()
+
+class PeriodBalance(OrgObject):
+    """
+    Monthly CashFlowItem totals maintained incrementally by accounting.rollups.
+    Do not write directly - use rollups.rebuild_period_balances to repair.
+    """
+
+    class Meta:
+        verbose_name = "Period Balance"
+        verbose_name_plural = "Period Balances"
+        unique_together = [(
+            'organization',
+            'accounting_bucket',
+            'accounting_activity',
+            'period',
+            'currency',
+        )]
+        indexes = [
+            models.Index(
+                fields=['organization', 'period'],
+                name='period_balance_org_period_idx'
+            ),
+        ]
+
+    accounting_activity = models.ForeignKey(
+        AccountingActivityHiCat,
+        on_delete=models.PROTECT,
+        related_name='+'
+    )
+    accounting_bucket = models.ForeignKey(
+        AccountingBucketHiCat,
+        on_delete=models.PROTECT,
+        related_name='+'
+    )
+    period = models.DateField(help_text='First day of the month')
+    currency = models.CharField(
+        max_length=3,
+        choices=get_currencies,
+        default=settings.DEFAULT_CURRENCY
+    )
+    amount = models.FloatField(default=0)
+    item_count = models.IntegerField(default=0)
+
+# ==============================================================================
+# Signals
+# ==============================================================================
+
+import accounting.rollups # registers CashFlowItem receivers
+from core.cache import register_group
+from core.partitioning import by_time, register_partitioning
+
+register_group(
+    'categories',
+    AccountingActivityHiCat,
+    AccountingProductHiCat,
+    AccountingBucketHiCat,
+)
+
+# One partition per season, old seasons are detached (see core.partitioning)
+register_partitioning(CashFlowItem, by_time('date'))
+register_partitioning(CashFlowItem.history.model, by_time('history_date'))
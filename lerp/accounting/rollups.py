@@ -0,0 +1,242 @@
+"""
+# Period Balances
+PeriodBalance holds one row per organization x bucket x activity x month x
+currency. Single-row CashFlowItem writes update it through the signal receivers
+below. bulk_create/bulk_update/QuerySet.update() skip signals, so bulk writers
+must call `apply_cash_flow_items` in the same transaction.
+
+Statements over bucket subtrees are answered from PeriodBalance using the MPTT
+(tree_id, lft, rght) ranges, so cost depends on buckets x months, not on the
+number of transactions.
+"""
+
+from collections import defaultdict
+from datetime import date
+
+from django.db import connections, router, transaction, IntegrityError
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from accounting.models import AccountingBucketHiCat, CashFlowItem, PeriodBalance
+from mysite.routers import replica_reads
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def next_month_start(day: date) -> date:
+    if day.month == 12:
+        return date(day.year + 1, 1, 1)
+    return date(day.year, day.month + 1, 1)
+
+def balance_key(item) -> tuple:
+    return (
+        item.organization_id,
+        item.accounting_bucket_id,
+        item.accounting_activity_id,
+        month_start(item.date),
+        item.currency,
+    )
+
+# ==============================================================================
+# Incremental Maintenance
+# ==============================================================================
+
+def apply_deltas(deltas: dict, using: str = 'default'):
+    """
+    `deltas` maps balance_key -> (amount, item_count). Keys are applied in
+    sorted order so concurrent writers lock PeriodBalance rows consistently.
+    """
+    with transaction.atomic(using=using):
+        for key in sorted(deltas, key=str):
+            amount, item_count = deltas[key]
+            if not amount and not item_count:
+                continue
+
+            org_id, bucket_id, activity_id, period, currency = key
+            lookup = dict(
+                organization_id=org_id,
+                accounting_bucket_id=bucket_id,
+                accounting_activity_id=activity_id,
+                period=period,
+                currency=currency,
+            )
+            balances = PeriodBalance.objects.using(using).filter(**lookup)
+            updated = balances.update(
+                amount=F('amount') + amount,
+                item_count=F('item_count') + item_count,
+            )
+            if updated:
+                continue
+
+            try:
+                with transaction.atomic(using=using):
+                    PeriodBalance.objects.using(using).create(
+                        amount=amount,
+                        item_count=item_count,
+                        **lookup
+                    )
+            except IntegrityError:
+                # Another writer created the row first
+                balances.update(
+                    amount=F('amount') + amount,
+                    item_count=F('item_count') + item_count,
+                )
+
+def apply_cash_flow_items(items, sign: int = 1, using: str = 'default'):
+    """ Adds (sign=1) or removes (sign=-1) bulk written CashFlowItems """
+    deltas = defaultdict(lambda: (0, 0))
+    for item in items:
+        amount, item_count = deltas[balance_key(item)]
+        deltas[balance_key(item)] = (
+            amount + sign * (item.amount or 0),
+            item_count + sign,
+        )
+
+    apply_deltas(deltas, using=using)
+
+@receiver(pre_save, sender=CashFlowItem, dispatch_uid='rollups_pre_save')
+def remember_previous_item(sender, instance, raw=False, using=None, **kwargs):
+    instance._rollup_previous = None
+    if raw or instance._state.adding:
+        return
+
+    instance._rollup_previous = (
+        CashFlowItem.objects.using(using).filter(pk=instance.pk).first()
+    )
+
+@receiver(post_save, sender=CashFlowItem, dispatch_uid='rollups_post_save')
+def add_saved_item(sender, instance, raw=False, using=None, **kwargs):
+    if raw:
+        return
+
+    deltas = defaultdict(lambda: (0, 0))
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous is not None:
+        deltas[balance_key(previous)] = (-(previous.amount or 0), -1)
+
+    amount, item_count = deltas[balance_key(instance)]
+    deltas[balance_key(instance)] = (
+        amount + (instance.amount or 0),
+        item_count + 1
+    )
+    apply_deltas(deltas, using=using)
+    instance._rollup_previous = None
+
+@receiver(post_delete, sender=CashFlowItem, dispatch_uid='rollups_post_delete')
+def remove_deleted_item(sender, instance, using=None, **kwargs):
+    apply_cash_flow_items([instance], sign=-1, using=using)
+
+# ==============================================================================
+# Rebuild
+# ==============================================================================
+
+def rebuild_period_balances(organization, start=None, end=None) -> int:
+    """
+    Recomputes PeriodBalance rows for `organization` (optionally limited to
+    months in [start, end]) from CashFlowItem. Returns the number of rows.
+    Whole months are rebuilt: `start` and `end` are widened to theirs.
+    """
+    items = CashFlowItem.objects.filter(organization=organization)
+    balances = PeriodBalance.objects.filter(organization=organization)
+    if start is not None:
+        items = items.filter(date__gte=month_start(start))
+        balances = balances.filter(period__gte=month_start(start))
+    if end is not None:
+        items = items.filter(date__lt=next_month_start(end))
+        balances = balances.filter(period__lte=month_start(end))
+
+    totals = (
+        items
+        .annotate(period=TruncMonth('date'))
+        .values(
+            'accounting_bucket_id',
+            'accounting_activity_id',
+            'period',
+            'currency',
+        )
+        .annotate(total=Sum('amount'), n=Count('pk'))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        balances.delete()
+        rows = PeriodBalance.objects.bulk_create(
+            [
+                PeriodBalance(
+                    organization=organization,
+                    accounting_bucket_id=row['accounting_bucket_id'],
+                    accounting_activity_id=row['accounting_activity_id'],
+                    period=row['period'],
+                    currency=row['currency'],
+                    amount=row['total'] or 0,
+                    item_count=row['n'],
+                )
+                for row in totals.iterator()
+            ],
+            batch_size=1000,
+        )
+
+    return len(rows)
+
+# ==============================================================================
+# Statements
+# ==============================================================================
+
+@replica_reads
+def bucket_totals(organization, bucket, start, end, activity=None):
+    """
+    Monthly totals for `bucket` and all its descendants:
+    [{'period', 'currency', 'total', 'total_count'}, ...]
+    """
+    balances = PeriodBalance.objects.filter(
+        organization=organization,
+        period__gte=month_start(start),
+        period__lte=end,
+        accounting_bucket__tree_id=bucket.tree_id,
+        accounting_bucket__lft__gte=bucket.lft,
+        accounting_bucket__rght__lte=bucket.rght,
+    )
+    if activity is not None:
+        balances = balances.filter(
+            accounting_activity__tree_id=activity.tree_id,
+            accounting_activity__lft__gte=activity.lft,
+            accounting_activity__rght__lte=activity.rght,
+        )
+
+    return list(
+        balances
+        .values('period', 'currency')
+        .annotate(total=Sum('amount'), total_count=Sum('item_count'))
+        .order_by('period', 'currency')
+    )
+
+@replica_reads
+def subtree_totals(organization, start, end) -> list[tuple]:
+    """
+    Monthly totals for every bucket of `organization`, each including its
+    descendants, in one query:
+    [(bucket_id, period, currency, amount, item_count), ...]
+    """
+    bucket_table = AccountingBucketHiCat._meta.db_table
+    balance_table = PeriodBalance._meta.db_table
+    org_column = PeriodBalance._meta.get_field('organization').column
+    bucket_column = PeriodBalance._meta.get_field('accounting_bucket').column
+    sql = f'''
+        SELECT ancestor.id, b.period, b.currency, SUM(b.amount), SUM(b.item_count)
+        FROM {balance_table} AS b
+        JOIN {bucket_table} AS node ON node.id = b.{bucket_column}
+        JOIN {bucket_table} AS ancestor
+            ON ancestor.tree_id = node.tree_id
+            AND ancestor.lft <= node.lft
+            AND ancestor.rght >= node.rght
+        WHERE b.{org_column} = %s AND b.period >= %s AND b.period <= %s
+        GROUP BY ancestor.id, b.period, b.currency
+        ORDER BY ancestor.id, b.period, b.currency
+    '''
+    using = router.db_for_read(PeriodBalance)
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [organization.pk, month_start(start), end])
+        return cursor.fetchall()
@@ -0,0 +1,18 @@
+"""
+Background job handlers (see jobs.queue).
+"""
+
+from datetime import date
+
+from jobs.queue import register
+from accounting.rollups import rebuild_period_balances
+
+
+@register('accounting.rebuild_period_balances')
+def rebuild_period_balances_job(job, start: str = None, end: str = None):
+    rows = rebuild_period_balances(
+        job.organization,
+        start=date.fromisoformat(start) if start else None,
+        end=date.fromisoformat(end) if end else None,
+    )
+    return {'rows': rows}
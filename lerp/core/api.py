@@ -0,0 +1,204 @@
+"""
+# Async Read API Helpers
+Shared by the `<app>.api` modules. Views are `async def` so that, served
+through mysite.asgi, one worker interleaves many concurrent reads while each
+waits on PostGIS. Rows are fetched with `.values()` to skip model instantiation
+and paginated by primary key (keyset) so deep pages stay cheap.
+
+Invalid query parameters raise BadRequest, answered with a 400 by `api_view`.
+
+`conditional` adds strong ETags built from core.cache data versions, so an
+unchanged resource costs one cache lookup and a 304.
+"""
+
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import BadRequest, FieldDoesNotExist, ValidationError
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.http import parse_etags
+
+from core.cache import container_group, data_versions
+
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+def api_view(view=None, *, methods=('GET',)):
+    """
+    Requires an authenticated user and a selected organization.
+    `@api_view` or `@api_view(methods=('GET', 'POST'))`
+    """
+    if view is None:
+        return lambda view: api_view(view, methods=methods)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in methods:
+            return JsonResponse({'detail': 'Method not allowed'}, status=405)
+
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({'detail': 'Not authenticated'}, status=401)
+        if getattr(request, 'organization_id', None) is None:
+            return JsonResponse({'detail': 'No organization selected'}, status=400)
+
+        try:
+            return await view(request, *args, **kwargs)
+        except BadRequest as e:
+            return JsonResponse({'detail': str(e)}, status=400)
+
+    return wrapper
+
+def page_size(request) -> int:
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        limit = DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def lookup_field(model, lookup: str):
+    """ Field a lookup like `field__ranch_id` or `date__gte` ends on """
+    field = None
+    for part in lookup.split('__'):
+        if model is None:
+            break
+        try:
+            field = (
+                model._meta.pk if part == 'pk'
+                else model._meta.get_field(part)
+            )
+        except FieldDoesNotExist:
+            break # a transform/lookup such as `gte`
+        model = field.related_model
+    return field
+
+def param_value(request, param: str, field):
+    """ `?param=` converted by the model field, BadRequest if it can't be """
+    try:
+        return field.to_python(request.GET[param])
+    except (ValidationError, ValueError, TypeError):
+        raise BadRequest(f'Invalid value for {param}: {request.GET[param]!r}')
+
+async def paginated(request, queryset, fields) -> JsonResponse:
+    """ Keyset page of `queryset.values(*fields)` ordered by pk """
+    limit = page_size(request)
+    if request.GET.get('after'):
+        after = param_value(request, 'after', queryset.model._meta.pk)
+        queryset = queryset.filter(pk__gt=after)
+
+    rows = [
+        row async for row in
+        queryset.order_by('pk').values('pk', *fields)[:limit]
+    ]
+    return JsonResponse({
+        'results': rows,
+        'next': rows[-1]['pk'] if len(rows) == limit else None,
+    })
+
+def paginated_rows(request, rows, pk_field) -> JsonResponse:
+    """
+    `paginated` over rows that are already fetched (e.g. cached by a
+    selector), so clients page through both alike
+    """
+    limit = page_size(request)
+    rows = sorted(rows, key=lambda row: row['pk'])
+    if request.GET.get('after'):
+        after = param_value(request, 'after', pk_field)
+        rows = [row for row in rows if row['pk'] > after]
+
+    rows = rows[:limit]
+    return JsonResponse({
+        'results': rows,
+        'next': rows[-1]['pk'] if len(rows) == limit else None,
+    })
+
+def filter_params(request, queryset, allowed: dict):
+    """
+    Applies `?param=value` filters whitelisted as {param: lookup}. Values are
+    converted by the model field the lookup ends on.
+    """
+    filters = {
+        lookup: param_value(
+            request,
+            param,
+            lookup_field(queryset.model, lookup),
+        )
+        for param, lookup in allowed.items()
+        if param in request.GET
+    }
+    return queryset.filter(**filters)
+
+async def run_sync(func, *args, **kwargs):
+    """ For cache/permission helpers that are sync-only """
+    return await sync_to_async(func)(*args, **kwargs)
+
+async def stream_sync(chunks):
+    """
+    Async iterator over a sync one (e.g. rows from a server-side cursor),
+    advanced on the sync thread so every chunk uses the same connection.
+    """
+    chunks = iter(chunks)
+    done = object()
+    while (chunk := await run_sync(next, chunks, done)) is not done:
+        yield chunk
+
+# ==============================================================================
+# Conditional GET
+# ==============================================================================
+
+def conditional(*groups, container=None, per_user=False):
+    """
+    Answers `If-None-Match` before the view runs any query. The ETag covers
+    the organization, full path (query string included) and the data versions
+    of `groups`. `container=(group, param)` swaps `group` for the version of
+    the container given by the `param` URL kwarg or `?param=` (see
+    core.cache.register_containers).
+    Set `per_user` when results depend on the user's permissions. Use below
+    `api_view`.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            user_id = (await request.auser()).pk if per_user else None
+            versioned = list(groups)
+            if container is not None:
+                group, param = container
+                container_id = kwargs.get(param) or request.GET.get(param)
+                if container_id:
+                    versioned[versioned.index(group)] = container_group(
+                        group,
+                        container_id,
+                    )
+
+            etag = await run_sync(request_etag, request, versioned, user_id)
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                response = HttpResponseNotModified()
+            else:
+                response = await view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+
+        return wrapper
+
+    return decorator
+
+def request_etag(request, groups, user_id=None) -> str:
+    parts = [
+        str(request.organization_id),
+        request.get_full_path(),
+        *(str(version) for version in data_versions(
+            request.organization_id,
+            groups,
+        )),
+    ]
+    if user_id is not None:
+        parts.append(str(user_id))
+
+    digest = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+    return f'"{digest}"'
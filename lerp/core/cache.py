@@ -0,0 +1,205 @@
+"""
+# Versioned Organization Cache
+Cached reads are keyed by organization and by the data version of every model
+group they depend on. Writes never delete keys: a post_save/post_delete of a
+registered model bumps its group's version for that organization (O(1)) and
+old entries simply stop being read and expire.
+
+    register_group('sites', Ranch, Field)
+    cached(org_id, ('sites',), 'ranch_list', lambda: list(...))
+
+Models shared between organizations (no organization_id, e.g. TractorModel)
+may join a group too: their writes bump the group's shared version, which
+every organization's reads of that group include.
+
+Groups can also be versioned per container (e.g. per RanchPlan) with
+`register_containers`: a write bumps both the group and the `<group>:<id>`
+version of its container, so reads of one container (and their ETags, see
+core.api.conditional) survive writes to the others.
+
+Versions are seeded from the clock so an evicted counter never resurrects old
+entries. Bumps run on commit so a concurrent reader cannot cache pre-commit
+data under the new version. QuerySet.update()/bulk writes and MPTT tree moves
+skip signals - call `bump_version` after them.
+
+Versions only invalidate across workers when the cache is shared and `incr`
+is atomic (Redis, memcached). Permissions and ETags depend on it, so a system
+check rejects any other backend unless DEBUG is on.
+"""
+
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+
+
+KEY_PREFIX = 'orgcache'
+DEFAULT_TIMEOUT = 60 * 60
+
+GROUPS = {} # group -> set of models
+SHARED_GROUPS = set() # groups with models shared between organizations
+CONTAINERS = {} # group -> {model: instance -> container id}
+
+def container_group(group: str, container_id) -> str:
+    return f'{group}:{container_id}'
+
+def version_key(organization_id, group: str) -> str:
+    return f'{KEY_PREFIX}:version:{group}:{organization_id}'
+
+def shared_version_key(group: str) -> str:
+    return f'{KEY_PREFIX}:version:{group}:shared'
+
+def key_version(key: str) -> int:
+    cache.add(key, time.time_ns(), timeout=None)
+    return cache.get(key)
+
+def data_version(organization_id, group: str) -> int:
+    return key_version(version_key(organization_id, group))
+
+def data_versions(organization_id, groups) -> tuple:
+    keys = [version_key(organization_id, group) for group in groups]
+    keys += [
+        shared_version_key(group) for group in groups if group in SHARED_GROUPS
+    ]
+    versions = cache.get_many(keys)
+    return tuple(versions.get(key) or key_version(key) for key in keys)
+
+def bump_key(key: str):
+    try:
+        cache.incr(key)
+    except ValueError:
+        key_version(key)
+
+def bump_version(organization_id, group: str):
+    bump_key(version_key(organization_id, group))
+
+def bump_shared_version(group: str):
+    """ Invalidates `group` for every organization """
+    bump_key(shared_version_key(group))
+
+SHARED_BACKENDS = {
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+}
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """ A per-process or non-atomic cache keeps revoked permissions alive """
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.DEBUG or backend in SHARED_BACKENDS:
+        return []
+    return [checks.Error(
+        f'The default cache ({backend}) is not shared across workers or has '
+        f'no atomic incr, so cache versions (permissions, ETags) go stale.',
+        hint='Set CACHE_BACKEND=redis or memcached (and CACHE_LOCATION).',
+        id='core.E001',
+    )]
+
+def cached(
+    organization_id,
+    groups,
+    key: str,
+    builder,
+    timeout: int = DEFAULT_TIMEOUT,
+):
+    """ Returns builder() cached under the current versions of `groups` """
+    versions = '.'.join(str(v) for v in data_versions(organization_id, groups))
+    cache_key = f'{KEY_PREFIX}:{organization_id}:{key}:{versions}'
+    value = cache.get(cache_key)
+    if value is None:
+        value = builder()
+        cache.set(cache_key, value, timeout=timeout)
+
+    return value
+
+# ==============================================================================
+# Invalidation
+# ==============================================================================
+
+def is_shared(model) -> bool:
+    return not any(
+        field.attname == 'organization_id'
+        for field in model._meta.concrete_fields
+    )
+
+def bump_for_instance(sender, instance, **kwargs):
+    if is_shared(sender):
+        for group, models in GROUPS.items():
+            if sender in models:
+                transaction.on_commit(
+                    lambda group=group: bump_shared_version(group)
+                )
+        return
+
+    organization_id = instance.organization_id
+
+    for group, models in GROUPS.items():
+        if sender in models:
+            transaction.on_commit(
+                lambda group=group: bump_version(organization_id, group)
+            )
+
+        resolver = CONTAINERS.get(group, {}).get(sender)
+        if resolver is not None:
+            container_ids = {resolver(instance)}
+            previous = getattr(instance, '_cache_previous_containers', {})
+            if group in previous:
+                container_ids.add(previous[group])
+            for container_id in container_ids:
+                bumped = container_group(group, container_id)
+                transaction.on_commit(
+                    lambda group=bumped: bump_version(organization_id, group)
+                )
+    instance._cache_previous_containers = {}
+
+def remember_containers(sender, instance, raw=False, using=None, **kwargs):
+    """ Containers of the stored row, so moving an object bumps both """
+    if raw or instance.pk is None:
+        return
+    previous = (
+        sender._default_manager.using(using).filter(pk=instance.pk).first()
+    )
+    instance._cache_previous_containers = {} if previous is None else {
+        group: resolvers[sender](previous)
+        for group, resolvers in CONTAINERS.items()
+        if sender in resolvers
+    }
+
+def register_group(group: str, *models):
+    """
+    Models with an organization_id (OrgObject/InheritedOrgObject) bump their
+    organization's version, shared models the group's shared version
+    """
+    GROUPS.setdefault(group, set()).update(models)
+    for model in models:
+        if is_shared(model):
+            SHARED_GROUPS.add(group)
+        post_save.connect(
+            bump_for_instance,
+            sender=model,
+            dispatch_uid=f'orgcache_save_{model._meta.label}'
+        )
+        post_delete.connect(
+            bump_for_instance,
+            sender=model,
+            dispatch_uid=f'orgcache_delete_{model._meta.label}'
+        )
+
+def register_containers(group: str, resolvers: dict, movable=()):
+    """
+    {model: instance -> container id} for models already in `group`. Resolvers
+    run on every save/delete, so keep them to loaded FKs where possible.
+    Objects of `movable` models can change container: their stored row is
+    read before each save (one query) so the old container is bumped too.
+    """
+    CONTAINERS.setdefault(group, {}).update(resolvers)
+    for model in movable:
+        pre_save.connect(
+            remember_containers,
+            sender=model,
+            dispatch_uid=f'orgcache_move_{model._meta.label}'
+        )
@@ -0,0 +1,324 @@
+"""
+# Change Feed
+Pushes row-level deltas to WebSocket clients (served by mysite.asgi at
+/ws/changes/) so open plans apply small diffs instead of refetching.
+
+Apps register what to publish and who may subscribe:
+
+    register_feed(FieldActivity, 'ranch_plan', ranch_plan_of, fields=[...])
+    register_channel('ranch_plan', can_subscribe)
+
+Every save/delete of a registered model publishes
+`{'model', 'op': 'upsert'|'delete', 'pk', 'data'}` on the channel
+`<organization>:<kind>:<container id>`.
+
+With the `postgres` backend (CHANGEFEED_BACKEND) messages go through
+`pg_notify` on the writing connection. NOTIFY is transactional, so clients
+never see rolled back changes. Each ASGI process LISTENs once and fans
+messages out to its subscribers through an in-process bus. The `local`
+backend skips PostgreSQL and only reaches subscribers of the same process
+(single-process dev servers).
+
+Connections authenticate with the session cookie; handshakes from foreign
+origins are closed with 4403 before they are accepted.
+
+Bulk writes skip signals and publish nothing. A client whose queue overflows
+gets `{'op': 'resync'}` and should refetch (cheap with ETags, see core.api).
+"""
+
+import asyncio
+import json
+import logging
+from http.cookies import SimpleCookie
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models.signals import post_save, post_delete
+from django.http import HttpRequest
+from django.http.request import validate_host
+
+from core.rls import SESSION_KEY, is_member, organization_context
+
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'lerp_changes'
+MAX_PAYLOAD = 7900 # NOTIFY payloads must stay under 8000 bytes
+
+FEEDS = {} # model -> (kind, resolver, fields, organization resolver)
+CHANNEL_KINDS = {} # kind -> can_subscribe(user, organization_id, container_id)
+
+def channel_name(organization_id, kind: str, container_id='') -> str:
+    return f'{organization_id}:{kind}:{container_id}'
+
+# ==============================================================================
+# Bus
+# ==============================================================================
+
+class Subscription:
+    def __init__(self, size: int):
+        self.channels = set()
+        self.queue = asyncio.Queue(maxsize=size)
+
+    def deliver(self, message: str):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # The client fell behind: drop its backlog, tell it to refetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(json.dumps({'op': 'resync'}))
+
+class ChangeBus:
+    """ In-process fan-out. Only touched from the event loop thread """
+
+    def __init__(self):
+        self.subscribers = {} # channel -> set of Subscription
+        self.loop = None
+        self.listener = None
+
+    def subscribe(self, subscription: Subscription, channel: str):
+        subscription.channels.add(channel)
+        self.subscribers.setdefault(channel, set()).add(subscription)
+
+    def unsubscribe(self, subscription: Subscription, channel: str = None):
+        channels = [channel] if channel else list(subscription.channels)
+        for name in channels:
+            subscription.channels.discard(name)
+            subscribers = self.subscribers.get(name, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self.subscribers.pop(name, None)
+
+    def publish(self, channel: str, message: str):
+        for subscription in list(self.subscribers.get(channel, ())):
+            subscription.deliver(message)
+
+    def publish_threadsafe(self, channel: str, message: str):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.publish, channel, message)
+
+    def start(self):
+        """ Called on the first connection of the process """
+        self.loop = asyncio.get_running_loop()
+        if settings.CHANGEFEED_BACKEND == 'postgres' and self.listener is None:
+            self.listener = self.loop.create_task(listen(self))
+
+bus = ChangeBus()
+
+async def listen(bus: ChangeBus):
+    """ LISTENs on a dedicated connection, reconnecting on failure """
+    import psycopg
+
+    db = settings.DATABASES['default']
+    delay = 1
+    while True:
+        try:
+            connection = await psycopg.AsyncConnection.connect(
+                dbname=db['NAME'],
+                user=db['USER'],
+                password=db['PASSWORD'],
+                host=db['HOST'],
+                port=db['PORT'],
+                autocommit=True,
+            )
+            async with connection:
+                await connection.execute(f'LISTEN {NOTIFY_CHANNEL}')
+                delay = 1
+                async for notify in connection.notifies():
+                    channel, _, message = notify.payload.partition('\n')
+                    bus.publish(channel, message)
+        except Exception:
+            logger.exception('Change feed listener failed, reconnecting')
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+# ==============================================================================
+# Publishing
+# ==============================================================================
+
+def publish(channel: str, message: dict, using: str = 'default'):
+    payload = json.dumps(message, cls=DjangoJSONEncoder)
+    if len(payload) > MAX_PAYLOAD:
+        # Clients refetch the row when data is missing
+        payload = json.dumps({**message, 'data': None}, cls=DjangoJSONEncoder)
+
+    if settings.CHANGEFEED_BACKEND == 'postgres':
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_notify(%s, %s)',
+                [NOTIFY_CHANNEL, f'{channel}\n{payload}'],
+            )
+    else:
+        transaction.on_commit(
+            lambda: bus.publish_threadsafe(channel, payload),
+            using=using,
+        )
+
+def publish_instance(sender, instance, signal, using='default', **kwargs):
+    kind, resolver, fields, organization = FEEDS[sender]
+    deleted = signal is post_delete
+    publish(
+        channel_name(organization(instance), kind, resolver(instance)),
+        {
+            'model': sender._meta.label,
+            'op': 'delete' if deleted else 'upsert',
+            'pk': instance.pk,
+            'data': None if deleted else {
+                name: getattr(instance, name) for name in fields
+            },
+        },
+        using=using,
+    )
+
+def register_feed(
+    model,
+    kind: str,
+    resolver,
+    fields,
+    organization=lambda instance: instance.organization_id,
+):
+    """
+    Publishes saves/deletes of `model` on the `kind` channel of
+    resolver(instance), with the values of `fields` as data.
+    """
+    FEEDS[model] = (kind, resolver, fields, organization)
+    post_save.connect(
+        publish_instance,
+        sender=model,
+        dispatch_uid=f'changefeed_save_{model._meta.label}'
+    )
+    post_delete.connect(
+        publish_instance,
+        sender=model,
+        dispatch_uid=f'changefeed_delete_{model._meta.label}'
+    )
+
+def register_channel(kind: str, can_subscribe):
+    """ can_subscribe(user, organization_id, container_id) -> bool (sync) """
+    CHANNEL_KINDS[kind] = can_subscribe
+
+# ==============================================================================
+# WebSocket Endpoint
+# ==============================================================================
+
+def origin_allowed(scope) -> bool:
+    """
+    Browsers send cookies with cross-site WebSocket handshakes, so the Origin
+    must be one of ours (ALLOWED_HOSTS or CSRF_TRUSTED_ORIGINS). Clients that
+    send no Origin are not browsers and carry no ambient cookies.
+    """
+    origin = None
+    for name, value in scope.get('headers', ()):
+        if name == b'origin':
+            origin = value.decode('latin-1')
+    if origin is None:
+        return True
+    if origin in settings.CSRF_TRUSTED_ORIGINS:
+        return True
+    host = urlsplit(origin).netloc
+    return bool(host) and validate_host(host, settings.ALLOWED_HOSTS)
+
+def session_user(scope):
+    """
+    (user, organization_id) from the session cookie, or (None, None). The user
+    is loaded like django.contrib.auth.get_user, so sessions end with a
+    password change (session auth hash) or deactivation.
+    """
+    cookies = SimpleCookie()
+    for name, value in scope.get('headers', ()):
+        if name == b'cookie':
+            cookies.load(value.decode('latin-1'))
+    if settings.SESSION_COOKIE_NAME not in cookies:
+        return None, None
+
+    engine = import_module(settings.SESSION_ENGINE)
+    request = HttpRequest()
+    request.session = engine.SessionStore(
+        cookies[settings.SESSION_COOKIE_NAME].value
+    )
+    organization_id = request.session.get(SESSION_KEY)
+    user = get_user(request)
+    if not user.is_authenticated or organization_id is None:
+        return None, None
+    if not is_member(user, organization_id):
+        return None, None
+    return user, organization_id
+
+def authorize(user, organization_id, kind: str, container_id) -> bool:
+    if kind not in CHANNEL_KINDS:
+        return False
+    with organization_context(organization_id):
+        return CHANNEL_KINDS[kind](user, organization_id, container_id)
+
+async def changefeed_app(scope, receive, send):
+    """
+    Client messages: {"subscribe": "<kind>", "id": <container id>} and
+    {"unsubscribe": ...}. Server messages are deltas, or acks
+    {"subscribed": ..., "id": ..., "ok": bool}.
+    """
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    if not origin_allowed(scope):
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+
+    user, organization_id = await sync_to_async(session_user)(scope)
+    if user is None:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+
+    await send({'type': 'websocket.accept'})
+    bus.start()
+    subscription = Subscription(settings.CHANGEFEED_QUEUE_SIZE)
+
+    async def client_messages():
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                return
+            try:
+                request = json.loads(message.get('text') or '{}')
+                kind = request.get('subscribe') or request.get('unsubscribe')
+                container_id = request.get('id', '')
+            except (ValueError, AttributeError):
+                continue
+
+            channel = channel_name(organization_id, kind, container_id)
+            if 'unsubscribe' in request:
+                bus.unsubscribe(subscription, channel)
+                continue
+
+            ok = await sync_to_async(authorize)(
+                user, organization_id, kind, container_id
+            )
+            if ok:
+                bus.subscribe(subscription, channel)
+            await send({'type': 'websocket.send', 'text': json.dumps({
+                'subscribed': kind,
+                'id': container_id,
+                'ok': ok,
+            })})
+
+    async def deltas():
+        while True:
+            text = await subscription.queue.get()
+            await send({'type': 'websocket.send', 'text': text})
+
+    tasks = [
+        asyncio.create_task(client_messages()),
+        asyncio.create_task(deltas()),
+    ]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        bus.unsubscribe(subscription)
@@ -0,0 +1,142 @@
+"""
+# History Helpers
+QuerySet.update() and bulk_create()/bulk_update() skip simple-history's
+post_save hooks. Bulk writes to historical models must go through the helpers
+below so that each batch writes its history rows in one statement as well.
+
+Compaction collapses every history row older than a cutoff into the last row per
+object per period (day/week/month). HistoricalRecords.as_of() stays exact at
+period boundaries and resolves to the end-of-period state in between. The rows
+to delete are ranked once into a temporary table, then deleted in batches
+walking its history_id index.
+"""
+
+from datetime import date, datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber, Trunc
+from django.utils import timezone
+
+from simple_history.models import registered_models
+from simple_history.utils import (
+    bulk_create_with_history,
+    bulk_update_with_history,
+)
+
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# ==============================================================================
+# Bulk Writes
+# ==============================================================================
+
+def update_with_history(queryset, batch_size=500, **values) -> int:
+    """ QuerySet.update() replacement that also writes history rows in bulk """
+    model = queryset.model
+    objs = list(queryset)
+    for obj in objs:
+        for field_name, value in values.items():
+            setattr(obj, field_name, value)
+
+    if objs:
+        bulk_update_with_history(
+            objs,
+            model,
+            fields=list(values),
+            batch_size=batch_size,
+        )
+
+    return len(objs)
+
+# ==============================================================================
+# Compaction
+# ==============================================================================
+
+def historical_models() -> list:
+    """ Returns the tracked (live) models registered with simple-history """
+    return [
+        model for model in registered_models.values()
+        if not model._meta.abstract
+    ]
+
+def period_start(day: date, granularity: str = 'day') -> date:
+    """ Rounds `day` down to the first day of its period """
+    if granularity not in GRANULARITIES:
+        raise ValueError(
+            f'Got an invalid granularity: {granularity}. '
+            f'Must be one of {", ".join(GRANULARITIES)}'
+        )
+
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+def compact_history(
+    model,
+    before: date,
+    granularity: str = 'day',
+    batch_size: int = 5000,
+    dry_run: bool = False,
+) -> int:
+    """
+    Deletes all but the last history row per object per period for rows older
+    than `before` (rounded down to a period boundary so that no period is split).
+    Returns the number of rows deleted (or that would be deleted if `dry_run`).
+    """
+    history_model = model.history.model
+    pk_name = model._meta.pk.attname
+    cutoff = timezone.make_aware(
+        datetime.combine(period_start(before, granularity), time.min)
+    )
+
+    # Every row but the last per object per period
+    stale = (
+        history_model.objects
+        .filter(history_date__lt=cutoff)
+        .annotate(rank=Window(
+            RowNumber(),
+            partition_by=[F(pk_name), Trunc('history_date', granularity)],
+            order_by=F('history_id').desc(),
+        ))
+        .filter(rank__gt=1)
+        .values('history_id')
+    )
+
+    if dry_run:
+        return stale.count()
+
+    sql, params = stale.query.sql_with_params()
+    table = connection.ops.quote_name(
+        f'compact_{history_model._meta.db_table}'
+    )
+    deleted = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {table}')
+        cursor.execute(f'CREATE TEMPORARY TABLE {table} AS {sql}', params)
+        cursor.execute(f'CREATE INDEX ON {table} (history_id)')
+        try:
+            last = None
+            while True:
+                # Bounded batches keep each transaction (and its locks) short
+                with transaction.atomic():
+                    cursor.execute(
+                        f'SELECT history_id FROM {table} '
+                        + ('' if last is None else 'WHERE history_id > %s ')
+                        + 'ORDER BY history_id LIMIT %s',
+                        ([] if last is None else [last]) + [batch_size],
+                    )
+                    batch = [history_id for history_id, in cursor.fetchall()]
+                    if not batch:
+                        break
+                    last = batch[-1]
+                    count, _ = history_model.objects.filter(
+                        history_id__in=batch
+                    ).delete()
+                    deleted += count
+        finally:
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+
+    return deleted
@@ -0,0 +1,67 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from statistics import quantiles
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures read throughput of a running server. Run it against the '
+        'ASGI (e.g. uvicorn mysite.asgi) and WSGI (e.g. gunicorn '
+        'mysite.wsgi) deployments with the same worker count to compare them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', help='e.g. http://127.0.0.1:8000')
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help='Endpoint to hit (repeatable)',
+        )
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument(
+            '--session',
+            help='sessionid cookie of a logged-in user with an organization',
+        )
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or [
+            '/api/farmplanning/ranch-plans/',
+            '/api/farmplanning/field-plans/',
+            '/api/realestate/fields/',
+            '/api/resources/product-inventory/',
+        ]
+        headers = {}
+        if options['session']:
+            headers['Cookie'] = f'sessionid={options["session"]}'
+
+        def fetch(i):
+            url = options['base_url'].rstrip('/') + paths[i % len(paths)]
+            start = time.perf_counter()
+            try:
+                with urlopen(Request(url, headers=headers)) as response:
+                    response.read()
+                    status = response.status
+            except HTTPError as e:
+                status = e.code
+            return status, time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(fetch, range(options['requests'])))
+        elapsed = time.perf_counter() - start
+
+        latencies = [latency for _, latency in results]
+        errors = sum(1 for status, _ in results if status >= 400)
+        percentiles = quantiles(latencies, n=100)
+        self.stdout.write(
+            f'{len(results)} requests in {elapsed:.2f}s '
+            f'({len(results) / elapsed:.1f} req/s), {errors} errors\n'
+            f'p50 {percentiles[49] * 1000:.1f} ms, '
+            f'p95 {percentiles[94] * 1000:.1f} ms'
+        )
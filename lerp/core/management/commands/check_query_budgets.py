@@ -0,0 +1,58 @@
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+
+from core.rls import rls_bypass
+from core.testing import check_admin_budgets
+
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = (
+        'Loads every admin changelist as a throwaway superuser and fails if '
+        'any runs more than ADMIN_QUERY_BUDGET queries (N+1 regression gate '
+        'for CI). Run against a database with representative data, e.g. from '
+        'a seeded CI database. Nothing is written: everything is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-queries',
+            type=int,
+            default=settings.ADMIN_QUERY_BUDGET,
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic(), rls_bypass():
+                failures = self.check(options['max_queries'])
+                raise Rollback
+        except Rollback:
+            pass
+
+        for label, error in failures.items():
+            self.stderr.write(f'{label}: {error}')
+        if failures:
+            raise CommandError(f'{len(failures)} changelists over budget')
+        self.stdout.write('All admin changelists within budget')
+
+    def check(self, max_queries: int) -> dict:
+        user = get_user_model().objects.create_superuser(
+            username=f'budget-{uuid.uuid4().hex[:12]}',
+            email='',
+            password=None,
+        )
+        # HTTPS, or SECURE_SSL_REDIRECT answers every changelist with a 301
+        client = Client(SERVER_NAME=settings.ALLOWED_HOSTS[0], secure=True)
+        client.force_login(user)
+        return check_admin_budgets(
+            client,
+            max_queries,
+            budgets=settings.ADMIN_QUERY_BUDGETS,
+        )
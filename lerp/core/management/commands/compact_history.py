@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.history import GRANULARITIES, compact_history, historical_models
+from core.rls import rls_bypass
+
+
+class Command(BaseCommand):
+    help = (
+        'Collapses old simple-history rows to one row per object per period. '
+        'Run nightly (e.g. from cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=settings.HISTORY_COMPACTION_AFTER_DAYS,
+            help='Only compact history older than this many days',
+        )
+        parser.add_argument(
+            '--granularity',
+            choices=GRANULARITIES,
+            default=settings.HISTORY_COMPACTION_GRANULARITY,
+        )
+        parser.add_argument(
+            '--model',
+            action='append',
+            dest='models',
+            metavar='APP_LABEL.MODEL',
+            help='Limit to these models (repeatable). Defaults to all.',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['models']:
+            try:
+                models = [apps.get_model(label) for label in options['models']]
+            except (LookupError, ValueError) as e:
+                raise CommandError(e)
+        else:
+            models = historical_models()
+
+        before = timezone.localdate() - timedelta(
+            days=options['older_than_days']
+        )
+        for model in models:
+            if not hasattr(model, 'history'):
+                raise CommandError(f'{model._meta.label} has no history')
+
+            with rls_bypass():
+                deleted = compact_history(
+                    model,
+                    before=before,
+                    granularity=options['granularity'],
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run'],
+                )
+            verb = 'Would delete' if options['dry_run'] else 'Deleted'
+            self.stdout.write(
+                f'{model._meta.label}: {verb} {deleted} history rows'
+            )
@@ -0,0 +1,118 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.partitioning import (
+    PARTITIONED,
+    convert_sql,
+    detach_sql,
+    is_partitioned,
+    maintain_sql,
+    partitions,
+)
+from core.rls import rls_bypass
+
+
+class Command(BaseCommand):
+    help = (
+        'Manages partitioned tables (see core.partitioning). `convert` '
+        'partitions registered tables that are not yet, `maintain` creates '
+        'upcoming partitions (run it regularly), `detach` archives or drops '
+        'time partitions that ended before --before, `status` lists them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'action',
+            choices=['convert', 'maintain', 'detach', 'status'],
+        )
+        parser.add_argument(
+            '--model',
+            action='append',
+            help='Model label (e.g. accounting.CashFlowItem), repeatable',
+        )
+        parser.add_argument(
+            '--before',
+            type=date.fromisoformat,
+            help='detach: first date to keep (default: start of last season)',
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help='detach: drop partitions instead of archiving them',
+        )
+        parser.add_argument(
+            '--sql',
+            action='store_true',
+            help='Print the statements instead of running them',
+        )
+
+    def selected(self, labels):
+        if not labels:
+            return list(PARTITIONED.values())
+        unknown = set(labels) - set(PARTITIONED)
+        if unknown:
+            raise CommandError(
+                f'Not registered for partitioning: {", ".join(sorted(unknown))}'
+            )
+        return [PARTITIONED[label] for label in labels]
+
+    def handle(self, *args, **options):
+        action = options['action']
+        today = date.today()
+        before = options['before'] or date(today.year - 1, 1, 1)
+
+        with transaction.atomic(), rls_bypass(), connection.cursor() as cursor:
+            for model, partitioning in self.selected(options['model']):
+                table = model._meta.db_table
+                partitioned = is_partitioned(cursor, table)
+
+                if action == 'status':
+                    names = partitions(cursor, table) if partitioned else []
+                    self.stdout.write(
+                        f'{model._meta.label}: '
+                        f'{partitioning.method} ({partitioning.column}), '
+                        + (f'{len(names)} partitions' if partitioned
+                           else 'not converted')
+                    )
+                    continue
+
+                if action == 'convert':
+                    if partitioned:
+                        continue
+                    statements, dropped = convert_sql(
+                        cursor, model, partitioning, today
+                    )
+                    for referencing_table, constraint in dropped:
+                        self.stdout.write(self.style.WARNING(
+                            f'{model._meta.label}: drops {constraint} '
+                            f'on {referencing_table}'
+                        ))
+                elif not partitioned:
+                    continue
+                elif action == 'maintain':
+                    statements = maintain_sql(
+                        cursor, model, partitioning, today
+                    )
+                else:
+                    statements = detach_sql(
+                        cursor,
+                        model,
+                        partitioning,
+                        before,
+                        drop=options['drop'],
+                    )
+
+                if options['sql']:
+                    for statement in statements:
+                        self.stdout.write(f'{statement};')
+                    continue
+
+                for statement in statements:
+                    cursor.execute(statement)
+                if statements:
+                    self.stdout.write(self.style.SUCCESS(
+                        f'{model._meta.label}: {action} '
+                        f'({len(statements)} statements)'
+                    ))
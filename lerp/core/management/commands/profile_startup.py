@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Cold start of a fresh interpreter: settings, app registry and all models
+STARTUP_CODE = 'import django; django.setup()'
+
+class Command(BaseCommand):
+    help = (
+        'Profiles cold start (django.setup()) in a fresh interpreter with '
+        '`python -X importtime` and reports import time per app and module. '
+        'With --check, fails when startup exceeds STARTUP_BUDGET_MS (for CI).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25)
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs to take the fastest of (reduces noise)',
+        )
+        parser.add_argument('--check', action='store_true')
+        parser.add_argument(
+            '--budget-ms',
+            type=int,
+            default=settings.STARTUP_BUDGET_MS,
+        )
+
+    def run_once(self):
+        env = {**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'}
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if process.returncode != 0:
+            raise CommandError(process.stderr[-2000:])
+        return elapsed_ms, parse_importtime(process.stderr)
+
+    def handle(self, *args, **options):
+        runs = [self.run_once() for _ in range(max(1, options['repeat']))]
+        elapsed_ms, modules = min(runs, key=lambda run: run[0])
+
+        packages = defaultdict(int)
+        for module, self_us in modules.items():
+            packages[module.split('.')[0]] += self_us
+
+        self.stdout.write(f'Cold start: {elapsed_ms:.0f} ms\n')
+        self.stdout.write('Self import time per top-level package / app:')
+        for package, self_us in sorted(
+            packages.items(), key=lambda item: -item[1]
+        )[:options['top']]:
+            self.stdout.write(f'  {self_us / 1000:8.1f} ms  {package}')
+
+        self.stdout.write('\nSlowest modules (self time):')
+        for module, self_us in sorted(
+            modules.items(), key=lambda item: -item[1]
+        )[:options['top']]:
+            self.stdout.write(f'  {self_us / 1000:8.1f} ms  {module}')
+
+        if options['check'] and elapsed_ms > options['budget_ms']:
+            raise CommandError(
+                f'Cold start took {elapsed_ms:.0f} ms, over the budget of '
+                f'{options["budget_ms"]} ms'
+            )
+
+def parse_importtime(stderr: str) -> dict:
+    """ {module: self time in microseconds} from `-X importtime` output """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            timings, module = line[len('import time:'):].rsplit('|', 1)
+            self_us = int(timings.split('|')[0])
+        except ValueError:
+            continue
+        modules[module.strip()] = self_us
+    return modules
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import SyncCounter
+from core.rls import rls_bypass
+from core.sync import prune_change_log
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes sync change log entries older than SYNC_RETENTION_DAYS. '
+        'Devices that last synced before that get a full download.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=settings.SYNC_RETENTION_DAYS,
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['older_than_days'])
+        with rls_bypass():
+            organization_ids = list(
+                SyncCounter.objects.values_list('organization_id', flat=True)
+            )
+            for organization_id in organization_ids:
+                deleted = prune_change_log(organization_id, before)
+                if deleted:
+                    self.stdout.write(
+                        f'{organization_id}: Deleted {deleted} entries'
+                    )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.rls import disable_rls_sql, enable_rls_sql, org_scoped_models
+
+
+class Command(BaseCommand):
+    help = (
+        'Enables or disables organization row-level security policies on '
+        'every table with an organization_id column.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['enable', 'disable', 'sql'])
+
+    def handle(self, *args, **options):
+        action = options['action']
+        build_sql = disable_rls_sql if action == 'disable' else enable_rls_sql
+        statements = [
+            statement
+            for model in org_scoped_models()
+            for statement in build_sql(model)
+        ]
+
+        if action == 'sql':
+            for statement in statements:
+                self.stdout.write(f'{statement};')
+            return
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{action.capitalize()}d row-level security on '
+            f'{len(org_scoped_models())} tables'
+        ))
@@ -4,10 +4,27 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 
 from mptt.models import MPTTModel, TreeForeignKey
 
+from functools import cache
+
 from django.conf import settings
-from pint import UnitRegistry
 
-ureg = UnitRegistry(system=settings.UNIT_SYSTEM)
+
+@cache
+def get_ureg():
+    """
+    Built on first use - importing pint and building the registry is one of
+    the slowest parts of startup and most processes never convert units.
+    """
+    from pint import UnitRegistry
+
+    return UnitRegistry(system=settings.UNIT_SYSTEM)
+
+def __getattr__(name):
+    # Keeps `core.models.ureg` working without building it at import time
+    if name == 'ureg':
+        return get_ureg()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 """
 # Unit Naming Convention
 <unit>_<power-sign><power> where:
@@ -53,7 +70,7 @@ def parse_si_unit(derived_unit: str):
 
 def register_si_units():
     for dimension, unit in SI_DIMENSION_UNIT:
-        ureg.define(f'{unit} = {parse_si_unit(unit)}')
+        get_ureg().define(f'{unit} = {parse_si_unit(unit)}')
 
 # ==============================================================================
 # Physical Primatives
@@ -137,6 +154,39 @@ class DBEnum(models.Model):
     def __str__(self):
         return self.name
 
+class InheritedOrgObject(models.Model):
+    """
+    Denormalized organization for models that are reached through a chain of
+    parents (e.g. FieldActivity -> FieldPlan -> RanchPlan -> Ranch). Lets
+    queries and row-level security policies use a direct indexed predicate.
+    Set `organization_parent` to the FK whose organization is copied on save.
+    Bulk writers must set organization_id themselves.
+    """
+
+    class Meta:
+        abstract = True
+
+    organization_parent = None
+
+    organization = models.ForeignKey(
+        'organizations.Organization',
+        on_delete=models.PROTECT,
+        editable=False,
+        related_name='+'
+    )
+
+    def save(self, *args, **kwargs):
+        parent = getattr(self, self.organization_parent)
+        self.organization_id = parent.organization_id
+        update_fields = kwargs.get('update_fields')
+        parent_field = self._meta.get_field(self.organization_parent)
+        if update_fields is not None and not {
+            parent_field.name, parent_field.attname
+        }.isdisjoint(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'organization'}
+
+        super().save(*args, **kwargs)
+
 class HierarchicalEnumWithDesc(MPTTModel):
     class Meta:
         abstract = True
@@ -154,3 +204,48 @@ class HierarchicalEnumWithDesc(MPTTModel):
 
     def __str__(self):
         return self.name
+
+# ==============================================================================
+# Sync - see core.sync
+# ==============================================================================
+
+class SyncCounter(models.Model):
+    """ Last change token handed out per organization """
+
+    organization = models.OneToOneField(
+        'organizations.Organization',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+'
+    )
+    value = models.BigIntegerField(default=0)
+    # Change log entries up to here were pruned - older tokens need a reset
+    floor = models.BigIntegerField(default=0)
+
+class ChangeOp(models.TextChoices):
+    UPSERT = 'upsert', _('upsert')
+    DELETE = 'delete', _('delete')
+
+class ChangeLogEntry(models.Model):
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['organization', 'seq'],
+                name='changelog_org_seq_idx'
+            ),
+            models.Index(
+                fields=['organization', 'model', 'object_id', '-seq'],
+                name='changelog_object_idx'
+            ),
+        ]
+
+    organization = models.ForeignKey(
+        'organizations.Organization',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    seq = models.BigIntegerField()
+    model = models.CharField(max_length=settings.DEFAULT_MAX_CHAR)
+    object_id = models.CharField(max_length=settings.DEFAULT_MAX_CHAR)
+    op = models.CharField(max_length=6, choices=ChangeOp.choices)
+    created_at = models.DateTimeField(auto_now_add=True)
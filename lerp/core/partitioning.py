@@ -0,0 +1,360 @@
+"""
+# Partitioning
+Declarative PostgreSQL partitioning for the high-volume tables. Apps register
+how each table is split:
+
+    register_partitioning(FieldActivity, by_organization())
+    register_partitioning(FieldState, by_time('date'))
+    register_partitioning(CashFlowItem.history.model, by_time('history_date'))
+
+- `by_organization` HASH partitions on organization_id into
+  PARTITION_ORGANIZATION_BUCKETS tables. Changing the bucket count means
+  converting again.
+- `by_time` RANGE partitions on a date column, one table per season (year) or
+  month, plus a `_default` partition for rows outside them. `maintain` creates
+  upcoming partitions ahead of time and moves matching rows out of `_default`;
+  `detach` removes old seasons from the table (archived to
+  PARTITION_ARCHIVE_SCHEMA, or dropped).
+
+Partition pruning needs the partition key in the WHERE clause: explicit
+`organization_id=` filters (see core.models.InheritedOrgObject) prune, the RLS
+policy alone does not. Plan reads get it from CompiledPermissions.filter
+(farmplanning.permissions); queries by `field_plan_id` alone scan every bucket.
+
+Tables are converted in place by `manage.py partitions convert` after
+migrating. PostgreSQL requires primary keys and unique constraints to include
+the partition key, so they are widened with it (the pk stays unique through
+its sequence/uuid), and foreign keys *to* a converted table are dropped -
+on_delete is still enforced by Django. Run `manage.py rls enable` again
+afterwards.
+
+Limitation: migrations that only touch columns of a converted table keep
+working, but no unique constraint matches the bare pk anymore, so a migration
+adding or altering a foreign key *to* FieldActivity, FieldActivityElement,
+CashFlowItem or FieldState fails. Declare such references with
+`db_constraint=False`, or run the migration against the unpartitioned table
+(convert afterwards).
+"""
+
+from dataclasses import dataclass
+from datetime import date
+
+from django.conf import settings
+from django.db import connections
+
+from core.rls import enable_rls_sql
+
+
+INTERVALS = ('year', 'month')
+
+@dataclass(frozen=True)
+class Partitioning:
+    method: str # 'hash' or 'range'
+    column: str
+    interval: str = None
+
+    def partition_by(self, quote) -> str:
+        return f'{self.method.upper()} ({quote(self.column)})'
+
+def by_organization() -> Partitioning:
+    return Partitioning('hash', 'organization_id')
+
+def by_time(column: str, interval: str = 'year') -> Partitioning:
+    if interval not in INTERVALS:
+        raise ValueError(
+            f'Got an invalid interval: {interval}. '
+            f'Must be one of {", ".join(INTERVALS)}'
+        )
+    return Partitioning('range', column, interval)
+
+PARTITIONED = {} # model label -> (model, Partitioning)
+
+def register_partitioning(model, partitioning: Partitioning):
+    PARTITIONED[model._meta.label] = (model, partitioning)
+
+# ==============================================================================
+# Periods
+# ==============================================================================
+
+def interval_start(day: date, interval: str) -> date:
+    if interval == 'month':
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+def next_interval(start: date, interval: str) -> date:
+    if interval == 'month':
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return date(start.year + 1, 1, 1)
+
+def partition_name(table: str, start: date, interval: str) -> str:
+    suffix = f'{start:%Y_%m}' if interval == 'month' else f'{start:%Y}'
+    return f'{table}_p{suffix}'
+
+def partition_start(table: str, name: str, interval: str) -> date | None:
+    """ Inverse of partition_name, None for other partitions (`_default`) """
+    suffix = name.removeprefix(f'{table}_p')
+    try:
+        if interval == 'month':
+            year, month = suffix.split('_')
+            return date(int(year), int(month), 1)
+        return date(int(suffix), 1, 1)
+    except ValueError:
+        return None
+
+def interval_range(first: date, last: date, interval: str) -> list[date]:
+    """ Starts of every interval from the one containing `first` to `last` """
+    starts = []
+    start = interval_start(first, interval)
+    while start <= last:
+        starts.append(start)
+        start = next_interval(start, interval)
+    return starts
+
+def upcoming(today: date, interval: str) -> date:
+    """ Last date maintain() must cover """
+    last = interval_start(today, interval)
+    for _ in range(settings.PARTITION_PREMAKE):
+        last = next_interval(last, interval)
+    return last
+
+# ==============================================================================
+# Introspection
+# ==============================================================================
+
+def quote_name(name: str, using: str = 'default') -> str:
+    return connections[using].ops.quote_name(name)
+
+def is_partitioned(cursor, table: str) -> bool:
+    cursor.execute(
+        'SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)',
+        [quote_name(table)],
+    )
+    row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+def partitions(cursor, table: str) -> list[str]:
+    cursor.execute(
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        'WHERE pg_inherits.inhparent = to_regclass(%s) '
+        'ORDER BY child.relname',
+        [quote_name(table)],
+    )
+    return [name for name, in cursor.fetchall()]
+
+def table_constraints(cursor, table: str) -> list[tuple]:
+    """ (name, type, definition, columns) of pk, unique and fk constraints """
+    cursor.execute(
+        'SELECT conname, contype, pg_get_constraintdef(oid), '
+        'ARRAY(SELECT attname FROM pg_attribute '
+        'WHERE attrelid = conrelid AND attnum = ANY(conkey)) '
+        'FROM pg_constraint '
+        "WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'u', 'f') "
+        'ORDER BY conname',
+        [quote_name(table)],
+    )
+    return cursor.fetchall()
+
+def plain_indexes(cursor, table: str) -> list[str]:
+    """ CREATE INDEX statements of indexes not backing a constraint """
+    cursor.execute(
+        'SELECT pg_get_indexdef(indexrelid) FROM pg_index '
+        'WHERE indrelid = to_regclass(%s) AND NOT EXISTS ('
+        'SELECT 1 FROM pg_constraint '
+        'WHERE conindid = indexrelid AND conrelid = indrelid'
+        ')',
+        [quote_name(table)],
+    )
+    return [definition for definition, in cursor.fetchall()]
+
+def referencing_constraints(cursor, table: str) -> list[tuple]:
+    """ (table, constraint) of foreign keys pointing at `table` """
+    cursor.execute(
+        'SELECT conrelid::regclass::text, conname FROM pg_constraint '
+        "WHERE confrelid = to_regclass(%s) AND contype = 'f' "
+        'AND conrelid <> confrelid',
+        [quote_name(table)],
+    )
+    return cursor.fetchall()
+
+def row_security(cursor, table: str) -> bool:
+    cursor.execute(
+        'SELECT relrowsecurity FROM pg_class WHERE oid = to_regclass(%s)',
+        [quote_name(table)],
+    )
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+def column_range(cursor, table: str, column: str) -> tuple:
+    cursor.execute(
+        f'SELECT min({quote_name(column)}), max({quote_name(column)}) '
+        f'FROM {quote_name(table)}'
+    )
+    return cursor.fetchone()
+
+# ==============================================================================
+# SQL
+# ==============================================================================
+
+def as_date(value) -> date:
+    return value.date() if hasattr(value, 'date') else value
+
+def range_partition_sql(table: str, partitioning: Partitioning, start: date):
+    """
+    Creates the partition of `start` detached, moves its rows out of the
+    default partition, then attaches it (ATTACH fails if the default still
+    holds rows of the range).
+    """
+    interval = partitioning.interval
+    name = quote_name(partition_name(table, start, interval))
+    column = quote_name(partitioning.column)
+    end = next_interval(start, interval)
+    return [
+        f'CREATE TABLE {name} '
+        f'(LIKE {quote_name(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+        f'WITH moved AS ('
+        f'DELETE FROM {quote_name(f"{table}_default")} '
+        f"WHERE {column} >= '{start}' AND {column} < '{end}' "
+        f'RETURNING *'
+        f') INSERT INTO {name} SELECT * FROM moved',
+        f'ALTER TABLE {quote_name(table)} ATTACH PARTITION {name} '
+        f"FOR VALUES FROM ('{start}') TO ('{end}')",
+    ]
+
+def convert_sql(cursor, model, partitioning: Partitioning, today: date):
+    """
+    Statements replacing the table of `model` with a partitioned copy, and
+    the foreign keys they drop.
+    """
+    table = model._meta.db_table
+    legacy = f'{table}_unpartitioned'
+    quoted, quoted_legacy = quote_name(table), quote_name(legacy)
+    key = partitioning.column
+    pk = model._meta.pk.column
+    constraints = table_constraints(cursor, table)
+    dropped = referencing_constraints(cursor, table)
+
+    statements = [
+        f'ALTER TABLE {quoted} RENAME TO {quoted_legacy}',
+        f'CREATE TABLE {quoted} (LIKE {quoted_legacy} '
+        f'INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) '
+        f'PARTITION BY {partitioning.partition_by(quote_name)}',
+    ]
+
+    if partitioning.method == 'hash':
+        buckets = settings.PARTITION_ORGANIZATION_BUCKETS
+        statements += [
+            f'CREATE TABLE {quote_name(f"{table}_h{remainder}")} '
+            f'PARTITION OF {quoted} '
+            f'FOR VALUES WITH (MODULUS {buckets}, REMAINDER {remainder})'
+            for remainder in range(buckets)
+        ]
+    else:
+        first, last = column_range(cursor, table, key)
+        first = as_date(first) if first is not None else today
+        last = max(as_date(last) if last is not None else today, today)
+        last = max(last, upcoming(today, partitioning.interval))
+        statements.append(
+            f'CREATE TABLE {quote_name(f"{table}_default")} '
+            f'PARTITION OF {quoted} DEFAULT'
+        )
+        statements += [
+            f'CREATE TABLE '
+            f'{quote_name(partition_name(table, start, partitioning.interval))} '
+            f'PARTITION OF {quoted} '
+            f"FOR VALUES FROM ('{start}') "
+            f"TO ('{next_interval(start, partitioning.interval)}')"
+            for start in interval_range(first, last, partitioning.interval)
+        ]
+
+    # Generated columns are computed again on insert; columns of a
+    # multi-table parent live in the parent's table
+    columns = ', '.join(
+        quote_name(field.column)
+        for field in model._meta.local_concrete_fields
+        if not getattr(field, 'generated', False)
+    )
+    statements += [
+        f'INSERT INTO {quoted} ({columns}) '
+        f'SELECT {columns} FROM {quoted_legacy}',
+        f'DROP TABLE {quoted_legacy} CASCADE',
+    ]
+
+    # Identity columns need PostgreSQL 17 on partitioned tables: use a sequence
+    if model._meta.pk.get_internal_type().endswith('AutoField'):
+        sequence = quote_name(f'{table}_{pk}_seq')
+        statements += [
+            f'CREATE SEQUENCE {sequence} OWNED BY {quoted}.{quote_name(pk)}',
+            f"ALTER TABLE {quoted} ALTER COLUMN {quote_name(pk)} "
+            f"SET DEFAULT nextval('{sequence}')",
+            f"SELECT setval('{sequence}', "
+            f'COALESCE((SELECT max({quote_name(pk)}) FROM {quoted}), 0) + 1, '
+            f'false)',
+        ]
+
+    for name, kind, definition, columns in constraints:
+        if kind in ('p', 'u') and key not in columns:
+            kind_sql = 'PRIMARY KEY' if kind == 'p' else 'UNIQUE'
+            definition = f'{kind_sql} ({", ".join(map(quote_name, [*columns, key]))})'
+        statements.append(
+            f'ALTER TABLE {quoted} ADD CONSTRAINT {quote_name(name)} {definition}'
+        )
+    statements += plain_indexes(cursor, table)
+
+    if row_security(cursor, table):
+        statements += enable_rls_sql(model)
+    return statements, dropped
+
+def maintain_sql(cursor, model, partitioning: Partitioning, today: date):
+    """ Creates missing range partitions up to PARTITION_PREMAKE ahead """
+    table = model._meta.db_table
+    if partitioning.method != 'range':
+        return []
+
+    interval = partitioning.interval
+    existing = {
+        start for start in (
+            partition_start(table, name, interval)
+            for name in partitions(cursor, table)
+        )
+        if start is not None
+    }
+    if not existing:
+        return []
+
+    statements = []
+    last = upcoming(today, interval)
+    for start in interval_range(min(existing), last, interval):
+        if start not in existing:
+            statements += range_partition_sql(table, partitioning, start)
+    return statements
+
+def detach_sql(
+    cursor,
+    model,
+    partitioning: Partitioning,
+    before: date,
+    drop: bool = False,
+):
+    """ Detaches (and archives or drops) range partitions ending by `before` """
+    table = model._meta.db_table
+    if partitioning.method != 'range':
+        return []
+
+    statements = []
+    archive = quote_name(settings.PARTITION_ARCHIVE_SCHEMA)
+    for name in partitions(cursor, table):
+        start = partition_start(table, name, partitioning.interval)
+        if start is None or next_interval(start, partitioning.interval) > before:
+            continue
+        statements.append(
+            f'ALTER TABLE {quote_name(table)} DETACH PARTITION {quote_name(name)}'
+        )
+        if drop:
+            statements.append(f'DROP TABLE {quote_name(name)}')
+        else:
+            statements += [
+                f'CREATE SCHEMA IF NOT EXISTS {archive}',
+                f'ALTER TABLE {quote_name(name)} SET SCHEMA {archive}',
+            ]
+    return statements
@@ -0,0 +1,116 @@
+"""
+# Query Instrumentation
+`record_queries()` wraps every database connection with an execute wrapper and
+collects the SQL and duration of each query. `QueryInstrumentationMiddleware`
+uses it on a sample of requests (QUERY_SAMPLE_RATE) and logs, per view, the
+query count, DB time and repeated statements - the same SQL run several times
+with different parameters is the usual N+1 signature. A `Server-Timing` header
+exposes the numbers to the browser's network tab.
+
+Unlike the debug toolbar this is safe in production: unsampled requests pay one
+random() call, and nothing is rendered into responses.
+"""
+
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager, ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+class QueryRecorder:
+    """ Execute wrapper collecting (sql, seconds) for every query """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def time_ms(self) -> float:
+        return sum(duration for _, duration in self.queries) * 1000
+
+    def duplicates(self) -> dict:
+        """ {sql: times executed} for statements executed more than once """
+        counts = Counter(sql for sql, _ in self.queries)
+        return {sql: n for sql, n in counts.most_common() if n > 1}
+
+    def summary(self, limit: int = 5) -> str:
+        lines = [f'{self.count} queries in {self.time_ms:.1f} ms']
+        for sql, n in list(self.duplicates().items())[:limit]:
+            lines.append(f'  {n}x {sql[:200]}')
+        return '\n'.join(lines)
+
+@contextmanager
+def record_queries():
+    """ Records the queries of every configured database alias """
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
+
+# ==============================================================================
+# Middleware
+# ==============================================================================
+
+class QueryInstrumentationMiddleware:
+    """
+    Logs query count, DB time and duplicated queries of sampled requests.
+    Requests over QUERY_WARN_COUNT (or with duplicates above
+    QUERY_WARN_DUPLICATES) are logged as warnings.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.QUERY_SAMPLE_RATE:
+            return self.get_response(request)
+
+        with record_queries() as recorder:
+            response = self.get_response(request)
+
+        self.report(request, recorder)
+        response['Server-Timing'] = (
+            f'db;dur={recorder.time_ms:.1f};desc="{recorder.count} queries"'
+        )
+        return response
+
+    def report(self, request, recorder: QueryRecorder):
+        match = request.resolver_match
+        view = match.view_name if match else request.path
+        duplicates = recorder.duplicates()
+        level = (
+            logging.WARNING
+            if recorder.count > settings.QUERY_WARN_COUNT
+            or max(duplicates.values(), default=0) > settings.QUERY_WARN_DUPLICATES
+            else logging.INFO
+        )
+        logger.log(
+            level,
+            '%s %s: %s',
+            request.method,
+            view,
+            recorder.summary(),
+            extra={
+                'view': view,
+                'query_count': recorder.count,
+                'query_time_ms': round(recorder.time_ms, 1),
+                'duplicate_queries': sum(duplicates.values()),
+            },
+        )
@@ -0,0 +1,289 @@
+"""
+# Row-Level Security
+Every table with an `organization_id` column gets a PostgreSQL policy that only
+exposes rows of the organization stored in the `lerp.organization_id` session
+setting. The setting is applied per request by OrganizationMiddleware (from the
+session) and by `organization_context` for jobs and management commands.
+`rls_bypass` is for system-wide maintenance only (e.g. history compaction).
+
+Users pick their organization with `select_organization` (or get their only
+one at login). Membership comes from the sources apps register with
+`register_membership` and is checked again on every request, so a revoked
+user loses the organization with their next request.
+
+Policies are FORCEd so they also apply to the table owner (the Django role).
+Apply/remove them with `manage.py rls enable|disable` after migrating.
+
+Not covered (no organization_id column): CropPlan templates with their
+activities and elements, which are scoped by the organization of their product
+in farmplanning.permissions, and the Activity{Labor,Material,Tractor,Implement}
+rows, which are only reached through their FieldActivityElement.
+"""
+
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.contrib.auth.signals import user_logged_in
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import JsonResponse
+from django.urls import path
+from django.views.decorators.http import require_http_methods
+
+
+ORGANIZATION_SETTING = 'lerp.organization_id'
+BYPASS_SETTING = 'lerp.rls_bypass'
+POLICY_NAME = 'organization_isolation'
+SESSION_KEY = 'organization_id'
+
+_current_organization = ContextVar('current_organization', default=None)
+
+MEMBERSHIPS = [] # user -> queryset of organization ids
+
+def organization_column(model):
+    """
+    Local columns only: a multi-table child (e.g. Ranch of Site) is covered by
+    the policy of the parent table holding organization_id.
+    """
+    for field in model._meta.local_concrete_fields:
+        if field.column == 'organization_id':
+            return field.column
+    return None
+
+def org_scoped_models() -> list:
+    """ Concrete managed models (incl. historical) with an organization_id """
+    return [
+        model for model in apps.get_models()
+        if model._meta.managed
+        and not model._meta.proxy
+        and organization_column(model) is not None
+    ]
+
+def enable_rls_sql(model) -> list[str]:
+    table = connections['default'].ops.quote_name(model._meta.db_table)
+    condition = (
+        f"organization_id::text = current_setting('{ORGANIZATION_SETTING}', true)"
+        f" OR current_setting('{BYPASS_SETTING}', true) = 'on'"
+    )
+    return [
+        f'ALTER TABLE {table} ENABLE ROW LEVEL SECURITY',
+        f'ALTER TABLE {table} FORCE ROW LEVEL SECURITY',
+        f'DROP POLICY IF EXISTS {POLICY_NAME} ON {table}',
+        f'CREATE POLICY {POLICY_NAME} ON {table} '
+        f'USING ({condition}) WITH CHECK ({condition})',
+    ]
+
+def disable_rls_sql(model) -> list[str]:
+    table = connections['default'].ops.quote_name(model._meta.db_table)
+    return [
+        f'DROP POLICY IF EXISTS {POLICY_NAME} ON {table}',
+        f'ALTER TABLE {table} NO FORCE ROW LEVEL SECURITY',
+        f'ALTER TABLE {table} DISABLE ROW LEVEL SECURITY',
+    ]
+
+# ==============================================================================
+# Session Settings
+# ==============================================================================
+
+def set_setting(name: str, value: str, using: str = 'default'):
+    with connections[using].cursor() as cursor:
+        cursor.execute('SELECT set_config(%s, %s, false)', [name, value])
+
+def set_organization(organization_id, using: str = 'default'):
+    """ '' matches no rows, so a missing organization never leaks data """
+    value = '' if organization_id is None else str(organization_id)
+    set_setting(ORGANIZATION_SETTING, value, using=using)
+    connections[using].rls_organization = value
+
+def ensure_organization(using: str):
+    """
+    Applies the current organization to another alias (e.g. the read replica)
+    the first time it is used in a context, instead of on every request.
+    """
+    organization_id = _current_organization.get()
+    value = '' if organization_id is None else str(organization_id)
+    if getattr(connections[using], 'rls_organization', None) != value:
+        set_organization(organization_id, using=using)
+
+def reset_organizations():
+    """
+    Clears the organization of every connection that got one in this context
+    (incl. the replica through ensure_organization): connections are pooled
+    and outlive requests.
+    """
+    for connection in connections.all(initialized_only=True):
+        if getattr(connection, 'rls_organization', None):
+            set_organization(None, using=connection.alias)
+
+def forget_organization(sender, connection, **kwargs):
+    """ New (or pooled) connections may carry another request's setting """
+    connection.rls_organization = None
+
+connection_created.connect(forget_organization, dispatch_uid='rls_forget_org')
+
+@contextmanager
+def organization_context(organization_id, using: str = 'default'):
+    token = _current_organization.set(organization_id)
+    set_organization(organization_id, using=using)
+    try:
+        yield
+    finally:
+        _current_organization.reset(token)
+        reset_organizations()
+
+@contextmanager
+def rls_bypass(using: str = 'default'):
+    set_setting(BYPASS_SETTING, 'on', using=using)
+    try:
+        yield
+    finally:
+        set_setting(BYPASS_SETTING, '', using=using)
+
+def organization_stream(organization_id, chunks, using: str = 'default'):
+    """
+    Streamed response content is produced after OrganizationMiddleware has
+    reset the organization. Re-applies it to the connection while `chunks` is
+    consumed, and to the context around each chunk (each may run in another
+    context) so reads routed to the replica get it too.
+    """
+    set_organization(organization_id, using=using)
+    chunks = iter(chunks)
+    try:
+        while True:
+            token = _current_organization.set(organization_id)
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                _current_organization.reset(token)
+            yield chunk
+    finally:
+        reset_organizations()
+
+async def aorganization_stream(organization_id, chunks, using: str = 'default'):
+    """ organization_stream for async iterators """
+    await sync_to_async(set_organization)(organization_id, using=using)
+    chunks = aiter(chunks)
+    try:
+        while True:
+            token = _current_organization.set(organization_id)
+            try:
+                chunk = await anext(chunks)
+            except StopAsyncIteration:
+                return
+            finally:
+                _current_organization.reset(token)
+            yield chunk
+    finally:
+        await sync_to_async(reset_organizations)()
+
+# ==============================================================================
+# Membership
+# ==============================================================================
+
+def register_membership(organizations):
+    """
+    organizations(user) -> queryset of the organization ids the user belongs
+    to, e.g. through role assignments. Read with RLS bypassed.
+    """
+    MEMBERSHIPS.append(organizations)
+
+def user_organizations(user) -> set:
+    if not user.is_authenticated or not user.is_active:
+        return set()
+    with rls_bypass():
+        return {
+            str(organization_id)
+            for organizations in MEMBERSHIPS
+            for organization_id in organizations(user)
+        }
+
+def is_member(user, organization_id) -> bool:
+    """ One EXISTS per source; no sources registered means no members """
+    if organization_id is None:
+        return False
+    if not user.is_authenticated or not user.is_active:
+        return False
+    try:
+        with rls_bypass():
+            return any(
+                organizations(user)
+                .filter(organization_id=organization_id)
+                .exists()
+                for organizations in MEMBERSHIPS
+            )
+    except (ValueError, ValidationError):
+        return False
+
+def select_default_organization(sender, request, user, **kwargs):
+    """ Users of a single organization need not pick it after logging in """
+    organizations = user_organizations(user)
+    if len(organizations) == 1:
+        request.session[SESSION_KEY] = organizations.pop()
+
+user_logged_in.connect(
+    select_default_organization,
+    dispatch_uid='rls_select_default_organization'
+)
+
+@require_http_methods(['GET', 'POST'])
+def select_organization(request):
+    """
+    GET lists the user's organizations and the selected one, POST
+    {"organization": <id>} (form or JSON) selects one of them.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'detail': 'Not authenticated'}, status=401)
+
+    if request.method == 'POST':
+        organization_id = request.POST.get('organization')
+        if organization_id is None and request.body:
+            try:
+                organization_id = json.loads(request.body).get('organization')
+            except (ValueError, AttributeError):
+                organization_id = None
+        if not is_member(request.user, organization_id):
+            return JsonResponse({'detail': 'Not a member'}, status=403)
+        request.session[SESSION_KEY] = str(organization_id)
+        request.session.cycle_key()
+
+    return JsonResponse({
+        'organizations': sorted(user_organizations(request.user)),
+        'selected': request.session.get(SESSION_KEY),
+    })
+
+urlpatterns = [
+    path('', select_organization),
+]
+
+# ==============================================================================
+# Middleware
+# ==============================================================================
+
+class OrganizationMiddleware:
+    """
+    Scopes every query of the request to the organization selected in the
+    session, once the user is confirmed to still belong to it. Reset on every
+    connection that got it (replica incl.) afterwards because connections
+    outlive requests.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        organization_id = request.session.get(SESSION_KEY)
+        if organization_id is not None and not is_member(
+            request.user, organization_id
+        ):
+            del request.session[SESSION_KEY]
+            organization_id = None
+
+        request.organization_id = organization_id
+        with organization_context(organization_id):
+            return self.get_response(request)
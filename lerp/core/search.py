@@ -0,0 +1,229 @@
+"""
+# Search
+Indexed name/code/description search across apps. Models register what is
+searchable and declare matching indexes in their Meta:
+
+    class Meta:
+        indexes = [*search_indexes('field', ['name'])]
+
+    register_search(Field, 'field', names=['name'])
+
+- `names` (names, codes, ids) get pg_trgm GIN indexes on UPPER(name), used
+  by `icontains` (substrings) and `trigram_similar` (typos) lookups.
+- `texts` (descriptions) get one `tsvector` expression GIN index, used for
+  word matches.
+
+`search()` runs one UNION ALL query over the registered models of an
+organization, ranked by the best trigram similarity or text rank; it backs
+`api/search/?q=` and SearchAdminMixin. The
+`pg_trgm` extension is created before migrations (see create_extensions).
+"""
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db import connections
+from django.db.models import CharField, F, FloatField, Q, Value
+from django.db.models.functions import Cast, Greatest, Upper
+from django.db.models.signals import pre_migrate
+from django.http import JsonResponse
+from django.urls import path
+
+from core.api import api_view, page_size, run_sync
+
+
+SEARCH_CONFIG = 'simple' # names and codes are not natural language
+
+MAX_RESULTS = 100
+
+SEARCHABLE = {} # kind -> Searchable
+
+def text_vector(fields):
+    return SearchVector(*fields, config=SEARCH_CONFIG)
+
+def search_indexes(prefix: str, names=(), texts=()) -> list:
+    """ Meta.indexes matching `register_search(names=..., texts=...)` """
+    indexes = [
+        GinIndex(
+            OpClass(Upper(name), name='gin_trgm_ops'),
+            name=f'{prefix}_{name}_trgm'[:30],
+        )
+        for name in names
+    ]
+    if texts:
+        indexes.append(GinIndex(
+            text_vector(texts),
+            name=f'{prefix}_text_search'[:30],
+        ))
+    return indexes
+
+class Searchable:
+    def __init__(self, model, kind, names, texts, organization_lookup):
+        self.model = model
+        self.kind = kind
+        self.names = list(names)
+        self.texts = list(texts)
+        self.organization_lookup = organization_lookup
+
+    def queryset(self, organization_id, query: str):
+        """
+        Matches of `query` as (kind, pk, title, rank) rows. `organization_id`
+        None searches every organization (admin, still subject to RLS).
+        """
+        term = query.upper()
+        queryset = self.model.objects.all()
+        if organization_id is not None:
+            queryset = queryset.filter(
+                **{self.organization_lookup: organization_id}
+            )
+        matches = Q()
+        ranks = []
+        for name in self.names:
+            # icontains compiles to UPPER(col::text) LIKE, as indexed
+            matches |= Q(**{f'{name}__icontains': query})
+            if len(term) >= 3:
+                alias = f'search_upper_{name}'
+                queryset = queryset.alias(**{alias: Upper(name)})
+                matches |= Q(**{f'{alias}__trigram_similar': term})
+            ranks.append(TrigramSimilarity(Upper(name), term))
+        if self.texts:
+            text_query = SearchQuery(query, config=SEARCH_CONFIG)
+            queryset = queryset.annotate(text=text_vector(self.texts))
+            matches |= Q(text=text_query)
+            ranks.append(SearchRank(F('text'), text_query))
+
+        rank = Greatest(*ranks) if len(ranks) > 1 else ranks[0]
+        return (
+            queryset
+            .filter(matches)
+            .annotate(
+                search_kind=Value(self.kind, output_field=CharField()),
+                search_pk=Cast('pk', output_field=CharField()),
+                search_title=Cast(self.names[0], output_field=CharField()),
+                search_rank=Cast(rank, output_field=FloatField()),
+            )
+            .values_list(
+                'search_kind',
+                'search_pk',
+                'search_title',
+                'search_rank',
+            )
+            .order_by()
+        )
+
+def register_search(
+    model,
+    kind: str,
+    names,
+    texts=(),
+    organization_lookup: str = 'organization_id',
+):
+    """ The first of `names` is shown as the result title """
+    SEARCHABLE[kind] = Searchable(
+        model,
+        kind,
+        names,
+        texts,
+        organization_lookup,
+    )
+
+def search(organization_id, query: str, kinds=None, limit: int = 20) -> list:
+    """ [{'kind', 'pk', 'title', 'rank'}] best first """
+    query = query.strip()
+    kinds = [kind for kind in (kinds or SEARCHABLE) if kind in SEARCHABLE]
+    if not query or not kinds:
+        return []
+
+    querysets = [
+        SEARCHABLE[kind].queryset(organization_id, query)
+        .order_by('-search_rank')[:limit]
+        for kind in kinds
+    ]
+    combined = querysets[0].union(*querysets[1:], all=True)
+    rows = combined.order_by('-search_rank')[:limit]
+    return [
+        {'kind': kind, 'pk': pk, 'title': title, 'rank': round(rank, 3)}
+        for kind, pk, title, rank in rows
+    ]
+
+def is_searchable(model) -> bool:
+    return any(searchable.model is model for searchable in SEARCHABLE.values())
+
+def search_ids(model, organization_id, query: str):
+    """ pks of `model` matching `query` (a subquery) """
+    for searchable in SEARCHABLE.values():
+        if searchable.model is model:
+            return (
+                searchable.queryset(organization_id, query)
+                .values_list('pk', flat=True)
+            )
+    raise LookupError(f'{model._meta.label} is not searchable')
+
+class SearchAdminMixin:
+    """
+    Replaces the admin's unindexed `ILIKE '%...%'` across joins with the
+    model's registered search, plus that of each FK in `search_related`.
+    Models without a search of their own (e.g. FieldState) only search
+    through `search_related`. Keep `search_fields` set so the admin shows the
+    search box.
+    """
+
+    search_related = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        organization_id = getattr(request, 'organization_id', None)
+        matches = Q(pk__in=[]) # matches nothing
+        if is_searchable(self.model):
+            matches |= Q(pk__in=search_ids(
+                self.model,
+                organization_id,
+                search_term,
+            ))
+        for relation in self.search_related:
+            related_model = self.model._meta.get_field(relation).related_model
+            matches |= Q(**{f'{relation}__in': search_ids(
+                related_model,
+                organization_id,
+                search_term,
+            )})
+        return queryset.filter(matches), False
+
+# ==============================================================================
+# API
+# ==============================================================================
+
+@api_view
+async def search_api(request):
+    """ `?q=...&kind=field,ranch&limit=20` """
+    kinds = request.GET.get('kind')
+    results = await run_sync(
+        search,
+        request.organization_id,
+        request.GET.get('q', ''),
+        kinds=kinds.split(',') if kinds else None,
+        limit=min(page_size(request), MAX_RESULTS),
+    )
+    return JsonResponse({'results': results})
+
+urlpatterns = [
+    path('', search_api),
+]
+
+# ==============================================================================
+# Extensions
+# ==============================================================================
+
+def create_extensions(using='default', **kwargs):
+    """ Trigram indexes need pg_trgm before the migrations that create them """
+    with connections[using].cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+pre_migrate.connect(create_extensions, dispatch_uid='search_create_extensions')
@@ -0,0 +1,231 @@
+"""
+# Delta Sync
+Change tokens for offline clients. Every save/delete of a registered model
+appends a ChangeLogEntry with the organization's next token (`seq`), so a
+client holding token N only downloads objects changed after N - the cost is
+proportional to the changes, not to the data.
+
+Tokens come from a per-organization counter row incremented with an upsert.
+The upsert and the entries it numbers run in one transaction (the writer's,
+or their own in autocommit), and the row stays locked until it ends, so
+writers of one organization commit in token order and a reader never sees
+token N before every entry below N is visible. Deletes are logged as tombstones
+(op='delete').
+
+    register_sync(
+        FieldState,
+        fields=[...],
+        writable=[...],
+        creatable=True,
+        initial=['field_id'],
+    )
+
+Bulk writers skip signals and must call `record_changes` themselves.
+`prune_change_log` drops old entries and raises the organization's floor;
+clients behind the floor get a full download.
+"""
+
+from dataclasses import dataclass
+from functools import reduce
+
+from django.db import connections, transaction
+from django.db.models import Max
+from django.db.models.signals import post_save, post_delete
+
+from core.models import ChangeLogEntry, ChangeOp, SyncCounter
+
+
+@dataclass(frozen=True)
+class SyncedModel:
+    model: object
+    fields: tuple
+    writable: tuple
+    creatable: bool
+    organization_lookup: str
+    initial: tuple = ()
+
+    @property
+    def label(self) -> str:
+        return self.model._meta.label
+
+    def organization_of(self, instance):
+        """ Follows organization_lookup, e.g. 'product_category__organization_id' """
+        return reduce(getattr, self.organization_lookup.split('__'), instance)
+
+    def queryset(self, organization_id):
+        return self.model.objects.filter(
+            **{self.organization_lookup: organization_id}
+        )
+
+SYNCED = {} # model label -> SyncedModel
+
+def register_sync(
+    model,
+    fields,
+    writable=(),
+    creatable: bool = False,
+    organization_lookup: str = 'organization_id',
+    initial=(),
+):
+    """
+    `fields` are sent to clients; clients may change `writable` fields (and
+    create objects if `creatable`, also setting the `initial` fields, e.g. the
+    parent that decides the organization).
+    """
+    synced = SyncedModel(
+        model,
+        tuple(fields),
+        tuple(writable),
+        creatable,
+        organization_lookup,
+        tuple(initial),
+    )
+    SYNCED[synced.label] = synced
+    post_save.connect(
+        record_change,
+        sender=model,
+        dispatch_uid=f'sync_save_{synced.label}'
+    )
+    post_delete.connect(
+        record_change,
+        sender=model,
+        dispatch_uid=f'sync_delete_{synced.label}'
+    )
+
+# ==============================================================================
+# Tokens
+# ==============================================================================
+
+def next_tokens(organization_id, count: int = 1, using: str = 'default') -> int:
+    """ Reserves `count` tokens and returns the last one """
+    table = SyncCounter._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (organization_id, value, floor) '
+            f'VALUES (%s, %s, 0) '
+            f'ON CONFLICT (organization_id) '
+            f'DO UPDATE SET value = {table}.value + EXCLUDED.value '
+            f'RETURNING value',
+            [organization_id, count],
+        )
+        return cursor.fetchone()[0]
+
+async def current_token(organization_id) -> tuple[int, int]:
+    """ (latest token, floor) """
+    counter = await SyncCounter.objects.filter(
+        organization_id=organization_id
+    ).values_list('value', 'floor').afirst()
+    return counter or (0, 0)
+
+def record_changes(
+    organization_id,
+    model,
+    pks,
+    op: str = ChangeOp.UPSERT,
+    using: str = 'default',
+):
+    """
+    Logs changes of `pks`. The counter lock must be held until the entries are
+    committed, so both run in one (possibly nested) transaction.
+    """
+    pks = list(pks)
+    if not pks:
+        return
+
+    with transaction.atomic(using=using):
+        last = next_tokens(organization_id, len(pks), using=using)
+        ChangeLogEntry.objects.using(using).bulk_create(
+            ChangeLogEntry(
+                organization_id=organization_id,
+                seq=last - len(pks) + i + 1,
+                model=model._meta.label,
+                object_id=str(pk),
+                op=op,
+            )
+            for i, pk in enumerate(pks)
+        )
+
+def record_change(sender, instance, signal, using='default', **kwargs):
+    synced = SYNCED[sender._meta.label]
+    record_changes(
+        synced.organization_of(instance),
+        sender,
+        [instance.pk],
+        op=ChangeOp.DELETE if signal is post_delete else ChangeOp.UPSERT,
+        using=using,
+    )
+
+# ==============================================================================
+# Reading Changes
+# ==============================================================================
+
+async def changes_since(organization_id, since: int, upto: int, limit: int):
+    """
+    Latest entry per object for the next `limit` entries after `since`.
+    Returns (entries, last seq read, more).
+    """
+    window = [
+        seq async for seq in
+        ChangeLogEntry.objects
+        .filter(organization_id=organization_id, seq__gt=since, seq__lte=upto)
+        .order_by('seq')
+        .values_list('seq', flat=True)[:limit]
+    ]
+    if not window:
+        return [], upto, False
+
+    last = window[-1]
+    entries = [
+        entry async for entry in
+        ChangeLogEntry.objects
+        .filter(organization_id=organization_id, seq__gt=since, seq__lte=last)
+        .order_by('model', 'object_id', '-seq')
+        .distinct('model', 'object_id')
+        .values('seq', 'model', 'object_id', 'op')
+    ]
+    entries.sort(key=lambda entry: entry['seq'])
+    return entries, last, last < upto
+
+async def load_rows(synced: SyncedModel, queryset, object_ids) -> dict:
+    """ {str(pk): row} of the objects still visible in `queryset` """
+    return {
+        str(row['pk']): row async for row in
+        queryset.filter(pk__in=list(object_ids)).values('pk', *synced.fields)
+    }
+
+def latest_change(organization_id, model_label: str, object_id, since: int):
+    """ Token of the latest change after `since`, None if unchanged """
+    return (
+        ChangeLogEntry.objects
+        .filter(
+            organization_id=organization_id,
+            model=model_label,
+            object_id=str(object_id),
+            seq__gt=since,
+        )
+        .aggregate(seq=Max('seq'))['seq']
+    )
+
+# ==============================================================================
+# Maintenance
+# ==============================================================================
+
+def prune_change_log(organization_id, before) -> int:
+    """ Deletes entries created before `before`; returns the number deleted """
+    last = (
+        ChangeLogEntry.objects
+        .filter(organization_id=organization_id, created_at__lt=before)
+        .aggregate(seq=Max('seq'))['seq']
+    )
+    if last is None:
+        return 0
+
+    SyncCounter.objects.filter(
+        organization_id=organization_id,
+        floor__lt=last,
+    ).update(floor=last)
+    deleted, _ = ChangeLogEntry.objects.filter(
+        organization_id=organization_id,
+        seq__lte=last,
+    ).delete()
+    return deleted
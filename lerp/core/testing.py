@@ -0,0 +1,79 @@
+"""
+# Query Budgets
+Helpers asserting that a block or an endpoint stays within a number of
+queries, so N+1 regressions fail loudly instead of slowing production down.
+
+    with query_budget(5):
+        list(Field.objects.select_related('ranch'))
+
+    assert_endpoint_budget(client, '/admin/realestate/field/', 12)
+
+`check_admin_budgets` runs every registered admin changelist; it backs
+`manage.py check_query_budgets` for CI.
+"""
+
+from contextlib import contextmanager
+
+from django.contrib import admin
+from django.urls import reverse
+
+from core.queries import record_queries
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+@contextmanager
+def query_budget(max_queries: int, label: str = 'block'):
+    """ Fails if the block runs more than `max_queries` queries """
+    with record_queries() as recorder:
+        yield recorder
+
+    if recorder.count > max_queries:
+        raise QueryBudgetExceeded(
+            f'{label} exceeded its budget of {max_queries} queries: '
+            f'{recorder.summary()}'
+        )
+
+def assert_endpoint_budget(client, url: str, max_queries: int, **extra):
+    """
+    GETs `url` with a django.test.Client and checks status, then budget (a
+    redirect or error page would pass with a meaningless query count)
+    """
+    with record_queries() as recorder:
+        response = client.get(url, **extra)
+
+    if response.status_code != 200:
+        raise AssertionError(f'{url} returned {response.status_code}')
+    if recorder.count > max_queries:
+        raise QueryBudgetExceeded(
+            f'{url} exceeded its budget of {max_queries} queries: '
+            f'{recorder.summary()}'
+        )
+    return response
+
+def admin_changelist_urls(site=admin.site) -> dict:
+    """ {model label: changelist url} of every registered ModelAdmin """
+    return {
+        model._meta.label: reverse(
+            f'{site.name}:{model._meta.app_label}_'
+            f'{model._meta.model_name}_changelist'
+        )
+        for model in site._registry
+    }
+
+def check_admin_budgets(client, max_queries: int, budgets=None) -> dict:
+    """
+    Loads every admin changelist with a logged-in staff `client`.
+    `budgets` overrides `max_queries` per model label.
+    Returns {label: error} for the changelists over budget.
+    """
+    budgets = budgets or {}
+    failures = {}
+    for label, url in admin_changelist_urls().items():
+        try:
+            assert_endpoint_budget(client, url, budgets.get(label, max_queries))
+        except AssertionError as e:
+            failures[label] = str(e)
+
+    return failures
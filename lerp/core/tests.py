@@ -0,0 +1,35 @@
+import io
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from core.partitioning import is_partitioned, partitions
+from farmplanning.models import FieldActivity
+from farmplanning.synthetic import SCALES, generate_organization
+
+
+# ==============================================================================
+# Partitioning
+# ==============================================================================
+
+class PartitioningTests(TestCase):
+    def test_convert(self):
+        organization, counts = generate_organization(
+            'Partitioned', SCALES['small']
+        )
+        table = FieldActivity._meta.db_table
+
+        call_command(
+            'partitions', 'convert',
+            '--model', FieldActivity._meta.label,
+            stdout=io.StringIO(),
+        )
+
+        with connection.cursor() as cursor:
+            self.assertTrue(is_partitioned(cursor, table))
+            self.assertTrue(partitions(cursor, table))
+        self.assertEqual(
+            FieldActivity.objects.filter(organization=organization).count(),
+            counts[FieldActivity._meta.label],
+        )
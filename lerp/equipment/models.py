@@ -6,6 +6,7 @@ from mptt.models import MPTTModel, TreeForeignKey
 from django.conf import settings
 import core.models as core
 import resources.models as resources
+from core.cache import register_group
 
 
 # ==============================================================================
@@ -133,3 +134,10 @@ class Implement(resources.AssetABC):
         null=True,
         validators=[MinValueValidator(0)]
     )
+
+# ==============================================================================
+# Signals
+# ==============================================================================
+
+# Shared models and their cost_per_si_unit feed every organization's plan costs
+register_group('equipment', Tractor, Implement, TractorModel, ImplementHiCat)
@@ -0,0 +1,309 @@
+"""
+Async read endpoints for plans. Container querysets are filtered with the
+user's compiled permissions and financial columns are masked per request.
+Plan endpoints answer conditional GETs (see core.api.conditional). Crop plans
+are shared between organizations and have no data version, so they are always
+sent in full. Scenario reads merge their overlay into the base plan (see
+farmplanning.scenarios).
+"""
+
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import path
+
+from core.api import (
+    api_view,
+    conditional,
+    filter_params,
+    paginated,
+    run_sync,
+    stream_sync,
+)
+from core.rls import organization_stream
+from farmplanning.exports import (
+    DATASETS,
+    FORMATS,
+    PARQUET,
+    arrow_available,
+    export_chunks,
+)
+from farmplanning.masking import MaskPolicy
+from farmplanning.models import (
+    CropPlan,
+    CropPlanFieldActivity,
+    FieldActivity,
+    FieldActivityElement,
+    FieldPlan,
+    RanchPlan,
+    Scenario,
+)
+from farmplanning.permissions import PERMISSIONS_GROUP, request_permissions
+from farmplanning.scenarios import compare_scenarios, scenario_field_plans
+from farmplanning.selectors import plan_summary
+from farmplanning.tree import INCLUDES, plan_tree
+
+
+async def permissions(request):
+    return await run_sync(request_permissions, request, request.organization_id)
+
+@api_view
+@conditional('plans', PERMISSIONS_GROUP, per_user=True)
+async def ranch_plans(request):
+    perms = await permissions(request)
+    queryset = perms.filter(RanchPlan.objects.all())
+    return await paginated(request, queryset, ['name', 'ranch_id'])
+
+@api_view
+@conditional(
+    'plans',
+    PERMISSIONS_GROUP,
+    'sites',
+    'categories',
+    'equipment',
+    container=('plans', 'ranch_plan'),
+    per_user=True,
+)
+async def ranch_plan_tree(request, ranch_plan):
+    """
+    The whole plan in one response and a constant number of queries.
+    `?include=activities,elements,...` (see farmplanning.tree.INCLUDES)
+    """
+    include = request.GET.get('include')
+    include = include.split(',') if include else INCLUDES
+    if not set(include) <= set(INCLUDES):
+        return JsonResponse(
+            {'detail': f'include must be a subset of {",".join(INCLUDES)}'},
+            status=400,
+        )
+
+    perms = await permissions(request)
+    tree = await run_sync(
+        plan_tree,
+        perms,
+        MaskPolicy(perms),
+        ranch_plan,
+        include=include,
+    )
+    if tree is None:
+        return JsonResponse({'detail': 'Not found'}, status=404)
+    return JsonResponse(tree)
+
+@api_view
+@conditional(
+    'plans',
+    PERMISSIONS_GROUP,
+    'sites',
+    container=('plans', 'ranch_plan'),
+    per_user=True,
+)
+async def ranch_plan_summary(request, ranch_plan):
+    """ Field plan, area and activity counts (cached, see selectors) """
+    perms = await permissions(request)
+    if not await perms.filter(RanchPlan.objects.filter(pk=ranch_plan)).aexists():
+        return JsonResponse({'detail': 'Not found'}, status=404)
+
+    summary = await run_sync(plan_summary, request.organization_id, ranch_plan)
+    return JsonResponse({'pk': ranch_plan, **summary})
+
+@api_view
+@conditional(
+    'plans',
+    PERMISSIONS_GROUP,
+    container=('plans', 'ranch_plan'),
+    per_user=True,
+)
+async def field_plans(request):
+    perms = await permissions(request)
+    queryset = filter_params(request, perms.filter(FieldPlan.objects.all()), {
+        'ranch_plan': 'ranch_plan_id',
+        'field': 'field_id',
+        'crop_plan': 'crop_plan_id',
+    })
+    return await paginated(
+        request,
+        queryset,
+        ['ranch_plan_id', 'field_id', 'crop_plan_id'],
+    )
+
+@api_view
+@conditional('plans', PERMISSIONS_GROUP, per_user=True)
+async def field_activities(request):
+    perms = await permissions(request)
+    queryset = filter_params(
+        request,
+        perms.filter(FieldActivity.objects.all()),
+        {'field_plan': 'field_plan_id', 'is_actual': 'is_actual'},
+    )
+    return await paginated(
+        request,
+        queryset,
+        ['field_plan_id', 'category_id', 'time_from_ref_date', 'is_actual'],
+    )
+
+@api_view
+@conditional('plans', PERMISSIONS_GROUP, per_user=True)
+async def field_activity_elements(request):
+    perms = await permissions(request)
+    queryset = filter_params(
+        request,
+        perms.filter(FieldActivityElement.objects.all()),
+        {'field_activity': 'field_activity_id'},
+    )
+    return await paginated(
+        request,
+        queryset,
+        [
+            'field_activity_id',
+            'labor_id',
+            'material_id',
+            'tractor_id',
+            'implement_id',
+        ],
+    )
+
+@api_view
+async def crop_plans(request):
+    perms = await permissions(request)
+    policy = MaskPolicy(perms)
+    queryset = perms.filter(CropPlan.objects.all())
+    return await paginated(
+        request,
+        queryset,
+        policy.visible_fields(CropPlan, ['name', 'product_id', 'ref_date']),
+    )
+
+@api_view
+async def crop_plan_activities(request):
+    perms = await permissions(request)
+    queryset = filter_params(
+        request,
+        perms.filter(CropPlanFieldActivity.objects.all()),
+        {'crop_plan': 'crop_plan_id'},
+    )
+    return await paginated(
+        request,
+        queryset,
+        ['crop_plan_id', 'category_id', 'time_from_ref_date'],
+    )
+
+@api_view
+@conditional(
+    'plans',
+    PERMISSIONS_GROUP,
+    container=('plans', 'ranch_plan'),
+    per_user=True,
+)
+async def scenarios(request, ranch_plan):
+    perms = await permissions(request)
+    queryset = perms.filter(Scenario.objects.filter(ranch_plan_id=ranch_plan))
+    return await paginated(
+        request,
+        queryset,
+        ['name', 'description', 'created_at', 'created_by_id'],
+    )
+
+@api_view
+@conditional('plans', PERMISSIONS_GROUP, per_user=True)
+async def scenario_plan(request, scenario):
+    """ The scenario's field plans, base rows merged with its overrides """
+    perms = await permissions(request)
+    instance = await perms.filter(Scenario.objects.filter(pk=scenario)).afirst()
+    if instance is None:
+        return JsonResponse({'detail': 'Not found'}, status=404)
+
+    field_plans = await run_sync(scenario_field_plans, instance)
+    return JsonResponse({
+        'pk': instance.pk,
+        'ranch_plan_id': instance.ranch_plan_id,
+        'name': instance.name,
+        'field_plans': field_plans,
+    })
+
+@api_view
+@conditional(
+    'plans',
+    PERMISSIONS_GROUP,
+    'sites',
+    container=('plans', 'ranch_plan'),
+    per_user=True,
+)
+async def compare(request, ranch_plan):
+    """
+    Fields and area per crop plan of the base plan (`scenario`: null) and of
+    `?scenarios=1,2,...`
+    """
+    try:
+        requested = [
+            int(pk) for pk in request.GET.get('scenarios', '').split(',') if pk
+        ]
+    except ValueError:
+        return JsonResponse(
+            {'detail': 'scenarios must be comma separated ids'},
+            status=400,
+        )
+
+    perms = await permissions(request)
+    if not await perms.filter(RanchPlan.objects.filter(pk=ranch_plan)).aexists():
+        return JsonResponse({'detail': 'Not found'}, status=404)
+
+    scenario_ids = [
+        pk async for pk in Scenario.objects.filter(
+            ranch_plan_id=ranch_plan,
+            pk__in=requested,
+        ).values_list('pk', flat=True)
+    ]
+    comparison = await run_sync(
+        compare_scenarios,
+        request.organization_id,
+        ranch_plan,
+        scenario_ids,
+    )
+    return JsonResponse({'results': [
+        {'scenario': scenario_id, 'crop_plan_id': crop_plan_id, **totals}
+        for scenario_id, crop_plans in comparison.items()
+        for crop_plan_id, totals in crop_plans.items()
+    ]})
+
+@api_view
+async def export(request, dataset):
+    """ `?format=parquet|arrow` - streamed, see farmplanning.exports """
+    export_format = request.GET.get('format', PARQUET)
+    if dataset not in DATASETS or export_format not in FORMATS:
+        return JsonResponse({'detail': 'Unknown dataset or format'}, status=404)
+    if not arrow_available():
+        return JsonResponse({'detail': 'Exports are not enabled'}, status=501)
+
+    perms = await permissions(request)
+    chunks = organization_stream(
+        request.organization_id,
+        export_chunks(
+            dataset,
+            request.organization_id,
+            export_format,
+            permissions=perms,
+            policy=MaskPolicy(perms),
+        ),
+    )
+    content_type, extension = FORMATS[export_format]
+    response = StreamingHttpResponse(
+        stream_sync(chunks),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{dataset}.{extension}"'
+    )
+    return response
+
+urlpatterns = [
+    path('ranch-plans/', ranch_plans),
+    path('ranch-plans/<int:ranch_plan>/tree/', ranch_plan_tree),
+    path('ranch-plans/<int:ranch_plan>/summary/', ranch_plan_summary),
+    path('ranch-plans/<int:ranch_plan>/scenarios/', scenarios),
+    path('ranch-plans/<int:ranch_plan>/scenarios/compare/', compare),
+    path('scenarios/<int:scenario>/', scenario_plan),
+    path('exports/<str:dataset>/', export),
+    path('field-plans/', field_plans),
+    path('field-activities/', field_activities),
+    path('field-activity-elements/', field_activity_elements),
+    path('crop-plans/', crop_plans),
+    path('crop-plan-activities/', crop_plan_activities),
+]
@@ -0,0 +1,216 @@
+"""
+# Benchmarks
+Times key operations against one organization - ideally a synthetic one at
+target scale (see farmplanning.synthetic) - and appends the results to
+BENCHMARK_RESULTS_FILE (JSON lines) so runs can be compared over time.
+
+Each benchmark is a function of the organization registered with
+`@benchmark(name)`. Writing benchmarks run inside a transaction that is rolled
+back, so every repetition sees the same data.
+"""
+
+import json
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import date
+from statistics import median
+
+from django.conf import settings
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.db import transaction
+
+import resources.models as resources
+import realestate.models as realestate
+from accounting.rollups import rebuild_period_balances, subtree_totals
+from core.queries import record_queries
+from farmplanning.closing import plan_vs_actual, snapshot_totals
+from farmplanning.models import (
+    FieldActivityElement,
+    FieldPlan,
+    RanchPlan,
+    RoleAssignment,
+)
+from farmplanning.permissions import compile_permissions
+from farmplanning.posting import post_actuals
+from resources.selectors import CATEGORY_TREE_FIELDS
+
+
+BENCHMARKS = {} # name -> (function, writes)
+
+def benchmark(name: str, writes: bool = False):
+    def decorator(func):
+        BENCHMARKS[name] = (func, writes)
+        return func
+    return decorator
+
+class Rollback(Exception):
+    pass
+
+@contextmanager
+def rolled_back():
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+def season() -> tuple[date, date]:
+    year = date.today().year
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+# ==============================================================================
+# Reads
+# ==============================================================================
+
+@benchmark('category_tree')
+def category_tree(organization):
+    # The uncached query behind resources.selectors.category_tree
+    return list(
+        resources.ActivityHiCat.objects
+        .filter(organization=organization)
+        .order_by('tree_id', 'lft')
+        .values(*CATEGORY_TREE_FIELDS)
+    )
+
+@benchmark('field_geometries')
+def field_geometries(organization):
+    return list(
+        realestate.Field.objects
+        .filter(organization=organization)
+        .annotate(geometry=AsGeoJSON('mpoly'))
+        .values('pk', 'ranch_id', 'name', 'area', 'geometry')
+    )
+
+@benchmark('field_admin_page')
+def field_admin_page(organization):
+    # What the FieldAdmin changelist loads for one page
+    return [
+        (field.ranch.name, field.name, field.area, field.organization.name)
+        for field in
+        realestate.Field.objects
+        .filter(organization=organization)
+        .select_related('ranch', 'organization')[:100]
+    ]
+
+@benchmark('ranch_plan_tree')
+def ranch_plan_tree(organization):
+    """ First RanchPlan with its field plans, activities and elements """
+    ranch_plan = RanchPlan.objects.filter(organization=organization).first()
+    return (
+        list(FieldPlan.objects.filter(ranch_plan=ranch_plan).values()),
+        list(
+            FieldActivityElement.objects
+            .filter(field_activity__field_plan__ranch_plan=ranch_plan)
+            .values(
+                'pk',
+                'field_activity_id',
+                'field_activity__category_id',
+                'field_activity__time_from_ref_date',
+                'labor_id',
+                'material_id',
+                'tractor_id',
+                'implement_id',
+            )
+        ),
+    )
+
+@benchmark('compile_permissions')
+def permissions(organization):
+    assignment = (
+        RoleAssignment.objects
+        .filter(role__organization=organization)
+        .select_related('user')
+        .first()
+    )
+    if assignment is not None:
+        return compile_permissions(assignment.user, organization.pk)
+
+@benchmark('subtree_totals')
+def bucket_subtree_totals(organization):
+    return subtree_totals(organization, *season())
+
+@benchmark('plan_vs_actual')
+def plan_vs_actual_report(organization):
+    return plan_vs_actual(organization, *season())
+
+@benchmark('snapshot_totals')
+def period_snapshot_totals(organization):
+    return snapshot_totals(organization, date.today().replace(day=1))
+
+# ==============================================================================
+# Writes (rolled back)
+# ==============================================================================
+
+@benchmark('post_actuals', writes=True)
+def posting(organization):
+    return post_actuals(organization, date.today())
+
+@benchmark('rebuild_period_balances', writes=True)
+def period_balances(organization):
+    return rebuild_period_balances(organization)
+
+# ==============================================================================
+# Runner
+# ==============================================================================
+
+def run_benchmark(name: str, organization, repeat: int = 3) -> dict:
+    func, writes = BENCHMARKS[name]
+    timings, queries = [], 0
+    for _ in range(repeat):
+        with record_queries() as recorder:
+            start = time.perf_counter()
+            if writes:
+                with rolled_back():
+                    func(organization)
+            else:
+                func(organization)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries = recorder.count
+
+    return {
+        'name': name,
+        'min_ms': round(min(timings), 2),
+        'median_ms': round(median(timings), 2),
+        'queries': queries,
+    }
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+def record_results(results: list, organization, path=None) -> dict:
+    """ Appends one JSON line per run """
+    run = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'organization': str(organization.pk),
+        'elements': FieldActivityElement.objects.filter(
+            organization=organization
+        ).count(),
+        'results': results,
+    }
+    with open(path or settings.BENCHMARK_RESULTS_FILE, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+    return run
+
+def previous_results(path=None) -> dict:
+    """ {benchmark name: result} of the most recent recorded run of each """
+    latest = {}
+    try:
+        with open(path or settings.BENCHMARK_RESULTS_FILE) as f:
+            for line in f:
+                for result in json.loads(line)['results']:
+                    latest[result['name']] = result
+    except FileNotFoundError:
+        pass
+    return latest
@@ -0,0 +1,193 @@
+"""
+# Period Close
+Closing a month freezes its totals per RanchPlan x accounting bucket x currency
+into PeriodSnapshot so historical reports never replay CashFlowItems or history
+tables. The plan total covers every activity scheduled in the month, executed
+(actual) or not, so it stays comparable with the actual total. Reopening a
+month only flips its status; the next close rebuilds that month's snapshot
+alone, leaving every other month untouched.
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DateTimeField, ExpressionWrapper, F, Sum
+from django.utils import timezone
+
+import accounting.models as accounting
+from accounting.rollups import month_start, next_month_start
+from farmplanning.models import (
+    FieldActivityElement,
+    PeriodClose,
+    PeriodCloseStatus,
+    PeriodSnapshot,
+)
+from farmplanning.posting import element_bucket_expression, element_cost_expression
+from mysite.routers import replica_reads
+
+
+def month_end(period: date) -> date:
+    """ First day of the following month """
+    return (period.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+# ==============================================================================
+# Snapshot
+# ==============================================================================
+
+def scheduled_elements(organization, period: date):
+    """ Elements whose activity falls in `period` (crop plan ref date + offset) """
+    scheduled_at = ExpressionWrapper(
+        F('field_activity__field_plan__crop_plan__ref_date')
+        + F('field_activity__time_from_ref_date'),
+        output_field=DateTimeField(),
+    )
+    return (
+        FieldActivityElement.objects
+        .filter(organization=organization)
+        .alias(scheduled_at=scheduled_at)
+        .filter(scheduled_at__gte=period, scheduled_at__lt=month_end(period))
+    )
+
+def snapshot_totals(organization, period: date) -> dict:
+    """ {(ranch_plan_id, bucket_id, currency): {'balance', 'plan_total', ...}} """
+    totals = defaultdict(
+        lambda: {'balance': 0.0, 'plan_total': 0.0, 'actual_total': 0.0}
+    )
+
+    balances = (
+        accounting.CashFlowItem.objects
+        .filter(
+            organization=organization,
+            date__gte=period,
+            date__lt=month_end(period),
+        )
+        .values(
+            'accounting_bucket_id',
+            'currency',
+            ranch_plan_id=F(
+                'field_activity_element__field_activity__field_plan__ranch_plan'
+            ),
+        )
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    for row in balances:
+        key = (row['ranch_plan_id'], row['accounting_bucket_id'], row['currency'])
+        totals[key]['balance'] += row['total'] or 0
+        if row['ranch_plan_id'] is not None:
+            # Posted element costs are stored as outflows (negative)
+            totals[key]['actual_total'] -= row['total'] or 0
+
+    planned = (
+        scheduled_elements(organization, period)
+        .values(
+            ranch_plan_id=F('field_activity__field_plan__ranch_plan'),
+            bucket_id=element_bucket_expression(),
+        )
+        .annotate(total=Sum(element_cost_expression()))
+        .order_by()
+    )
+    for row in planned:
+        key = (row['ranch_plan_id'], row['bucket_id'], settings.DEFAULT_CURRENCY)
+        totals[key]['plan_total'] += row['total'] or 0
+
+    return totals
+
+@transaction.atomic
+def close_period(organization, day: date, user=None) -> PeriodClose:
+    """ Closes the month containing `day` and (re)builds its snapshot """
+    period = month_start(day)
+    period_close, _ = (
+        PeriodClose.objects
+        .select_for_update()
+        .get_or_create(organization=organization, period=period)
+    )
+
+    period_close.snapshots.all().delete()
+    PeriodSnapshot.objects.bulk_create(
+        [
+            PeriodSnapshot(
+                period_close=period_close,
+                organization_id=organization.pk,
+                period=period,
+                ranch_plan_id=ranch_plan_id,
+                accounting_bucket_id=bucket_id,
+                currency=currency,
+                **values
+            )
+            for (ranch_plan_id, bucket_id, currency), values
+            in snapshot_totals(organization, period).items()
+        ],
+        batch_size=1000,
+    )
+
+    period_close.status = PeriodCloseStatus.CLOSED
+    period_close.closed_at = timezone.now()
+    period_close.closed_by = user
+    period_close.save()
+    return period_close
+
+def reopen_period(organization, day: date) -> PeriodClose:
+    """ The stale snapshot is kept until the month is closed again """
+    period_close = PeriodClose.objects.get(
+        organization=organization,
+        period=month_start(day),
+    )
+    period_close.status = PeriodCloseStatus.OPEN
+    period_close.save(update_fields=['status'])
+    return period_close
+
+# ==============================================================================
+# Reports
+# ==============================================================================
+
+REPORT_GROUPS = {
+    'period': 'period',
+    'ranch_plan': 'ranch_plan_id',
+    'accounting_bucket': 'accounting_bucket_id',
+    'currency': 'currency',
+}
+
+@replica_reads
+def plan_vs_actual(organization, start: date, end: date, by=('ranch_plan',)):
+    """
+    Plan vs actual totals for closed months in [start, end], read from
+    PeriodSnapshot only. `by` is any of 'period', 'ranch_plan',
+    'accounting_bucket', 'currency'.
+    Returns (rows, open_periods) - open months, incl. months never closed,
+    are not reported.
+    """
+    closed = set(
+        PeriodClose.objects
+        .filter(
+            organization=organization,
+            period__gte=month_start(start),
+            period__lte=end,
+            status=PeriodCloseStatus.CLOSED,
+        )
+        .values_list('period', flat=True)
+    )
+    open_periods = []
+    period = month_start(start)
+    while period <= end:
+        if period not in closed:
+            open_periods.append(period)
+        period = next_month_start(period)
+
+    rows = (
+        PeriodSnapshot.objects
+        .filter(
+            organization_id=organization.pk,
+            period__in=closed,
+        )
+        .values(*[REPORT_GROUPS[field] for field in by])
+        .annotate(
+            total_balance=Sum('balance'),
+            total_plan=Sum('plan_total'),
+            total_actual=Sum('actual_total'),
+        )
+        .order_by()
+    )
+    return list(rows), open_periods
@@ -0,0 +1,304 @@
+"""
+# Analytics Exports
+Plan-vs-actual fact tables streamed as Parquet or Arrow IPC (stream format)
+for notebooks:
+- `activities`: FieldActivity
+- `elements`: FieldActivityElement amounts, planned and posted costs
+- `field_states`: FieldState soil quality
+
+Each row carries its dimensions denormalized (ranch, field and area, crop
+plan, product and category codes, season), so no joins are needed downstream.
+Rows are read from a server-side cursor (`QuerySet.iterator`) in chunks of
+EXPORT_CHUNK_SIZE; every chunk becomes one record batch (a Parquet row group)
+and is written out before the next is fetched, so memory stays constant
+whatever the number of seasons exported.
+
+Cost columns are left out for users without view_financials (see
+farmplanning.masking). pyarrow is optional: only exports need it.
+"""
+
+from dataclasses import dataclass
+from importlib.util import find_spec
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import (
+    Case,
+    CharField,
+    DateField,
+    DateTimeField,
+    ExpressionWrapper,
+    F,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce, ExtractYear
+
+import realestate.models as realestate
+from farmplanning.models import FieldActivity, FieldActivityElement
+from farmplanning.permissions import SCOPES
+from farmplanning.posting import element_cost_expression
+
+
+PARQUET = 'parquet'
+ARROW = 'arrow'
+FORMATS = {
+    # format -> (content type, file extension)
+    PARQUET: ('application/vnd.apache.parquet', 'parquet'),
+    ARROW: ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+def arrow_available() -> bool:
+    return find_spec('pyarrow') is not None
+
+def import_arrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImproperlyConfigured(
+            'Analytics exports need pyarrow (pip install pyarrow)'
+        ) from e
+    return pyarrow
+
+# ==============================================================================
+# Datasets
+# ==============================================================================
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    expression: object # lookup or expression
+    type: str # pyarrow type factory, e.g. 'int64'
+    financial: bool = False
+
+    def annotation(self):
+        if isinstance(self.expression, str):
+            return F(self.expression)
+        return self.expression
+
+def plan_dimensions(prefix: str, offset: str) -> list[Column]:
+    """
+    Dimensions of a FieldPlan reached through `prefix`; `offset` is the
+    activity's time_from_ref_date, which dates it from the crop plan.
+    """
+    p = prefix
+    scheduled_at = Cast(
+        ExpressionWrapper(
+            F(f'{p}crop_plan__ref_date') + F(offset),
+            output_field=DateTimeField(),
+        ),
+        output_field=DateField(),
+    )
+    return [
+        Column('ranch_plan_id', f'{p}ranch_plan_id', 'int64'),
+        Column('ranch_plan', f'{p}ranch_plan__name', 'string'),
+        Column('ranch', f'{p}field__ranch__name', 'string'),
+        Column('field_id', f'{p}field_id', 'int64'),
+        Column('field', f'{p}field__name', 'string'),
+        Column('field_area', f'{p}field__area', 'float64'),
+        Column('crop_plan', f'{p}crop_plan__name', 'string'),
+        Column('product_code', f'{p}crop_plan__product__code', 'string'),
+        Column('scheduled_at', scheduled_at, 'date32'),
+        Column('season', ExtractYear(scheduled_at), 'int32'),
+    ]
+
+def element_kind():
+    return Case(
+        *(
+            When(**{f'{kind}__isnull': False}, then=Value(kind))
+            for kind in ('labor', 'material', 'tractor', 'implement')
+        ),
+        output_field=CharField(),
+    )
+
+@dataclass(frozen=True)
+class Dataset:
+    model: object
+    columns: tuple
+
+    def queryset(self, permissions, organization_id):
+        queryset = self.model.objects.filter(organization_id=organization_id)
+        if permissions is not None and self.model in SCOPES:
+            queryset = permissions.filter(queryset)
+        return queryset
+
+    def visible_columns(self, policy=None) -> list[Column]:
+        if policy is None or policy.view_financials:
+            return list(self.columns)
+        return [column for column in self.columns if not column.financial]
+
+DATASETS = {
+    'activities': Dataset(FieldActivity, (
+        Column('activity_id', 'pk', 'int64'),
+        Column('field_plan_id', 'field_plan_id', 'int64'),
+        *plan_dimensions('field_plan__', 'time_from_ref_date'),
+        Column('category_code', 'category__code', 'string'),
+        Column('category', 'category__name', 'string'),
+        Column('is_actual', 'is_actual', 'bool_'),
+    )),
+    'elements': Dataset(FieldActivityElement, (
+        Column('element_id', 'pk', 'int64'),
+        Column('activity_id', 'field_activity_id', 'int64'),
+        *plan_dimensions(
+            'field_activity__field_plan__',
+            'field_activity__time_from_ref_date',
+        ),
+        Column('category_code', 'field_activity__category__code', 'string'),
+        Column('is_actual', 'field_activity__is_actual', 'bool_'),
+        Column('kind', element_kind(), 'string'),
+        Column(
+            'resource_code',
+            Coalesce(
+                'labor__category__code',
+                'material__category__code',
+                'tractor__instance__asset_id',
+                'implement__instance__asset_id',
+                output_field=CharField(),
+            ),
+            'string',
+        ),
+        Column(
+            'amount',
+            Coalesce(
+                'labor__amount',
+                'material__amount',
+                'tractor__amount',
+                'implement__amount',
+            ),
+            'float64',
+        ),
+        Column('cost', element_cost_expression(), 'float64', financial=True),
+        # Posted CashFlowItems are outflows (negative)
+        Column(
+            'actual_cost',
+            -F('cash_flow_item__amount'),
+            'float64',
+            financial=True,
+        ),
+    )),
+    'field_states': Dataset(realestate.FieldState, (
+        Column('field_state_id', 'pk', 'int64'),
+        Column('ranch', 'field__ranch__name', 'string'),
+        Column('field_id', 'field_id', 'int64'),
+        Column('field', 'field__name', 'string'),
+        Column('field_area', 'field__area', 'float64'),
+        Column('date', 'date', 'date32'),
+        Column('season', ExtractYear('date'), 'int32'),
+        Column('soil_quality', 'soil_quality', 'float64'),
+        Column('product_code', 'product__code', 'string'),
+        Column('plant_date', 'plant_date', 'date32'),
+    )),
+}
+
+# ==============================================================================
+# Writing
+# ==============================================================================
+
+class StreamSink:
+    """ Write-only file object for pyarrow, drained after every batch """
+
+    closed = False
+
+    def __init__(self):
+        self.buffer = []
+        self.position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.buffer.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self.buffer)
+        self.buffer.clear()
+        return data
+
+def arrow_schema(columns):
+    pa = import_arrow()
+    return pa.schema([
+        (column.name, getattr(pa, column.type)()) for column in columns
+    ])
+
+def record_batches(queryset, columns, schema, chunk_size: int):
+    """ One RecordBatch per `chunk_size` rows of a server-side cursor """
+    pa = import_arrow()
+    rows = (
+        queryset
+        .annotate(**{
+            f'export_{column.name}': column.annotation()
+            for column in columns
+        })
+        .order_by('pk')
+        .values_list(*(f'export_{column.name}' for column in columns))
+        .iterator(chunk_size=chunk_size)
+    )
+    while chunk := list(islice(rows, chunk_size)):
+        yield pa.RecordBatch.from_arrays(
+            [
+                pa.array(values, type=field.type)
+                for values, field in zip(zip(*chunk), schema)
+            ],
+            schema=schema,
+        )
+
+def open_writer(export_format: str, sink, schema):
+    pa = import_arrow()
+    if export_format == PARQUET:
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(sink, schema, compression='zstd')
+    return pa.ipc.new_stream(sink, schema)
+
+def export_chunks(
+    dataset: str,
+    organization_id,
+    export_format: str = PARQUET,
+    permissions=None,
+    policy=None,
+    chunk_size: int = None,
+):
+    """
+    Yields the encoded file in pieces (one per chunk of rows). `permissions`
+    and `policy` (MaskPolicy) restrict rows and columns for a user; commands
+    leave them out to export everything.
+    """
+    if export_format not in FORMATS:
+        raise ValueError(
+            f'Got an invalid format: {export_format}. '
+            f'Must be one of {", ".join(FORMATS)}'
+        )
+    exported = DATASETS[dataset]
+    columns = exported.visible_columns(policy)
+    schema = arrow_schema(columns)
+
+    sink = StreamSink()
+    writer = open_writer(export_format, sink, schema)
+    batches = record_batches(
+        exported.queryset(permissions, organization_id),
+        columns,
+        schema,
+        chunk_size or settings.EXPORT_CHUNK_SIZE,
+    )
+    try:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
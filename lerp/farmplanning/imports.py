@@ -0,0 +1,431 @@
+"""
+# Crop Plan Template Import
+Loads CropPlan templates from a CSV or XLSX sheet with one row per element:
+
+    crop_plan | product | ref_date   | activity | category | days | labor | material | tractor          | implement
+    Tomato 25 | TOM     | 2025-03-01 | 1        | DISC     | -14  |       |          | Deere - 8R 410   |
+    Tomato 25 |         |            | 1        |          |      |       |          |                  | Disc 30ft
+    Tomato 25 |         |            | 2        | PLANT    | 0    | CREW  |          |                  |
+
+- Rows sharing `crop_plan` + `activity` (any label) build one activity; its
+  category code and `days` from the crop plan's ref_date come from its first
+  row. Crop plan columns (product code, ref_date) also come from the first row.
+- Each row holds at most one element: exactly one of labor/material (category
+  codes), tractor (`<make> - <model>`) or implement (category name). A row
+  without any only declares its activity.
+
+The sheet is read as a stream (openpyxl read-only mode for XLSX) in batches of
+IMPORT_BATCH_SIZE rows. Every batch resolves its codes with one query per
+category type, then bulk inserts crop plans, activities and elements in one
+transaction. Invalid rows are reported with their row number and skipped; the
+rest of the batch is imported.
+
+Existing crop plans are left alone (their rows are errors) unless `replace`,
+which deletes their activities and elements first. Crop plans are shared
+between organizations, so only those of the organization's products are
+replaced; a crop plan still referenced elsewhere is reported and kept.
+"""
+
+import csv
+import io
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.db.models import Count, ProtectedError, Value
+from django.db.models.functions import Concat
+
+import equipment.models as equipment
+import resources.models as resources
+from farmplanning.models import (
+    CropPlan,
+    CropPlanFieldActivity,
+    CropPlanFieldActivityElement,
+)
+
+
+CSV = 'csv'
+XLSX = 'xlsx'
+FORMATS = (CSV, XLSX)
+
+ELEMENT_KINDS = ('labor', 'material', 'tractor', 'implement')
+COLUMNS = (
+    'crop_plan',
+    'product',
+    'ref_date',
+    'activity',
+    'category',
+    'days',
+    *ELEMENT_KINDS,
+)
+
+@dataclass
+class ImportResult:
+    crop_plans: int = 0
+    activities: int = 0
+    elements: int = 0
+    errors: list = field(default_factory=list) # (row number, message)
+
+    def error(self, row_number: int, message: str):
+        self.errors.append((row_number, message))
+
+class RowError(ValueError):
+    pass
+
+# ==============================================================================
+# Reading
+# ==============================================================================
+
+def read_csv(file):
+    """ (row number, {column: value}) from a binary or text file """
+    if isinstance(file.read(0), bytes):
+        file = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    reader = csv.reader(file)
+    header = next(reader, [])
+    for row_number, values in enumerate(reader, start=2):
+        yield row_number, dict(zip(header, values))
+
+def read_xlsx(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise ImproperlyConfigured(
+            'XLSX imports need openpyxl (pip install openpyxl)'
+        ) from e
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(name or '') for name in next(rows, ())]
+        for row_number, values in enumerate(rows, start=2):
+            yield row_number, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+def read_rows(file, file_format: str):
+    """ Rows with normalized column names; blank rows are skipped """
+    reader = read_xlsx if file_format == XLSX else read_csv
+    for row_number, values in reader(file):
+        row = {
+            str(name).strip().lower(): value
+            for name, value in values.items()
+        }
+        if any(text(row.get(column)) for column in COLUMNS):
+            yield row_number, row
+
+def text(value) -> str:
+    return '' if value is None else str(value).strip()
+
+def parse_days(value):
+    if text(value) == '':
+        return None
+    try:
+        return timedelta(days=float(value))
+    except (TypeError, ValueError):
+        raise RowError(f'days must be a number, got "{value}"')
+
+def parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date) or text(value) == '':
+        return value or None
+    try:
+        return date.fromisoformat(text(value))
+    except ValueError:
+        raise RowError(f'ref_date must be YYYY-MM-DD, got "{value}"')
+
+@dataclass(frozen=True)
+class ParsedRow:
+    number: int
+    crop_plan: str
+    activity: str
+    product: str
+    ref_date: date
+    category: str
+    days: timedelta
+    element: tuple # (kind, code) or None
+
+    @property
+    def activity_key(self) -> tuple:
+        return (self.crop_plan, self.activity)
+
+def parse_row(row_number: int, row: dict) -> ParsedRow:
+    """ Checks everything that needs no database, incl. exactly-one element """
+    crop_plan, activity = text(row.get('crop_plan')), text(row.get('activity'))
+    if not crop_plan or not activity:
+        raise RowError('crop_plan and activity are required')
+
+    elements = [
+        (kind, text(row.get(kind)))
+        for kind in ELEMENT_KINDS
+        if text(row.get(kind))
+    ]
+    if len(elements) > 1:
+        raise RowError(
+            f'Exactly one of {", ".join(ELEMENT_KINDS)} per row, got '
+            f'{", ".join(kind for kind, _ in elements)}'
+        )
+
+    return ParsedRow(
+        number=row_number,
+        crop_plan=crop_plan,
+        activity=activity,
+        product=text(row.get('product')),
+        ref_date=parse_date(row.get('ref_date')),
+        category=text(row.get('category')),
+        days=parse_days(row.get('days')),
+        element=elements[0] if elements else None,
+    )
+
+# ==============================================================================
+# Code Lookups
+# ==============================================================================
+
+def org_codes(model, organization_id, codes) -> dict:
+    return dict(
+        model.objects
+        .filter(organization_id=organization_id, code__in=codes)
+        .values_list('code', 'pk')
+    )
+
+def tractor_model_codes(organization_id, codes) -> dict:
+    """ Tractor models are shared, keyed '<make> - <model>' as displayed """
+    return dict(
+        equipment.TractorModel.objects
+        .alias(code=Concat('make_id', Value(' - '), 'name'))
+        .filter(code__in=codes)
+        .values_list('code', 'pk')
+    )
+
+def implement_codes(organization_id, codes) -> dict:
+    """ Implement categories are shared and keyed by name; duplicates fail """
+    unique = (
+        equipment.ImplementHiCat.objects
+        .filter(name__in=codes)
+        .values('name')
+        .annotate(count=Count('pk'))
+        .filter(count=1)
+        .values('name')
+    )
+    return dict(
+        equipment.ImplementHiCat.objects
+        .filter(name__in=unique)
+        .values_list('name', 'pk')
+    )
+
+LOOKUPS = {
+    # code kind -> codes to pks, one query per call
+    'product': lambda org, codes: org_codes(resources.ProductHiCat, org, codes),
+    'category': lambda org, codes: org_codes(resources.ActivityHiCat, org, codes),
+    'labor': lambda org, codes: org_codes(resources.LaborHiCat, org, codes),
+    'material': lambda org, codes: org_codes(resources.MaterialHiCat, org, codes),
+    'tractor': tractor_model_codes,
+    'implement': implement_codes,
+}
+
+def resolve_codes(organization_id, rows) -> dict:
+    """ {kind: {code: pk}} for every code used in `rows` """
+    codes = {kind: set() for kind in LOOKUPS}
+    for row in rows:
+        if row.product:
+            codes['product'].add(row.product)
+        if row.category:
+            codes['category'].add(row.category)
+        if row.element:
+            kind, code = row.element
+            codes[kind].add(code)
+
+    return {
+        kind: LOOKUPS[kind](organization_id, list(kind_codes))
+        for kind, kind_codes in codes.items()
+        if kind_codes
+    }
+
+# ==============================================================================
+# Import
+# ==============================================================================
+
+class Importer:
+    """ Keeps crop plans/activities across batches, keyed by sheet labels """
+
+    def __init__(self, organization_id, replace: bool = False):
+        self.organization_id = organization_id
+        self.replace = replace
+        self.result = ImportResult()
+        self.crop_plans = {} # name -> pk, None if it failed
+        self.activities = {} # (crop plan, activity) -> pk, None if it failed
+        self.plan_errors = {} # name -> why it failed
+        self.activity_errors = {} # (crop plan, activity) -> why it failed
+
+    def run(self, rows, batch_size: int = None) -> ImportResult:
+        batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        rows = iter(rows)
+        while batch := list(islice(rows, batch_size)):
+            parsed = []
+            for row_number, row in batch:
+                try:
+                    parsed.append(parse_row(row_number, row))
+                except RowError as e:
+                    self.result.error(row_number, str(e))
+            with transaction.atomic():
+                self.import_batch(parsed)
+        return self.result
+
+    def import_batch(self, rows):
+        codes = resolve_codes(self.organization_id, rows)
+        rows = self.create_crop_plans(rows, codes)
+        rows = self.create_activities(rows, codes)
+        self.create_elements(rows, codes)
+
+    def fail(self, row: ParsedRow, message: str):
+        self.result.error(row.number, message)
+
+    def replace_crop_plan(self, name: str, crop_plan_id):
+        """ Empties an existing crop plan; returns an error message or None """
+        try:
+            with transaction.atomic():
+                CropPlanFieldActivityElement.objects.filter(
+                    crop_plan_field_activity__crop_plan_id=crop_plan_id
+                ).delete()
+                CropPlanFieldActivity.objects.filter(
+                    crop_plan_id=crop_plan_id
+                ).delete()
+        except (ProtectedError, IntegrityError):
+            return f'Crop plan "{name}" is in use and cannot be replaced'
+        return None
+
+    def create_crop_plans(self, rows, codes) -> list:
+        first_rows = {}
+        for row in rows:
+            if row.crop_plan not in self.crop_plans:
+                first_rows.setdefault(row.crop_plan, row)
+
+        # Crop plans are shared: only replace those of the organization's
+        # products (others may not even be visible through RLS)
+        existing = {
+            name: (pk, product_id) for name, pk, product_id in
+            CropPlan.objects
+            .filter(name__in=list(first_rows))
+            .values_list('name', 'pk', 'product_id')
+        }
+        own_products = set(
+            resources.ProductHiCat.objects
+            .filter(
+                organization_id=self.organization_id,
+                pk__in=[product_id for _, product_id in existing.values()],
+            )
+            .values_list('pk', flat=True)
+        ) if existing and self.replace else set()
+
+        new = []
+        for name, row in first_rows.items():
+            self.crop_plans[name] = None
+            if name in existing:
+                crop_plan_id, product_id = existing[name]
+                if not self.replace:
+                    self.plan_errors[name] = (
+                        f'Crop plan "{name}" already exists'
+                    )
+                elif product_id not in own_products:
+                    self.plan_errors[name] = (
+                        f'Crop plan "{name}" belongs to another organization'
+                    )
+                elif error := self.replace_crop_plan(name, crop_plan_id):
+                    self.plan_errors[name] = error
+                else:
+                    self.crop_plans[name] = crop_plan_id
+                    self.result.crop_plans += 1
+                continue
+
+            product_id = codes.get('product', {}).get(row.product)
+            if product_id is None:
+                self.plan_errors[name] = f'Unknown product code "{row.product}"'
+                continue
+            new.append(CropPlan(
+                name=name,
+                product_id=product_id,
+                ref_date=row.ref_date,
+            ))
+
+        for crop_plan in CropPlan.objects.bulk_create(new):
+            self.crop_plans[crop_plan.name] = crop_plan.pk
+        self.result.crop_plans += len(new)
+
+        valid = []
+        for row in rows:
+            if self.crop_plans.get(row.crop_plan) is not None:
+                valid.append(row)
+            else:
+                self.fail(row, self.plan_errors[row.crop_plan])
+        return valid
+
+    def create_activities(self, rows, codes) -> list:
+        new = {}
+        for row in rows:
+            key = row.activity_key
+            if key in self.activities or key in new:
+                continue
+            category_id = codes.get('category', {}).get(row.category)
+            if category_id is None:
+                self.activities[key] = None
+                self.activity_errors[key] = (
+                    f'Activity "{row.activity}": unknown category '
+                    f'"{row.category}"'
+                )
+                continue
+            new[key] = CropPlanFieldActivity(
+                crop_plan_id=self.crop_plans[row.crop_plan],
+                category_id=category_id,
+                time_from_ref_date=row.days,
+            )
+
+        CropPlanFieldActivity.objects.bulk_create(new.values())
+        for key, activity in new.items():
+            self.activities[key] = activity.pk
+        self.result.activities += len(new)
+
+        valid = []
+        for row in rows:
+            if self.activities.get(row.activity_key) is not None:
+                valid.append(row)
+            else:
+                # Every row of the activity, incl. continuation rows
+                self.fail(row, self.activity_errors[row.activity_key])
+        return valid
+
+    def create_elements(self, rows, codes):
+        new = []
+        for row in rows:
+            if row.element is None:
+                continue
+            kind, code = row.element
+            pk = codes.get(kind, {}).get(code)
+            if pk is None:
+                self.fail(row, f'Unknown or ambiguous {kind} "{code}"')
+                continue
+            new.append(CropPlanFieldActivityElement(
+                crop_plan_field_activity_id=self.activities[row.activity_key],
+                **{f'{kind}_id': pk},
+            ))
+
+        CropPlanFieldActivityElement.objects.bulk_create(new)
+        self.result.elements += len(new)
+
+def import_crop_plans(
+    file,
+    organization_id,
+    file_format: str = CSV,
+    replace: bool = False,
+    batch_size: int = None,
+) -> ImportResult:
+    """ Codes are resolved within `organization_id` (shared ones globally) """
+    if file_format not in FORMATS:
+        raise ValueError(
+            f'Got an invalid format: {file_format}. '
+            f'Must be one of {", ".join(FORMATS)}'
+        )
+    importer = Importer(organization_id, replace=replace)
+    return importer.run(read_rows(file, file_format), batch_size=batch_size)
@@ -0,0 +1,51 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from core.rls import organization_context
+from farmplanning.exports import DATASETS, FORMATS, PARQUET, export_chunks
+from mysite.routers import use_replica
+
+
+class Command(BaseCommand):
+    help = (
+        'Writes a plan-vs-actual dataset of an organization to a Parquet or '
+        'Arrow IPC file in constant memory (see farmplanning.exports).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('organization', help='Organization id')
+        parser.add_argument('dataset', choices=sorted(DATASETS))
+        parser.add_argument('output', help='File to write')
+        parser.add_argument(
+            '--format',
+            choices=sorted(FORMATS),
+            default=PARQUET,
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Rows per record batch (default: EXPORT_CHUNK_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        written = 0
+        try:
+            with (
+                organization_context(options['organization']),
+                use_replica(),
+                open(options['output'], 'wb') as output,
+            ):
+                for chunk in export_chunks(
+                    options['dataset'],
+                    options['organization'],
+                    options['format'],
+                    chunk_size=options['chunk_size'],
+                ):
+                    output.write(chunk)
+                    written += len(chunk)
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} bytes to {options["output"]}'
+        ))
@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from farmplanning.synthetic import SCALES, generate_organization
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates a synthetic organization (categories, equipment, ranches, '
+        'fields, crop plans, field plans, activities, elements, inventory) '
+        'for load testing and `run_benchmarks`. Never run against production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help='Organization name')
+        parser.add_argument('--scale', choices=SCALES, default='target')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--admin',
+            metavar='USERNAME',
+            help='Make this user an admin of the new organization',
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options['admin']:
+            try:
+                user = get_user_model().objects.get(username=options['admin'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'User {options["admin"]} does not exist')
+
+        organization, counts = generate_organization(
+            options['name'],
+            SCALES[options['scale']],
+            seed=options['seed'],
+            user=user,
+        )
+        for label, count in sorted(counts.items()):
+            self.stdout.write(f'  {count:8d}  {label}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Created organization {organization.pk}'
+        ))
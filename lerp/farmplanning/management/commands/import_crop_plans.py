@@ -0,0 +1,63 @@
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from core.rls import organization_context
+from farmplanning.imports import CSV, FORMATS, XLSX, import_crop_plans
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports CropPlan templates from a CSV or XLSX sheet, one row per '
+        'activity element (see farmplanning.imports). Invalid rows are '
+        'reported and skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('organization', help='Organization id')
+        parser.add_argument('file', help='CSV or XLSX file to read')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Default: from the file extension',
+        )
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help='Replace the activities of crop plans that already exist',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Rows per transaction (default: IMPORT_BATCH_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['file'])
+        file_format = options['format'] or (
+            XLSX if path.suffix.lower() == '.xlsx' else CSV
+        )
+        try:
+            with (
+                organization_context(options['organization']),
+                path.open('rb') as file,
+            ):
+                result = import_crop_plans(
+                    file,
+                    options['organization'],
+                    file_format,
+                    replace=options['replace'],
+                    batch_size=options['batch_size'],
+                )
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+        for row_number, message in result.errors:
+            self.stderr.write(f'Row {row_number}: {message}')
+        style = self.style.WARNING if result.errors else self.style.SUCCESS
+        self.stdout.write(style(
+            f'Imported {result.crop_plans} crop plans, {result.activities} '
+            f'activities, {result.elements} elements '
+            f'({len(result.errors)} rows with errors)'
+        ))
@@ -0,0 +1,53 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+import organizations.models as orgs
+from core.rls import organization_context
+from farmplanning.posting import post_actuals
+
+
+class Command(BaseCommand):
+    help = (
+        'Posts executed field activity elements to accounting as '
+        'CashFlowItems. Safe to rerun after a failure.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('organization', help='Organization id')
+        parser.add_argument(
+            '--date',
+            type=date.fromisoformat,
+            default=date.today(),
+            help='Posting date (YYYY-MM-DD), defaults to today',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def progress(self, processed, to_process, posted):
+        self.stdout.write(
+            f'Processed {processed} of {to_process} elements, posted {posted}'
+        )
+
+    def handle(self, *args, **options):
+        with organization_context(options['organization']):
+            try:
+                organization = orgs.Organization.objects.get(
+                    pk=options['organization']
+                )
+            except (orgs.Organization.DoesNotExist, ValueError):
+                raise CommandError(
+                    f'Organization {options["organization"]} does not exist'
+                )
+
+            result = post_actuals(
+                organization,
+                options['date'],
+                batch_size=options['batch_size'],
+                progress=self.progress,
+            )
+        self.stdout.write(self.style.SUCCESS(f'Posted {result.posted} elements'))
+        if result.unmapped:
+            self.stdout.write(self.style.WARNING(
+                f'{len(result.unmapped)} elements are missing a cost or '
+                f'accounting category link: {result.unmapped[:20]}'
+            ))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+
+import organizations.models as orgs
+from core.rls import organization_context
+from farmplanning.benchmarks import (
+    BENCHMARKS,
+    previous_results,
+    record_results,
+    run_benchmark,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Times key operations against an organization (see '
+        '`generate_synthetic_org`), compares them with the previous recorded '
+        'run and appends the results to BENCHMARK_RESULTS_FILE.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('organization', help='Organization id')
+        parser.add_argument(
+            '--only',
+            action='append',
+            choices=BENCHMARKS,
+            help='Run only these benchmarks (repeatable)',
+        )
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument(
+            '--no-record',
+            action='store_true',
+            help="Don't append the results to BENCHMARK_RESULTS_FILE",
+        )
+
+    def handle(self, *args, **options):
+        with organization_context(options['organization']):
+            try:
+                organization = orgs.Organization.objects.get(
+                    pk=options['organization']
+                )
+            except (orgs.Organization.DoesNotExist, ValueError):
+                raise CommandError(
+                    f'Organization {options["organization"]} does not exist'
+                )
+
+            previous = previous_results()
+            results = []
+            for name in options['only'] or BENCHMARKS:
+                result = run_benchmark(name, organization, options['repeat'])
+                results.append(result)
+
+                change = ''
+                if name in previous and previous[name]['min_ms']:
+                    ratio = result['min_ms'] / previous[name]['min_ms']
+                    change = f' ({ratio - 1:+.0%} vs previous)'
+                self.stdout.write(
+                    f'{name:28s} {result["min_ms"]:10.1f} ms '
+                    f'{result["queries"]:6d} queries{change}'
+                )
+
+            if not options['no_record']:
+                record_results(results, organization)
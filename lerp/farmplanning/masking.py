@@ -0,0 +1,105 @@
+"""
+# Financial Field Masking
+Fields listed in FINANCIAL_FIELDS are hidden from users without
+view_financials. The decision is taken once per request from the compiled
+permissions (see farmplanning.permissions) and memoized per model; masked
+columns are removed from the SELECT with defer(), including those of
+select_related models, so hidden fields cost nothing to fetch or serialize.
+
+Serializers must only read `policy.visible_fields(...)` - touching a deferred
+field would issue one query per object.
+"""
+
+from functools import cached_property
+
+import accounting.models as accounting
+import resources.models as resources
+import equipment.models as equipment
+from farmplanning.models import PeriodSnapshot
+from farmplanning.permissions import SCOPES
+
+
+FINANCIAL_FIELDS = {
+    resources.LaborHiCat: ('cost_per_si_unit',),
+    resources.MaterialHiCat: ('cost_per_si_unit',),
+    resources.ProductHiCat: ('price_per_si_unit',),
+    equipment.TractorModel: ('cost_per_si_unit',),
+    equipment.ImplementHiCat: ('cost_per_si_unit',),
+    equipment.Tractor: ('cost_per_si_unit',),
+    equipment.Implement: ('cost_per_si_unit',),
+    accounting.CashFlowItem: ('amount',),
+    accounting.PeriodBalance: ('amount',),
+    PeriodSnapshot: ('balance', 'plan_total', 'actual_total'),
+}
+
+def select_related_tree(model, depth: int = 5) -> dict:
+    """
+    The relations `select_related()` without arguments joins: non-null
+    forward FKs, up to Query.max_depth levels
+    """
+    if depth <= 0:
+        return {}
+    return {
+        field.name: select_related_tree(field.related_model, depth - 1)
+        for field in model._meta.concrete_fields
+        if field.is_relation
+        and not field.null
+        and not field.remote_field.parent_link
+    }
+
+class MaskPolicy:
+    """ Build once per request: MaskPolicy(request_permissions(request, org)) """
+
+    def __init__(self, permissions):
+        self.permissions = permissions
+        self._hidden = {}
+
+    @cached_property
+    def view_financials(self) -> bool:
+        """ Financial columns are shown only if every reachable container allows """
+        return all(
+            self.permissions.view_financials(model) for model in SCOPES
+        )
+
+    def hidden_fields(self, model) -> tuple:
+        if model not in self._hidden:
+            self._hidden[model] = (
+                () if self.view_financials
+                else FINANCIAL_FIELDS.get(model, ())
+            )
+        return self._hidden[model]
+
+    def visible_fields(self, model, field_names) -> list:
+        hidden = self.hidden_fields(model)
+        return [name for name in field_names if name not in hidden]
+
+    def deferred_paths(self, model, select_related, prefix='') -> list:
+        """
+        Hidden fields of `model` and of its select_related tree. A bare
+        `select_related()` (True) is expanded into the relations it joins.
+        """
+        paths = [f'{prefix}{name}' for name in self.hidden_fields(model)]
+        if select_related is True:
+            select_related = select_related_tree(model)
+        if not isinstance(select_related, dict):
+            return paths
+
+        for relation, children in select_related.items():
+            related_model = model._meta.get_field(relation).related_model
+            paths += self.deferred_paths(
+                related_model,
+                children,
+                prefix=f'{prefix}{relation}__',
+            )
+        return paths
+
+    def mask(self, queryset):
+        """ Defers every hidden column reachable from the queryset's SELECT """
+        if self.view_financials:
+            return queryset
+
+        paths = self.deferred_paths(
+            queryset.model,
+            queryset.query.select_related,
+        )
+        return queryset.defer(*paths) if paths else queryset
@@ -40,7 +40,9 @@ def create_bool_sum_constraint(
 # High-level Human-Oriented Containers
 # ==============================================================================
 
-class RanchPlan(models.Model):
+class RanchPlan(core.InheritedOrgObject):
+    organization_parent = 'ranch'
+
     ranch = models.ForeignKey(realestate.Ranch, on_delete=PROTECT)
     name = models.CharField(
         max_length=settings.DEFAULT_MAX_CHAR,
@@ -66,7 +68,9 @@ class CropPlan(models.Model):
     def to_field_plan(self, field: realestate.Field, ranch_plan: RanchPlan):
         ...
 
-class FieldPlan(models.Model):
+class FieldPlan(core.InheritedOrgObject):
+    organization_parent = 'ranch_plan'
+
     crop_plan = models.ForeignKey(CropPlan, on_delete=PROTECT)
     ranch_plan = models.ForeignKey(RanchPlan, on_delete=PROTECT)
     field = models.ForeignKey(realestate.Field, on_delete=PROTECT)
@@ -76,6 +80,9 @@ class FieldPlan(models.Model):
 # ==============================================================================
 
 class FieldActivityABC(models.Model):
+    class Meta:
+        abstract = True
+
     time_from_ref_date = models.DurationField(blank=True, null=True)
     category = models.ForeignKey(resources.ActivityHiCat, on_delete=PROTECT)
 
@@ -93,7 +100,9 @@ class CropPlanFieldActivity(FieldActivityABC):
     def to_field_activity(self, field_plan):
         return FieldActivity.objects.create(field_plan=field_plan)
 
-class FieldActivity(FieldActivityABC):
+class FieldActivity(core.InheritedOrgObject, FieldActivityABC):
+    organization_parent = 'field_plan'
+
     field_plan = models.ForeignKey(FieldPlan, on_delete=PROTECT)
     is_actual = models.BooleanField(default=False)
 
@@ -224,7 +233,7 @@ class CropPlanFieldActivityElement(models.Model):
     def to_field_activity_element(self, ):
         field_activity_element = FieldActivityElement.objects.create()
 
-class FieldActivityElement(models.Model):
+class FieldActivityElement(core.InheritedOrgObject):
     class Meta:
         constraints = create_bool_sum_constraint(
             field_names=[
@@ -236,6 +245,8 @@ class FieldActivityElement(models.Model):
             constraint_name='exactly_one_fae_field'
         )
 
+    organization_parent = 'field_activity'
+
     field_activity = models.ForeignKey(FieldActivity, on_delete=PROTECT)
 
     labor = models.ForeignKey(
@@ -262,6 +273,341 @@ class FieldActivityElement(models.Model):
         blank=True,
         null=True
     )
+    # Set once the (actual) element is posted - see farmplanning.posting
+    cash_flow_item = models.OneToOneField(
+        accounting.CashFlowItem,
+        on_delete=PROTECT,
+        blank=True,
+        null=True,
+        editable=False,
+        related_name='field_activity_element'
+    )
+
+    def to_acc_cfi(self, posting_date=None, user=None, organization=None):
+        """
+        Posts this element alone. Prefer posting.post_actuals for batches.
+        `organization` defaults to the element's denormalized one.
+        """
+        from farmplanning import posting
+
+        if self.cash_flow_item_id is not None:
+            return self.cash_flow_item
+
+        organization = organization or self.organization
+        result = posting.post_elements(
+            posting.postable_elements(organization).filter(pk=self.pk),
+            organization,
+            posting_date or date.today(),
+            user=user,
+        )
+        if result.unmapped:
+            raise ValueError(
+                f'{self} is missing a cost or accounting category link'
+            )
+
+        self.refresh_from_db(fields=['cash_flow_item'])
+        return self.cash_flow_item
+
+# ==============================================================================
+# Scenarios
+# ==============================================================================
+# What-if variants of a RanchPlan - see farmplanning.scenarios
+
+class Scenario(core.InheritedOrgObject):
+    """
+    Copy-on-write overlay of a RanchPlan: only the field plans it changes are
+    stored (ScenarioFieldPlan), everything else reads through to the base.
+    """
+
+    class Meta:
+        unique_together = [('ranch_plan', 'name')]
+
+    organization_parent = 'ranch_plan'
+
+    ranch_plan = models.ForeignKey(
+        RanchPlan,
+        on_delete=models.CASCADE,
+        related_name='scenarios'
+    )
+    name = models.CharField(max_length=settings.DEFAULT_MAX_CHAR)
+    description = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+'
+    )
+
+    def __str__(self):
+        return f'{self.ranch_plan} | {self.name}'
+
+class ScenarioFieldPlan(core.InheritedOrgObject):
+    """
+    One overridden field plan of a Scenario:
+    - field_plan + crop_plan: the base FieldPlan switched to another CropPlan
+    - field_plan, no crop_plan: the base FieldPlan left out of the scenario
+    - no field_plan: a field planted only in the scenario
+    """
+
+    class Meta:
+        unique_together = [('scenario', 'field_plan')]
+        constraints = [
+            CheckConstraint(
+                condition=(
+                    models.Q(field_plan__isnull=False)
+                    | models.Q(crop_plan__isnull=False)
+                ),
+                name='scenario_field_plan_not_empty',
+            ),
+        ]
+        verbose_name = 'Scenario Field Plan'
+        verbose_name_plural = 'Scenario Field Plans'
+
+    organization_parent = 'scenario'
+
+    scenario = models.ForeignKey(
+        Scenario,
+        on_delete=models.CASCADE,
+        related_name='field_plans'
+    )
+    field_plan = models.ForeignKey(
+        FieldPlan,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='+'
+    )
+    field = models.ForeignKey(realestate.Field, on_delete=PROTECT)
+    crop_plan = models.ForeignKey(
+        CropPlan,
+        on_delete=PROTECT,
+        blank=True,
+        null=True
+    )
+
+# ==============================================================================
+# Period Close
+# ==============================================================================
+
+class PeriodCloseStatus(models.TextChoices):
+    OPEN = 'open', 'Open'
+    CLOSED = 'closed', 'Closed'
+
+class PeriodClose(orgs.OrgObject):
+    class Meta:
+        unique_together = [('organization', 'period')]
+        verbose_name = 'Period Close'
+        verbose_name_plural = 'Period Closes'
+
+    period = models.DateField(help_text='First day of the month')
+    status = models.CharField(
+        max_length=6,
+        choices=PeriodCloseStatus,
+        default=PeriodCloseStatus.OPEN
+    )
+    closed_at = models.DateTimeField(blank=True, null=True)
+    closed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=PROTECT,
+        blank=True,
+        null=True,
+        related_name='+'
+    )
+
+    def __str__(self):
+        return f'{self.period:%Y-%m} ({self.status})'
+
+class PeriodSnapshot(models.Model):
+    """
+    Frozen totals written by farmplanning.closing.close_period. Kept narrow and
+    scalar-only so it can be scanned/exported column-wise. A null ranch_plan
+    holds CashFlowItems that did not come from field activities.
+    """
+
+    class Meta:
+        verbose_name = 'Period Snapshot'
+        verbose_name_plural = 'Period Snapshots'
+        indexes = [
+            models.Index(
+                fields=['organization', 'period'],
+                name='period_snapshot_org_period_idx'
+            ),
+        ]
+
+    period_close = models.ForeignKey(
+        PeriodClose,
+        on_delete=models.CASCADE,
+        related_name='snapshots'
+    )
+    # Denormalized from period_close for single-table report scans
+    organization = models.ForeignKey(
+        'organizations.Organization',
+        on_delete=PROTECT,
+        related_name='+'
+    )
+    period = models.DateField()
+
+    ranch_plan = models.ForeignKey(
+        RanchPlan,
+        on_delete=PROTECT,
+        blank=True,
+        null=True,
+        related_name='+'
+    )
+    accounting_bucket = models.ForeignKey(
+        accounting.AccountingBucketHiCat,
+        on_delete=PROTECT,
+        blank=True,
+        null=True,
+        related_name='+'
+    )
+    currency = models.CharField(max_length=3)
+    balance = models.FloatField(default=0, help_text='Sum of CashFlowItems')
+    plan_total = models.FloatField(default=0, help_text='Planned element cost')
+    actual_total = models.FloatField(default=0, help_text='Posted element cost')
+
+# ==============================================================================
+# Permissions
+# ==============================================================================
+# Grants cascade down the container stack - see farmplanning.permissions
+
+class Role(orgs.OrgObject):
+    class Meta:
+        unique_together = [('organization', 'name')]
+
+    name = models.CharField(max_length=settings.DEFAULT_MAX_CHAR)
+    description = models.TextField(blank=True, null=True)
+    is_admin = models.BooleanField(
+        default=False,
+        help_text='Access to every container of the organization'
+    )
+    can_change = models.BooleanField(default=False)
+    view_financials = models.BooleanField(default=False)
+
+    def __str__(self):
+        return self.name
+
+class RoleAssignment(models.Model):
+    class Meta:
+        unique_together = [('user', 'role')]
+        verbose_name = 'Role Assignment'
+        verbose_name_plural = 'Role Assignments'
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='role_assignments'
+    )
+    role = models.ForeignKey(
+        Role,
+        on_delete=models.CASCADE,
+        related_name='assignments'
+    )
+
+class ContainerGrant(models.Model):
+    class Meta:
+        constraints = create_bool_sum_constraint(
+            field_names=['ranch_plan_id', 'field_plan_id', 'crop_plan_id'],
+            constraint_name='exactly_one_container_grant_field'
+        )
+        verbose_name = 'Container Grant'
+        verbose_name_plural = 'Container Grants'
+
+    role = models.ForeignKey(Role, on_delete=models.CASCADE, related_name='grants')
+    ranch_plan = models.ForeignKey(
+        RanchPlan,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True
+    )
+    field_plan = models.ForeignKey(
+        FieldPlan,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True
+    )
+    crop_plan = models.ForeignKey(
+        CropPlan,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True
+    )
+
+# ==============================================================================
+# Signals
+# ==============================================================================
 
-    def to_acc_cfi():
-        raise NotImplementedError
+import farmplanning.permissions # registers permission cache invalidation
+from core.cache import register_containers, register_group
+from core.changefeed import register_feed
+from core.partitioning import by_organization, register_partitioning
+from core.sync import register_sync
+
+register_group(
+    'plans',
+    RanchPlan,
+    FieldPlan,
+    FieldActivity,
+    FieldActivityElement,
+    Scenario,
+    ScenarioFieldPlan,
+)
+
+def activity_ranch_plan(activity):
+    return activity.field_plan.ranch_plan_id
+
+def element_ranch_plan(element):
+    return element.field_activity.field_plan.ranch_plan_id
+
+# Per-RanchPlan versions for conditional plan reads (see core.api.conditional)
+register_containers('plans', {
+    RanchPlan: lambda plan: plan.pk,
+    FieldPlan: lambda plan: plan.ranch_plan_id,
+    FieldActivity: activity_ranch_plan,
+    FieldActivityElement: element_ranch_plan,
+    Scenario: lambda scenario: scenario.ranch_plan_id,
+    ScenarioFieldPlan: lambda overlay: overlay.scenario.ranch_plan_id,
+}, movable=[FieldPlan])
+
+# Live deltas for open plans (see core.changefeed)
+register_feed(
+    FieldActivity,
+    'ranch_plan',
+    activity_ranch_plan,
+    fields=['field_plan_id', 'category_id', 'time_from_ref_date', 'is_actual'],
+)
+register_feed(
+    FieldActivityElement,
+    'ranch_plan',
+    element_ranch_plan,
+    fields=[
+        'field_activity_id',
+        'labor_id',
+        'material_id',
+        'tractor_id',
+        'implement_id',
+    ],
+)
+
+# Offline device sync (see core.sync) - foremen mark activities actual
+register_sync(
+    FieldActivity,
+    fields=['field_plan_id', 'category_id', 'time_from_ref_date', 'is_actual'],
+    writable=['time_from_ref_date', 'is_actual'],
+)
+register_sync(
+    FieldActivityElement,
+    fields=[
+        'field_activity_id',
+        'labor_id',
+        'material_id',
+        'tractor_id',
+        'implement_id',
+    ],
+)
+
+# Plans are always read per organization (see core.partitioning)
+register_partitioning(FieldActivity, by_organization())
+register_partitioning(FieldActivityElement, by_organization())
@@ -0,0 +1,306 @@
+"""
+# Container Permissions
+Roles grant access to containers (RanchPlan, FieldPlan, CropPlan) and everything
+inside them:
+    RanchPlan -> FieldPlan -> FieldActivity -> FieldActivityElement
+    CropPlan -> CropPlanFieldActivity -> CropPlanFieldActivityElement
+
+`compile_permissions` resolves a user's roles in an organization once into
+CompiledPermissions: for each container type, the allowed ids plus the ids
+where the role also has can_change/view_financials. RanchPlan grants are
+expanded into FieldPlan ids at compile time so that every list queryset is
+filtered with a single `IN` on a local (or one-join) column.
+
+Compiled permissions are cached per organization and user (core.cache). Any
+change to roles, assignments, grants or field plans bumps the organization's
+'permissions' version, which invalidates every cached entry of that
+organization at once.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.cache import bump_version, cached
+from core.changefeed import register_channel
+from core.rls import register_membership
+
+from farmplanning.models import (
+    ContainerGrant,
+    CropPlan,
+    CropPlanFieldActivity,
+    CropPlanFieldActivityElement,
+    FieldActivity,
+    FieldActivityElement,
+    FieldPlan,
+    RanchPlan,
+    Role,
+    RoleAssignment,
+    Scenario,
+    ScenarioFieldPlan,
+)
+
+
+RANCH_PLAN = 'ranch_plan'
+FIELD_PLAN = 'field_plan'
+CROP_PLAN = 'crop_plan'
+
+# model -> (container type, lookup of the container id from the model)
+SCOPES = {
+    RanchPlan: (RANCH_PLAN, 'pk'),
+    FieldPlan: (FIELD_PLAN, 'pk'),
+    FieldActivity: (FIELD_PLAN, 'field_plan_id'),
+    FieldActivityElement: (FIELD_PLAN, 'field_activity__field_plan_id'),
+    # Scenarios span the whole RanchPlan
+    Scenario: (RANCH_PLAN, 'ranch_plan_id'),
+    ScenarioFieldPlan: (RANCH_PLAN, 'scenario__ranch_plan_id'),
+    CropPlan: (CROP_PLAN, 'pk'),
+    CropPlanFieldActivity: (CROP_PLAN, 'crop_plan_id'),
+    CropPlanFieldActivityElement: (
+        CROP_PLAN,
+        'crop_plan_field_activity__crop_plan_id'
+    ),
+}
+
+# CropPlans have no organization: they belong to their product's
+CROP_PLAN_ORGANIZATIONS = {
+    CropPlan: 'product__organization_id',
+    CropPlanFieldActivity: 'crop_plan__product__organization_id',
+    CropPlanFieldActivityElement: (
+        'crop_plan_field_activity__crop_plan__product__organization_id'
+    ),
+}
+
+VIEW = 'view'
+CHANGE = 'change'
+VIEW_FINANCIALS = 'view_financials'
+
+@dataclass(frozen=True)
+class ContainerAccess:
+    """ `None` means every container of the organization """
+    view: Optional[frozenset] = frozenset()
+    change: Optional[frozenset] = frozenset()
+    view_financials: Optional[frozenset] = frozenset()
+
+    def ids(self, action: str = VIEW) -> Optional[frozenset]:
+        return getattr(self, action)
+
+    def allows(self, container_id, action: str = VIEW) -> bool:
+        ids = self.ids(action)
+        return ids is None or container_id in ids
+
+    def allows_all(self, action: str) -> bool:
+        """ True if `action` is allowed on every viewable container """
+        ids = self.ids(action)
+        return ids is None or (self.view is not None and self.view <= ids)
+
+@dataclass(frozen=True)
+class CompiledPermissions:
+    organization_id: object
+    user_id: object
+    containers: dict # container type -> ContainerAccess
+
+    def access(self, container_type: str) -> ContainerAccess:
+        return self.containers.get(container_type, ContainerAccess())
+
+    def filter(self, queryset, action: str = VIEW):
+        """
+        Restricts `queryset` (a container or contained model) to `action`.
+        Org-scoped querysets always get an explicit organization_id filter,
+        which prunes hash-partitioned tables (see core.partitioning); crop
+        plans are filtered by the organization of their product.
+        """
+        container_type, lookup = SCOPES[queryset.model]
+        organization_lookup = CROP_PLAN_ORGANIZATIONS.get(
+            queryset.model, 'organization_id'
+        )
+        queryset = queryset.filter(
+            **{organization_lookup: self.organization_id}
+        )
+
+        ids = self.access(container_type).ids(action)
+        if ids is None:
+            return queryset
+        return queryset.filter(**{f'{lookup}__in': ids})
+
+    def view_financials(self, model) -> bool:
+        """ Decided once per model: every reachable container must allow it """
+        container_type, _ = SCOPES[model]
+        return self.access(container_type).allows_all(VIEW_FINANCIALS)
+
+# ==============================================================================
+# Compilation
+# ==============================================================================
+
+def compile_permissions(user, organization_id) -> CompiledPermissions:
+    """ Three queries regardless of the number of roles or grants """
+    roles = {
+        role.pk: role for role in
+        Role.objects.filter(
+            organization_id=organization_id,
+            assignments__user=user,
+        ).distinct()
+    }
+
+    ids = {
+        (container_type, action): set()
+        for container_type in (RANCH_PLAN, FIELD_PLAN, CROP_PLAN)
+        for action in (VIEW, CHANGE, VIEW_FINANCIALS)
+    }
+    unrestricted = set()
+    for role in roles.values():
+        if role.is_admin:
+            for container_type in (RANCH_PLAN, FIELD_PLAN, CROP_PLAN):
+                unrestricted.add((container_type, VIEW))
+                if role.can_change:
+                    unrestricted.add((container_type, CHANGE))
+                if role.view_financials:
+                    unrestricted.add((container_type, VIEW_FINANCIALS))
+
+    def add(container_type, container_id, role):
+        ids[(container_type, VIEW)].add(container_id)
+        if role.can_change:
+            ids[(container_type, CHANGE)].add(container_id)
+        if role.view_financials:
+            ids[(container_type, VIEW_FINANCIALS)].add(container_id)
+
+    ranch_plan_roles = {}
+    grants = ContainerGrant.objects.filter(role__in=list(roles)).values_list(
+        'role_id', 'ranch_plan_id', 'field_plan_id', 'crop_plan_id'
+    )
+    for role_id, ranch_plan_id, field_plan_id, crop_plan_id in grants:
+        role = roles[role_id]
+        if ranch_plan_id is not None:
+            add(RANCH_PLAN, ranch_plan_id, role)
+            ranch_plan_roles.setdefault(ranch_plan_id, []).append(role)
+        elif field_plan_id is not None:
+            add(FIELD_PLAN, field_plan_id, role)
+        else:
+            add(CROP_PLAN, crop_plan_id, role)
+
+    # Cascade RanchPlan grants into their FieldPlans
+    field_plans = FieldPlan.objects.filter(
+        ranch_plan_id__in=list(ranch_plan_roles)
+    ).values_list('pk', 'ranch_plan_id')
+    for field_plan_id, ranch_plan_id in field_plans:
+        for role in ranch_plan_roles[ranch_plan_id]:
+            add(FIELD_PLAN, field_plan_id, role)
+
+    return CompiledPermissions(
+        organization_id=organization_id,
+        user_id=user.pk,
+        containers={
+            container_type: ContainerAccess(**{
+                action: (
+                    None if (container_type, action) in unrestricted
+                    else frozenset(ids[(container_type, action)])
+                )
+                for action in (VIEW, CHANGE, VIEW_FINANCIALS)
+            })
+            for container_type in (RANCH_PLAN, FIELD_PLAN, CROP_PLAN)
+        },
+    )
+
+# ==============================================================================
+# Cache
+# ==============================================================================
+
+PERMISSIONS_GROUP = 'permissions'
+
+def invalidate_permissions(organization_id):
+    bump_version(organization_id, PERMISSIONS_GROUP)
+
+def get_permissions(user, organization_id) -> CompiledPermissions:
+    return cached(
+        organization_id,
+        (PERMISSIONS_GROUP,),
+        f'permissions:{user.pk}',
+        lambda: compile_permissions(user, organization_id),
+        timeout=settings.PERMISSION_CACHE_TIMEOUT,
+    )
+
+def request_permissions(request, organization_id) -> CompiledPermissions:
+    """ Memoized on the request so a view resolves permissions once """
+    memo = request.__dict__.setdefault('_farmplanning_permissions', {})
+    if organization_id not in memo:
+        memo[organization_id] = get_permissions(request.user, organization_id)
+
+    return memo[organization_id]
+
+# ==============================================================================
+# Invalidation
+# ==============================================================================
+
+def invalidate_for_role(role_id):
+    organization_id = (
+        Role.objects.filter(pk=role_id)
+        .values_list('organization_id', flat=True)
+        .first()
+    )
+    if organization_id is not None:
+        invalidate_permissions(organization_id)
+
+@receiver(post_save, sender=Role, dispatch_uid='permissions_role_saved')
+@receiver(post_delete, sender=Role, dispatch_uid='permissions_role_deleted')
+def role_changed(sender, instance, **kwargs):
+    invalidate_permissions(instance.organization_id)
+
+@receiver(
+    post_save,
+    sender=RoleAssignment,
+    dispatch_uid='permissions_assignment_saved'
+)
+@receiver(
+    post_delete,
+    sender=RoleAssignment,
+    dispatch_uid='permissions_assignment_deleted'
+)
+@receiver(post_save, sender=ContainerGrant, dispatch_uid='permissions_grant_saved')
+@receiver(
+    post_delete,
+    sender=ContainerGrant,
+    dispatch_uid='permissions_grant_deleted'
+)
+def grant_changed(sender, instance, **kwargs):
+    invalidate_for_role(instance.role_id)
+
+@receiver(post_save, sender=FieldPlan, dispatch_uid='permissions_fp_saved')
+@receiver(post_delete, sender=FieldPlan, dispatch_uid='permissions_fp_deleted')
+def field_plan_changed(sender, instance, **kwargs):
+    # New field plans must show up under already granted ranch plans
+    invalidate_permissions(instance.organization_id)
+
+# ==============================================================================
+# Membership
+# ==============================================================================
+
+def role_organizations(user):
+    """ Users belong to the organizations they hold a role in """
+    return (
+        Role.objects
+        .filter(assignments__user=user)
+        .values_list('organization_id', flat=True)
+    )
+
+register_membership(role_organizations)
+
+# ==============================================================================
+# Change Feed
+# ==============================================================================
+
+def can_subscribe_ranch_plan(user, organization_id, ranch_plan_id) -> bool:
+    """ Plan deltas cover every field plan, so the whole RanchPlan is needed """
+    try:
+        ranch_plan_id = int(ranch_plan_id)
+    except (TypeError, ValueError):
+        return False
+    return (
+        get_permissions(user, organization_id)
+        .access(RANCH_PLAN)
+        .allows(ranch_plan_id)
+    )
+
+register_channel('ranch_plan', can_subscribe_ranch_plan)
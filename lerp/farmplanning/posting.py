@@ -0,0 +1,208 @@
+"""
+# Posting Actuals
+Turns executed (is_actual) FieldActivityElements into accounting CashFlowItems.
+- accounting activity: FieldActivity.category.accounting_activity
+- accounting bucket: the element's resource category (labor/material) or asset
+(tractor/implement) accounting_bucket
+- amount: -(element amount * cost per SI unit); costs are cash outflows
+
+Posting is idempotent and resumable: an element is posted only while its
+cash_flow_item is null, the link is written in the same transaction as the
+CashFlowItem (one transaction per batch), and CashFlowItem ids are derived from
+the element id. A failed close can simply be rerun.
+"""
+
+import uuid
+from dataclasses import dataclass, field
+from datetime import date
+
+from django.db import transaction
+from django.db.models import F, FloatField
+from django.db.models.functions import Coalesce
+
+from core.history import bulk_create_with_history
+import accounting.models as accounting
+from accounting.rollups import apply_cash_flow_items, month_start
+from farmplanning.models import (
+    FieldActivityElement,
+    PeriodClose,
+    PeriodCloseStatus,
+)
+
+
+CFI_NAMESPACE = uuid.UUID('6f1c2b9e-7a43-4c1e-9a55-0c3e8f0d2a71')
+
+def cash_flow_item_id(element_pk) -> uuid.UUID:
+    """ Deterministic so a retried batch can never create a second item """
+    return uuid.uuid5(CFI_NAMESPACE, f'field_activity_element:{element_pk}')
+
+# ==============================================================================
+# Expressions
+# ==============================================================================
+
+def element_cost_expression(prefix: str = ''):
+    """
+    Cost of a FieldActivityElement (in its activity currency, SI units).
+    Only one resource FK is ever set, so Coalesce picks that resource's cost.
+    `prefix` lets the expression be used from related models, e.g.
+    'fieldactivityelement__'.
+    """
+    p = prefix
+    return Coalesce(
+        F(f'{p}labor__amount') * F(f'{p}labor__category__cost_per_si_unit'),
+        F(f'{p}material__amount')
+            * F(f'{p}material__category__cost_per_si_unit'),
+        F(f'{p}tractor__amount') * Coalesce(
+            F(f'{p}tractor__instance__cost_per_si_unit'),
+            F(f'{p}tractor__instance__model__cost_per_si_unit'),
+        ),
+        F(f'{p}implement__amount') * Coalesce(
+            F(f'{p}implement__instance__cost_per_si_unit'),
+            F(f'{p}implement__instance__category__cost_per_si_unit'),
+        ),
+        output_field=FloatField(),
+    )
+
+def element_bucket_expression(prefix: str = ''):
+    p = prefix
+    return Coalesce(
+        F(f'{p}labor__category__accounting_bucket'),
+        F(f'{p}material__category__accounting_bucket'),
+        F(f'{p}tractor__instance__accounting_bucket'),
+        F(f'{p}implement__instance__accounting_bucket'),
+    )
+
+def postable_elements(organization):
+    """ Executed elements of `organization` that have not been posted yet """
+    return (
+        FieldActivityElement.objects
+        .filter(
+            field_activity__is_actual=True,
+            organization=organization,
+            cash_flow_item__isnull=True,
+        )
+        .annotate(
+            posting_cost=element_cost_expression(),
+            posting_bucket=element_bucket_expression(),
+            posting_activity=F('field_activity__category__accounting_activity'),
+        )
+    )
+
+# ==============================================================================
+# Posting
+# ==============================================================================
+
+def check_period_open(organization, posting_date: date):
+    period_closed = PeriodClose.objects.filter(
+        organization=organization,
+        period=month_start(posting_date),
+        status=PeriodCloseStatus.CLOSED,
+    ).exists()
+    if period_closed:
+        raise ValueError(
+            f'{posting_date:%Y-%m} is closed. Reopen it before posting.'
+        )
+
+@dataclass
+class PostingResult:
+    posted: int = 0
+    unmapped: list = field(default_factory=list) # element pks missing links
+
+def post_elements(
+    elements,
+    organization,
+    posting_date: date,
+    user=None,
+) -> PostingResult:
+    """
+    Posts one batch of annotated elements (see `postable_elements`) inside a
+    single transaction. Rows already locked by a concurrent close are skipped.
+    Raises ValueError if `posting_date` falls in a closed period.
+    """
+    result = PostingResult()
+    with transaction.atomic():
+        check_period_open(organization, posting_date)
+        batch = list(
+            elements.select_for_update(of=('self',), skip_locked=True)
+        )
+        items = []
+        posted = []
+        for element in batch:
+            missing_link = (
+                element.posting_cost is None
+                or element.posting_bucket is None
+                or element.posting_activity is None
+            )
+            if missing_link:
+                result.unmapped.append(element.pk)
+                continue
+
+            item = accounting.CashFlowItem(
+                id=cash_flow_item_id(element.pk),
+                organization=organization,
+                accounting_activity_id=element.posting_activity,
+                accounting_bucket_id=element.posting_bucket,
+                date=posting_date,
+                amount=-element.posting_cost,
+            )
+            element.cash_flow_item = item
+            items.append(item)
+            posted.append(element)
+
+        if not items:
+            return result
+
+        bulk_create_with_history(
+            items,
+            accounting.CashFlowItem,
+            default_user=user,
+            default_change_reason='Posted from field activity actuals',
+        )
+        FieldActivityElement.objects.bulk_update(posted, ['cash_flow_item'])
+        apply_cash_flow_items(items)
+        result.posted = len(items)
+
+    return result
+
+def post_actuals(
+    organization,
+    posting_date: date,
+    batch_size: int = 1000,
+    user=None,
+    progress=None,
+) -> PostingResult:
+    """
+    Posts every unposted actual element of `organization` in keyset-ordered
+    batches. `progress(processed, to_process, posted)` is called after each
+    batch (unmapped elements are processed but not posted).
+    """
+    check_period_open(organization, posting_date)
+
+    total = PostingResult()
+    to_process = postable_elements(organization).count() if progress else 0
+    processed = 0
+    last_pk = 0
+    while True:
+        elements = (
+            postable_elements(organization)
+            .filter(pk__gt=last_pk)
+            .order_by('pk')[:batch_size]
+        )
+        pks = list(elements.values_list('pk', flat=True))
+        if not pks:
+            break
+
+        result = post_elements(
+            postable_elements(organization).filter(pk__in=pks),
+            organization,
+            posting_date,
+            user=user,
+        )
+        total.posted += result.posted
+        total.unmapped += result.unmapped
+        last_pk = pks[-1]
+        processed += len(pks)
+        if progress is not None:
+            progress(processed, max(to_process, processed), total.posted)
+
+    return total
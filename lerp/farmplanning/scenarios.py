@@ -0,0 +1,231 @@
+"""
+# Scenarios
+What-if variants of a RanchPlan ("switch these 20 fields to another CropPlan")
+stored as overlays: a Scenario row plus one ScenarioFieldPlan per field plan
+it changes. Creating a scenario is a single insert, and nothing of the base
+plan (FieldPlans, FieldActivities, elements) is copied.
+
+Reads merge the overlay into the base in SQL:
+- `scenario_field_plans` - the field plans as seen from a scenario, one
+  UNION ALL query
+- `compare_scenarios` - fields and area per CropPlan for the base plan and any
+  number of scenarios, one aggregate query
+
+Overlay rows are written in bulk (organization_id is set explicitly, see
+core.models.InheritedOrgObject) and bump the plan's cache version.
+"""
+
+from django.db import connection, transaction
+from django.db.models import CharField, F, Value
+
+from core.cache import bump_for_instance
+import realestate.models as realestate
+from farmplanning.models import (
+    FieldPlan,
+    RanchPlan,
+    Scenario,
+    ScenarioFieldPlan,
+)
+
+
+BASE = 'base'
+OVERLAY = 'scenario'
+
+def create_scenario(ranch_plan: RanchPlan, name: str, user=None, **kwargs):
+    """ O(1): the scenario starts as an empty overlay """
+    return Scenario.objects.create(
+        ranch_plan=ranch_plan,
+        name=name,
+        created_by=user,
+        **kwargs
+    )
+
+def touch(scenario: Scenario):
+    """ Bulk writes skip signals; bumps what saving the scenario would """
+    bump_for_instance(Scenario, scenario)
+
+# ==============================================================================
+# Overlay Writes
+# ==============================================================================
+
+@transaction.atomic
+def set_crop_plan(scenario: Scenario, field_plan_ids, crop_plan_id) -> int:
+    """
+    Switches base field plans to `crop_plan_id` in the scenario, or leaves
+    them out of it with None. Returns the number of overlay rows written.
+    """
+    field_plans = FieldPlan.objects.filter(
+        organization_id=scenario.organization_id,
+        ranch_plan_id=scenario.ranch_plan_id,
+        pk__in=list(field_plan_ids),
+    ).values_list('pk', 'field_id')
+
+    overlays = ScenarioFieldPlan.objects.bulk_create(
+        [
+            ScenarioFieldPlan(
+                organization_id=scenario.organization_id,
+                scenario=scenario,
+                field_plan_id=field_plan_id,
+                field_id=field_id,
+                crop_plan_id=crop_plan_id,
+            )
+            for field_plan_id, field_id in field_plans
+        ],
+        update_conflicts=True,
+        unique_fields=['scenario', 'field_plan'],
+        update_fields=['crop_plan'],
+    )
+    touch(scenario)
+    return len(overlays)
+
+def add_field(scenario: Scenario, field: realestate.Field, crop_plan_id):
+    """
+    Plants a field that has no FieldPlan in the base plan. Fields that have
+    one are switched with `set_crop_plan`, or they would be counted twice.
+    """
+    if field.organization_id != scenario.organization_id:
+        raise ValueError(f'{field} belongs to another organization')
+
+    planned = FieldPlan.objects.filter(
+        organization_id=scenario.organization_id,
+        ranch_plan_id=scenario.ranch_plan_id,
+        field=field,
+    ).exists()
+    if planned:
+        raise ValueError(
+            f'{field} already has a field plan in the base plan, '
+            f'use set_crop_plan instead'
+        )
+
+    return ScenarioFieldPlan.objects.create(
+        scenario=scenario,
+        field=field,
+        crop_plan_id=crop_plan_id,
+    )
+
+def reset(scenario: Scenario, field_plan_ids=None) -> int:
+    """ Drops overrides (all of them by default) so the base shows through """
+    overlays = ScenarioFieldPlan.objects.filter(scenario=scenario)
+    if field_plan_ids is not None:
+        overlays = overlays.filter(field_plan_id__in=list(field_plan_ids))
+    deleted, _ = overlays.delete()
+    return deleted
+
+# ==============================================================================
+# Reads
+# ==============================================================================
+
+def scenario_field_plans(scenario: Scenario) -> list[dict]:
+    """
+    [{'field_plan_id', 'field_id', 'crop_plan_id', 'source'}] of the
+    scenario: untouched base rows, then overridden and added rows. Removed
+    field plans are absent.
+    """
+    overlays = ScenarioFieldPlan.objects.filter(
+        organization_id=scenario.organization_id,
+        scenario=scenario,
+    )
+    base = (
+        FieldPlan.objects
+        .filter(
+            organization_id=scenario.organization_id,
+            ranch_plan_id=scenario.ranch_plan_id,
+        )
+        .exclude(pk__in=overlays.filter(field_plan__isnull=False).values(
+            'field_plan_id'
+        ))
+        .annotate(
+            merged_field_plan=F('pk'),
+            merged_field=F('field_id'),
+            merged_crop_plan=F('crop_plan_id'),
+            merged_source=Value(BASE, output_field=CharField()),
+        )
+    )
+    changed = (
+        overlays
+        .filter(crop_plan__isnull=False)
+        .annotate(
+            merged_field_plan=F('field_plan_id'),
+            merged_field=F('field_id'),
+            merged_crop_plan=F('crop_plan_id'),
+            merged_source=Value(OVERLAY, output_field=CharField()),
+        )
+    )
+    columns = (
+        'merged_field_plan',
+        'merged_field',
+        'merged_crop_plan',
+        'merged_source',
+    )
+    rows = base.values_list(*columns).order_by().union(
+        changed.values_list(*columns).order_by(),
+        all=True,
+    )
+    return [
+        {
+            'field_plan_id': field_plan_id,
+            'field_id': field_id,
+            'crop_plan_id': crop_plan_id,
+            'source': source,
+        }
+        for field_plan_id, field_id, crop_plan_id, source in rows
+    ]
+
+COMPARE_SQL = '''
+WITH variants (scenario_id) AS (
+    SELECT NULL::bigint
+    UNION ALL
+    SELECT unnest(%(scenarios)s::bigint[])
+),
+merged AS (
+    SELECT variants.scenario_id, base.field_id, base.crop_plan_id
+    FROM variants
+    CROSS JOIN {field_plan} base
+    WHERE base.organization_id = %(organization)s
+    AND base.ranch_plan_id = %(ranch_plan)s
+    AND NOT EXISTS (
+        SELECT 1 FROM {overlay} overlay
+        WHERE overlay.organization_id = %(organization)s
+        AND overlay.scenario_id = variants.scenario_id
+        AND overlay.field_plan_id = base.id
+    )
+    UNION ALL
+    SELECT overlay.scenario_id, overlay.field_id, overlay.crop_plan_id
+    FROM {overlay} overlay
+    WHERE overlay.organization_id = %(organization)s
+    AND overlay.scenario_id = ANY(%(scenarios)s::bigint[])
+    AND overlay.crop_plan_id IS NOT NULL
+)
+SELECT merged.scenario_id, merged.crop_plan_id, count(*), sum(field.area)
+FROM merged
+JOIN {field} field ON field.id = merged.field_id
+GROUP BY merged.scenario_id, merged.crop_plan_id
+ORDER BY merged.scenario_id NULLS FIRST, merged.crop_plan_id
+'''
+
+def compare_scenarios(organization_id, ranch_plan_id, scenario_ids) -> dict:
+    """
+    {scenario id (None = base plan): {crop plan id: {'fields', 'area'}}} in
+    one query. Every scenario must belong to `ranch_plan_id`.
+    """
+    scenario_ids = [int(pk) for pk in scenario_ids]
+    sql = COMPARE_SQL.format(
+        field_plan=connection.ops.quote_name(FieldPlan._meta.db_table),
+        overlay=connection.ops.quote_name(ScenarioFieldPlan._meta.db_table),
+        field=connection.ops.quote_name(realestate.Field._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {
+            'organization': organization_id,
+            'ranch_plan': ranch_plan_id,
+            'scenarios': scenario_ids,
+        })
+        rows = cursor.fetchall()
+
+    comparison = {None: {}, **{pk: {} for pk in scenario_ids}}
+    for scenario_id, crop_plan_id, fields, area in rows:
+        comparison[scenario_id][crop_plan_id] = {
+            'fields': fields,
+            'area': area or 0,
+        }
+    return comparison
@@ -0,0 +1,36 @@
+"""
+Cached plan summaries (see core.cache).
+"""
+
+from django.db.models import Count, Q, Sum
+
+from core.cache import cached
+from farmplanning.models import FieldPlan
+
+
+def plan_summary(organization_id, ranch_plan_id) -> dict:
+    """ Field/area/activity counts of a RanchPlan """
+    def build():
+        field_plans = FieldPlan.objects.filter(
+            organization_id=organization_id,
+            ranch_plan_id=ranch_plan_id,
+        )
+        summary = field_plans.aggregate(
+            field_plans=Count('pk'),
+            area=Sum('field__area'),
+        )
+        summary.update(field_plans.aggregate(
+            activities=Count('fieldactivity'),
+            actual_activities=Count(
+                'fieldactivity',
+                filter=Q(fieldactivity__is_actual=True)
+            ),
+        ))
+        return summary
+
+    return cached(
+        organization_id,
+        ('plans', 'sites'),
+        f'plan_summary:{ranch_plan_id}',
+        build,
+    )
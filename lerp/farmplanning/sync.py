@@ -0,0 +1,286 @@
+"""
+Delta sync endpoint for offline field devices (see core.sync).
+
+GET `sync/?since=<token>` streams NDJSON:
+    {"token": 812, "reset": false}
+    {"model": "farmplanning.FieldActivity", "pk": 5, "op": "upsert", "data": {...}}
+    {"model": "realestate.FieldState", "pk": 9, "op": "delete"}
+    {"next": 700, "more": true}
+Clients store `next` and repeat until `more` is false. `since=0`, or a token
+older than the pruned change log, sends everything (`reset`: replace local
+data).
+
+POST `sync/` {"token": <last synced>, "changes": [{"model", "pk", "data"}]}
+applies offline writes (`pk: null` creates). A change to an object that was
+changed on the server after `token` is a conflict: it is not applied and the
+server row is returned for the client to resolve. Applied writes come back
+through the next pull; pull before pushing the same object again, or the
+device's own earlier write counts as a conflict.
+"""
+
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import path
+
+from core.api import api_view, run_sync
+from core.rls import aorganization_stream, organization_column
+from core.sync import (
+    SYNCED,
+    changes_since,
+    current_token,
+    latest_change,
+    load_rows,
+)
+from farmplanning.permissions import CHANGE, SCOPES, request_permissions
+
+
+STREAM_CHUNK = 1000
+
+def ndjson(row) -> str:
+    return json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+def scoped(synced, permissions, organization_id, action=None):
+    queryset = synced.queryset(organization_id)
+    if synced.model in SCOPES:
+        queryset = (
+            permissions.filter(queryset, action) if action
+            else permissions.filter(queryset)
+        )
+    return queryset
+
+def change_row(synced, pk, op, data=None) -> dict:
+    row = {'model': synced.label, 'pk': pk, 'op': op}
+    if data is not None:
+        row['data'] = {name: data[name] for name in synced.fields}
+    return row
+
+# ==============================================================================
+# Pull
+# ==============================================================================
+
+async def full_download(permissions, organization_id):
+    for synced in SYNCED.values():
+        queryset = scoped(synced, permissions, organization_id).order_by('pk')
+        after = None
+        while True:
+            page = queryset if after is None else queryset.filter(pk__gt=after)
+            rows = [
+                row async for row in
+                page.values('pk', *synced.fields)[:STREAM_CHUNK]
+            ]
+            for row in rows:
+                yield ndjson(change_row(synced, row['pk'], 'upsert', row))
+            if len(rows) < STREAM_CHUNK:
+                break
+            after = rows[-1]['pk']
+
+async def delta(permissions, organization_id, since, token, limit):
+    entries, last, more = await changes_since(
+        organization_id,
+        since,
+        token,
+        limit,
+    )
+    ids = {}
+    for entry in entries:
+        if entry['op'] == 'upsert' and entry['model'] in SYNCED:
+            ids.setdefault(entry['model'], set()).add(entry['object_id'])
+
+    rows = {}
+    for label, object_ids in ids.items():
+        synced = SYNCED[label]
+        rows[label] = await load_rows(
+            synced,
+            scoped(synced, permissions, organization_id),
+            object_ids,
+        )
+
+    for entry in entries:
+        synced = SYNCED.get(entry['model'])
+        if synced is None:
+            continue
+        if entry['op'] == 'delete':
+            yield ndjson(change_row(synced, entry['object_id'], 'delete'))
+            continue
+        # Missing rows were deleted later (a tombstone follows) or are hidden
+        row = rows[entry['model']].get(entry['object_id'])
+        if row is not None:
+            yield ndjson(change_row(synced, row['pk'], 'upsert', row))
+
+    yield ndjson({'next': last, 'more': more})
+
+async def pull(request):
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        return JsonResponse({'detail': 'since must be a token'}, status=400)
+
+    organization_id = request.organization_id
+    permissions = await run_sync(
+        request_permissions,
+        request,
+        organization_id
+    )
+    token, floor = await current_token(organization_id)
+    reset = since <= 0 or since < floor
+    limit = settings.SYNC_PAGE_SIZE
+
+    async def stream():
+        yield ndjson({'token': token, 'reset': reset})
+        if reset:
+            async for line in full_download(permissions, organization_id):
+                yield line
+            yield ndjson({'next': token, 'more': False})
+        else:
+            async for line in delta(
+                permissions, organization_id, since, token, limit
+            ):
+                yield line
+
+    return StreamingHttpResponse(
+        aorganization_stream(organization_id, stream()),
+        content_type='application/x-ndjson',
+    )
+
+# ==============================================================================
+# Push
+# ==============================================================================
+
+class Rejected(Exception):
+    pass
+
+def check_references(synced, organization_id, data: dict):
+    """ Foreign keys may only point at rows of the organization (or shared) """
+    for name, value in data.items():
+        field = synced.model._meta.get_field(name)
+        if not field.is_relation or value is None:
+            continue
+        related = field.related_model
+        targets = related._default_manager.filter(pk=value)
+        if organization_column(related) is not None:
+            targets = targets.filter(organization_id=organization_id)
+        if not targets.exists():
+            raise Rejected(f'Unknown {field.name}: {value}')
+
+def apply_change(permissions, organization_id, token: int, change: dict) -> dict:
+    if not isinstance(change, dict):
+        raise Rejected('Expected {"model", "pk", "data"}')
+    synced = SYNCED.get(change.get('model'))
+    if synced is None:
+        raise Rejected('Unknown model')
+
+    pk = change.get('pk')
+    data = change.get('data') or {}
+    if not isinstance(data, dict):
+        raise Rejected('data must be an object')
+    allowed = set(synced.writable)
+    if pk is None:
+        allowed.update(synced.initial)
+    readonly = set(data) - allowed
+    if readonly:
+        raise Rejected(f'Not writable: {", ".join(sorted(readonly))}')
+    data = {
+        name: synced.model._meta.get_field(name).to_python(value)
+        for name, value in data.items()
+    }
+    check_references(synced, organization_id, data)
+
+    if pk is None:
+        if not synced.creatable:
+            raise Rejected('Cannot create')
+        instance = synced.model(**data)
+        instance.save()
+        if str(synced.organization_of(instance)) != str(organization_id):
+            raise Rejected('Forbidden')
+        return {'status': 'applied', 'pk': instance.pk}
+
+    queryset = scoped(synced, permissions, organization_id, CHANGE)
+    instance = queryset.select_for_update(of=('self',)).filter(pk=pk).first()
+    if instance is None:
+        raise Rejected('Not found')
+
+    server_seq = latest_change(organization_id, synced.label, pk, token)
+    if server_seq is not None:
+        row = queryset.filter(pk=pk).values('pk', *synced.fields).first()
+        return {
+            'status': 'conflict',
+            'pk': pk,
+            'seq': server_seq,
+            'server': change_row(synced, pk, 'upsert', row)['data'],
+        }
+
+    for name, value in data.items():
+        setattr(instance, name, value)
+    instance.save(update_fields=list(data))
+    return {'status': 'applied', 'pk': pk}
+
+def apply_changes(permissions, organization_id, token: int, changes) -> list:
+    """ One savepoint per change: conflicts and errors don't undo the rest """
+    results = []
+    with transaction.atomic():
+        for index, change in enumerate(changes):
+            try:
+                with transaction.atomic():
+                    result = apply_change(
+                        permissions,
+                        organization_id,
+                        token,
+                        change,
+                    )
+            except Rejected as e:
+                result = {'status': 'error', 'detail': str(e)}
+            except (TypeError, ValueError, ValidationError) as e:
+                result = {'status': 'error', 'detail': f'Invalid data: {e}'}
+            except IntegrityError:
+                # e.g. a create retried after its response was lost
+                result = {
+                    'status': 'error',
+                    'detail': 'Duplicate or invalid reference',
+                }
+            results.append({'index': index, **result})
+    return results
+
+@api_view(methods=('GET', 'POST'))
+async def sync(request):
+    if request.method == 'GET':
+        return await pull(request)
+
+    try:
+        body = json.loads(request.body)
+        token = int(body['token'])
+        changes = body['changes']
+        if not isinstance(changes, list):
+            raise TypeError('changes must be a list')
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse(
+            {'detail': 'Expected {"token": int, "changes": [...]}'},
+            status=400,
+        )
+    if len(changes) > settings.SYNC_MAX_BATCH:
+        return JsonResponse(
+            {'detail': f'At most {settings.SYNC_MAX_BATCH} changes per batch'},
+            status=400,
+        )
+
+    permissions = await run_sync(
+        request_permissions,
+        request,
+        request.organization_id
+    )
+    results = await run_sync(
+        apply_changes,
+        permissions,
+        request.organization_id,
+        token,
+        changes,
+    )
+    return JsonResponse({'results': results})
+
+urlpatterns = [
+    path('', sync),
+]
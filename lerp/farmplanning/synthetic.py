@@ -0,0 +1,442 @@
+"""
+# Synthetic Organizations
+Generates a self-consistent organization at a chosen scale so plan
+instantiation, rollups, admin lists and the API can be load tested:
+accounting and operations category trees (linked to each other), equipment,
+ranches with MultiPolygon fields laid out on a jittered grid, crop plan
+templates and, per field, a FieldPlan with its activities and elements. Past
+activities are marked actual so posting and closing have work to do.
+
+Generation is deterministic for a given seed (except the short token that keeps
+globally unique names unique between runs) and uses bulk_create for the large
+tables, so signals do not fire: cache versions are bumped at the end.
+"""
+
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.db import transaction
+
+import organizations.models as orgs
+import accounting.models as accounting
+import resources.models as resources
+import equipment.models as equipment
+import realestate.models as realestate
+from core.cache import GROUPS, bump_version
+from core.rls import organization_context
+from farmplanning.models import (
+    ActivityImplement,
+    ActivityLabor,
+    ActivityMaterial,
+    ActivityTractor,
+    CropPlan,
+    CropPlanFieldActivity,
+    CropPlanFieldActivityElement,
+    FieldActivity,
+    FieldActivityElement,
+    FieldPlan,
+    RanchPlan,
+    Role,
+    RoleAssignment,
+)
+
+
+@dataclass(frozen=True)
+class Scale:
+    ranches: int
+    fields_per_ranch: int
+    crop_plans: int
+    activities_per_crop_plan: int
+    elements_per_activity: int
+    category_breadth: int # children per category node
+    category_depth: int
+    tractors: int
+    implements: int
+    inventory: int
+    field_state_months: int
+
+SCALES = {
+    'small': Scale(1, 10, 3, 8, 2, 3, 2, 3, 5, 20, 3),
+    # README: a few big containers with thousands of objects each
+    'target': Scale(3, 40, 8, 25, 4, 4, 3, 12, 30, 500, 12),
+    'large': Scale(10, 100, 20, 40, 5, 5, 3, 40, 100, 5000, 24),
+}
+
+# Top-left corner of the first ranch (Central Valley) and field size in degrees
+ORIGIN = (-120.5, 37.0)
+FIELD_SIZE = (0.0050, 0.0040) # ~440 m x 445 m, ~20 ha
+RANCH_SPACING = 0.1
+
+def field_polygon(rng, x: float, y: float) -> MultiPolygon:
+    """ Slightly irregular quadrilateral with its top-left corner at (x, y) """
+    width, height = FIELD_SIZE
+    jitter = lambda: rng.uniform(-0.1, 0.1) * width
+    corners = [
+        (x + jitter(), y + jitter()),
+        (x + width + jitter(), y + jitter()),
+        (x + width + jitter(), y - height + jitter()),
+        (x + jitter(), y - height + jitter()),
+    ]
+    return MultiPolygon(Polygon(corners + corners[:1]))
+
+def category_tree(model, organization, label: str, scale: Scale, **fields):
+    """
+    Creates a breadth x depth tree (MPTT needs one insert per node, trees are
+    small) and returns its leaves. `fields` values may be callables.
+    """
+    def create(name, code, parent):
+        values = {
+            key: value() if callable(value) else value
+            for key, value in fields.items()
+        }
+        return model.objects.create(
+            organization=organization,
+            name=name,
+            code=code,
+            parent=parent,
+            **values,
+        )
+
+    leaves = []
+    def grow(parent, code, level):
+        for i in range(1, scale.category_breadth + 1):
+            child_code = f'{code}.{i}' if code else str(i)
+            node = create(f'{label} {child_code}', child_code, parent)
+            if level + 1 < scale.category_depth:
+                grow(node, child_code, level + 1)
+            else:
+                leaves.append(node)
+
+    grow(None, '', 0)
+    return leaves
+
+# ==============================================================================
+# Generation
+# ==============================================================================
+
+@transaction.atomic
+def generate_organization(name: str, scale: Scale, seed: int = 0, user=None):
+    """
+    Returns (organization, {model label: rows created}). `user`, if given, is
+    made an admin of the new organization.
+    """
+    organization = orgs.Organization.objects.create(name=name)
+    with organization_context(organization.pk):
+        counts = populate(
+            organization,
+            scale,
+            random.Random(seed),
+            token=uuid.uuid4().hex[:3].upper(),
+            user=user,
+        )
+
+    return organization, counts
+
+def populate(organization, scale: Scale, rng, token: str, user=None) -> dict:
+    """ Returns {model label: rows created} """
+    counts = {}
+    def created(model, rows):
+        counts[model._meta.label] = counts.get(model._meta.label, 0) + len(rows)
+        return rows
+
+    # Categories
+    accounting_activities = category_tree(
+        accounting.AccountingActivityHiCat, organization, 'Acc Activity', scale
+    )
+    buckets = category_tree(
+        accounting.AccountingBucketHiCat, organization, 'Bucket', scale
+    )
+    activity_categories = category_tree(
+        resources.ActivityHiCat, organization, 'Activity', scale,
+        accounting_activity=lambda: rng.choice(accounting_activities),
+        rate_benchmark=lambda: rng.uniform(0.5, 5),
+    )
+    labor_categories = category_tree(
+        resources.LaborHiCat, organization, 'Labor', scale,
+        accounting_bucket=lambda: rng.choice(buckets),
+        cost_per_si_unit=lambda: rng.uniform(0.004, 0.01), # per second
+    )
+    material_categories = category_tree(
+        resources.MaterialHiCat, organization, 'Material', scale,
+        accounting_bucket=lambda: rng.choice(buckets),
+        cost_per_si_unit=lambda: rng.uniform(0.5, 20),
+    )
+    products = category_tree(
+        resources.ProductHiCat, organization, 'Product', scale,
+        price_per_si_unit=lambda: rng.uniform(0.2, 4),
+    )
+
+    # Equipment (makes, models and implement categories are shared)
+    make, _ = equipment.EquipmentMake.objects.get_or_create(name='Synthetic')
+    tractor_models = [
+        equipment.TractorModel.objects.get_or_create(
+            make=make,
+            name=f'T{hp}',
+            defaults={
+                'horsepower_rated': hp * 745.7,
+                'cost_per_si_unit': hp / 100_000,
+            },
+        )[0]
+        for hp in (90, 150, 250, 400)
+    ]
+    implement_categories = [
+        equipment.ImplementHiCat.objects.get_or_create(
+            name=f'Synthetic {name}',
+            parent=None,
+            defaults={'cost_per_si_unit': cost},
+        )[0]
+        for name, cost in (('Disc', 0.002), ('Planter', 0.004), ('Sprayer', 0.003))
+    ]
+    tractors = created(equipment.Tractor, equipment.Tractor.objects.bulk_create(
+        equipment.Tractor(
+            organization=organization,
+            asset_id=f'TR-{i:04d}',
+            model=rng.choice(tractor_models),
+            accounting_bucket=rng.choice(buckets),
+        )
+        for i in range(scale.tractors)
+    ))
+    implements = created(
+        equipment.Implement,
+        equipment.Implement.objects.bulk_create(
+            equipment.Implement(
+                organization=organization,
+                asset_id=f'IM-{i:04d}',
+                category=rng.choice(implement_categories),
+                width=rng.uniform(3, 18),
+                accounting_bucket=rng.choice(buckets),
+            )
+            for i in range(scale.implements)
+        ),
+    )
+
+    # Inventory
+    created(
+        resources.MaterialInventory,
+        resources.MaterialInventory.objects.bulk_create(
+            resources.MaterialInventory(
+                organization=organization,
+                name=f'Lot M{i:05d}',
+                amount=rng.uniform(10, 10_000),
+                material_category=rng.choice(material_categories),
+            )
+            for i in range(scale.inventory)
+        ),
+    )
+    created(
+        resources.ProductInventory,
+        resources.ProductInventory.objects.bulk_create(
+            resources.ProductInventory(
+                organization=organization,
+                name=f'Lot P{i:05d}',
+                amount=rng.uniform(10, 10_000),
+                product_category=rng.choice(products),
+            )
+            for i in range(scale.inventory)
+        ),
+    )
+
+    # Crop plan templates - one season starting this year
+    season_start = date(date.today().year, 1, 1)
+    crop_plans = created(CropPlan, CropPlan.objects.bulk_create(
+        CropPlan(
+            name=f'Synthetic {token} crop {i}',
+            product=rng.choice(products),
+            ref_date=season_start + timedelta(days=rng.randrange(0, 120)),
+        )
+        for i in range(scale.crop_plans)
+    ))
+    template_activities = created(
+        CropPlanFieldActivity,
+        CropPlanFieldActivity.objects.bulk_create(
+            CropPlanFieldActivity(
+                crop_plan=crop_plan,
+                category=rng.choice(activity_categories),
+                time_from_ref_date=timedelta(days=7 * i + rng.randrange(0, 7)),
+            )
+            for crop_plan in crop_plans
+            for i in range(scale.activities_per_crop_plan)
+        ),
+    )
+
+    template_resources = {
+        'labor': labor_categories,
+        'material': material_categories,
+        'tractor': tractor_models,
+        'implement': implement_categories,
+    }
+    resource_kinds = tuple(template_resources)
+    template_elements = created(
+        CropPlanFieldActivityElement,
+        CropPlanFieldActivityElement.objects.bulk_create(
+            CropPlanFieldActivityElement(
+                crop_plan_field_activity=activity,
+                **{kind: rng.choice(template_resources[kind])},
+            )
+            for activity in template_activities
+            for kind in rng.sample(
+                resource_kinds * scale.elements_per_activity,
+                scale.elements_per_activity,
+            )
+        ),
+    )
+    elements_by_activity = {}
+    for element in template_elements:
+        elements_by_activity.setdefault(
+            element.crop_plan_field_activity_id, []
+        ).append(element)
+    activities_by_plan = {}
+    for activity in template_activities:
+        activities_by_plan.setdefault(activity.crop_plan_id, []).append(activity)
+
+    # Ranches and fields
+    ranches, fields = [], []
+    columns = max(1, int(scale.fields_per_ranch ** 0.5))
+    for r in range(scale.ranches):
+        x0 = ORIGIN[0] + r * RANCH_SPACING
+        polygons = [
+            field_polygon(
+                rng,
+                x0 + (i % columns) * FIELD_SIZE[0] * 1.1,
+                ORIGIN[1] - (i // columns) * FIELD_SIZE[1] * 1.1,
+            )
+            for i in range(scale.fields_per_ranch)
+        ]
+        ranch = realestate.Ranch.objects.create(
+            organization=organization,
+            name=f'Synthetic {token}-{r}',
+            abbreviation=f'{token}{r:02d}',
+            mpoly=MultiPolygon([p[0] for p in polygons]),
+        )
+        ranches.append(ranch)
+        fields += realestate.Field.objects.bulk_create(
+            realestate.Field(
+                organization=organization,
+                ranch=ranch,
+                name=f'F{i:03d}',
+                mpoly=polygon,
+            )
+            for i, polygon in enumerate(polygons)
+        )
+    created(realestate.Ranch, ranches)
+    created(realestate.Field, fields)
+
+    field_plan_crops = {field.pk: rng.choice(crop_plans) for field in fields}
+    created(
+        realestate.FieldState,
+        realestate.FieldState.objects.bulk_create(
+            realestate.FieldState(
+                organization=organization,
+                field=field,
+                date=season_start + timedelta(days=30 * month),
+                soil_quality=rng.uniform(0.3, 1),
+                product=field_plan_crops[field.pk].product,
+            )
+            for field in fields
+            for month in range(scale.field_state_months)
+        ),
+    )
+
+    # Plans: every field gets its crop plan instantiated
+    ranch_plans = created(RanchPlan, RanchPlan.objects.bulk_create(
+        RanchPlan(
+            organization=organization,
+            ranch=ranch,
+            name=f'{ranch.name} {season_start.year}',
+        )
+        for ranch in ranches
+    ))
+    ranch_plan_of = {plan.ranch_id: plan for plan in ranch_plans}
+    field_plans = created(FieldPlan, FieldPlan.objects.bulk_create(
+        FieldPlan(
+            organization=organization,
+            ranch_plan=ranch_plan_of[field.ranch_id],
+            field=field,
+            crop_plan=field_plan_crops[field.pk],
+        )
+        for field in fields
+    ))
+
+    today = date.today()
+    plan_activities = [
+        (field_plan, template)
+        for field_plan in field_plans
+        for template in activities_by_plan[field_plan.crop_plan_id]
+    ]
+    activities = created(FieldActivity, FieldActivity.objects.bulk_create(
+        FieldActivity(
+            organization=organization,
+            field_plan=field_plan,
+            category_id=template.category_id,
+            time_from_ref_date=template.time_from_ref_date,
+            is_actual=(
+                field_plan.crop_plan.ref_date + template.time_from_ref_date
+                < today
+            ),
+        )
+        for field_plan, template in plan_activities
+    ))
+
+    # One resource row per element, then the elements pointing at them
+    resource_rows = {kind: [] for kind in resource_kinds}
+    element_rows = []
+    for activity, (_, template) in zip(activities, plan_activities):
+        for template_element in elements_by_activity.get(template.pk, ()):
+            amount = rng.uniform(1, 100)
+            if template_element.labor_id:
+                kind, row = 'labor', ActivityLabor(
+                    category_id=template_element.labor_id,
+                    amount=amount * 3600,
+                )
+            elif template_element.material_id:
+                kind, row = 'material', ActivityMaterial(
+                    category_id=template_element.material_id,
+                    amount=amount,
+                )
+            elif template_element.tractor_id:
+                kind, row = 'tractor', ActivityTractor(
+                    instance=rng.choice(tractors),
+                    amount=amount * 3600,
+                )
+            else:
+                kind, row = 'implement', ActivityImplement(
+                    instance=rng.choice(implements),
+                    amount=amount * 3600,
+                )
+            resource_rows[kind].append(row)
+            element_rows.append(FieldActivityElement(
+                organization=organization,
+                field_activity=activity,
+                **{kind: row},
+            ))
+
+    for model, kind in (
+        (ActivityLabor, 'labor'),
+        (ActivityMaterial, 'material'),
+        (ActivityTractor, 'tractor'),
+        (ActivityImplement, 'implement'),
+    ):
+        created(model, model.objects.bulk_create(resource_rows[kind]))
+    created(
+        FieldActivityElement,
+        FieldActivityElement.objects.bulk_create(element_rows, batch_size=5000),
+    )
+
+    if user is not None:
+        role = Role.objects.create(
+            organization=organization,
+            name='Admin',
+            is_admin=True,
+            can_change=True,
+            view_financials=True,
+        )
+        RoleAssignment.objects.create(role=role, user=user)
+
+    # bulk_create skips the signals that bump cache versions
+    transaction.on_commit(lambda: [
+        bump_version(organization.pk, group) for group in GROUPS
+    ])
+    return counts
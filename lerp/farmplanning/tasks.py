@@ -0,0 +1,37 @@
+"""
+Background job handlers (see jobs.queue).
+"""
+
+from datetime import date
+
+from jobs.queue import register
+from farmplanning.closing import close_period
+from farmplanning.posting import post_actuals
+
+
+@register('farmplanning.post_actuals')
+def post_actuals_job(job, posting_date: str, batch_size: int = 1000):
+    """ Resumable, so a retried job continues where the failed one stopped """
+    def progress(processed, to_process, posted):
+        job.report_progress(
+            processed / to_process,
+            f'Processed {processed} of {to_process} elements, posted {posted}',
+        )
+
+    result = post_actuals(
+        job.organization,
+        date.fromisoformat(posting_date),
+        batch_size=batch_size,
+        user=job.created_by,
+        progress=progress,
+    )
+    return {'posted': result.posted, 'unmapped': result.unmapped[:100]}
+
+@register('farmplanning.close_period')
+def close_period_job(job, period: str):
+    period_close = close_period(
+        job.organization,
+        date.fromisoformat(period),
+        user=job.created_by,
+    )
+    return {'period_close': period_close.pk}
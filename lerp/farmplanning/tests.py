@@ -0,0 +1,110 @@
+import io
+
+from django.test import TestCase
+
+import organizations.models as orgs
+import resources.models as resources
+from farmplanning.imports import import_crop_plans
+from farmplanning.models import (
+    CropPlan,
+    CropPlanFieldActivity,
+    CropPlanFieldActivityElement,
+    FieldActivity,
+    FieldActivityElement,
+)
+from farmplanning.synthetic import Scale, generate_organization
+
+
+# ==============================================================================
+# Synthetic Organizations
+# ==============================================================================
+
+class SyntheticTests(TestCase):
+    scale = Scale(
+        ranches=1,
+        fields_per_ranch=2,
+        crop_plans=1,
+        activities_per_crop_plan=2,
+        elements_per_activity=1,
+        category_breadth=1,
+        category_depth=1,
+        tractors=1,
+        implements=1,
+        inventory=1,
+        field_state_months=1,
+    )
+
+    def test_populate(self):
+        organization, counts = generate_organization('Synthetic', self.scale)
+
+        self.assertEqual(counts['farmplanning.CropPlanFieldActivity'], 2)
+        self.assertEqual(counts['farmplanning.CropPlanFieldActivityElement'], 2)
+        self.assertEqual(counts['farmplanning.FieldActivity'], 4)
+        self.assertEqual(counts['farmplanning.FieldActivityElement'], 4)
+
+        self.assertEqual(CropPlanFieldActivity.objects.count(), 2)
+        self.assertEqual(CropPlanFieldActivityElement.objects.count(), 2)
+        activities = FieldActivity.objects.filter(organization=organization)
+        self.assertEqual(activities.count(), 4)
+        self.assertEqual(
+            FieldActivityElement.objects
+            .filter(field_activity__in=activities)
+            .count(),
+            4,
+        )
+
+# ==============================================================================
+# Crop Plan Import
+# ==============================================================================
+
+SHEET = b'''crop_plan,product,ref_date,activity,category,days,labor,material
+Tomato 25,TOM,2025-03-01,1,DISC,-14,,
+Tomato 25,,,2,PLANT,0,CREW,
+Tomato 25,,,2,,,,SEED
+Tomato 25,,,3,NOPE,7,CREW,
+'''
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.organization = orgs.Organization.objects.create(name='Import')
+        codes = (
+            (resources.ProductHiCat, 'TOM'),
+            (resources.ActivityHiCat, 'DISC'),
+            (resources.ActivityHiCat, 'PLANT'),
+            (resources.LaborHiCat, 'CREW'),
+            (resources.MaterialHiCat, 'SEED'),
+        )
+        for model, code in codes:
+            model.objects.create(
+                organization=self.organization,
+                name=code,
+                code=code,
+            )
+
+    def test_import(self):
+        result = import_crop_plans(io.BytesIO(SHEET), self.organization.pk)
+
+        self.assertEqual(result.crop_plans, 1)
+        self.assertEqual(result.activities, 2)
+        self.assertEqual(result.elements, 2)
+        self.assertEqual(
+            result.errors,
+            [(5, 'Activity "3": unknown category "NOPE"')],
+        )
+
+        crop_plan = CropPlan.objects.get(name='Tomato 25')
+        activities = CropPlanFieldActivity.objects.filter(crop_plan=crop_plan)
+        self.assertEqual(
+            sorted(activities.values_list('category__code', flat=True)),
+            ['DISC', 'PLANT'],
+        )
+        elements = CropPlanFieldActivityElement.objects.filter(
+            crop_plan_field_activity__crop_plan=crop_plan
+        )
+        self.assertEqual(
+            sorted(
+                (element.labor_id is not None, element.material_id is not None)
+                for element in elements
+            ),
+            [(False, True), (True, False)],
+        )
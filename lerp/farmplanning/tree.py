@@ -0,0 +1,187 @@
+"""
+# Plan Trees
+Reads a RanchPlan with everything below it in a constant number of queries:
+    RanchPlan -> FieldPlans -> FieldActivities -> FieldActivityElements
+plus the fields, categories and equipment they reference.
+
+Each level is loaded with one `.values()` query for all parents of the level
+above (dataloader style), and every referenced type is loaded once for all ids
+collected while walking the tree. Elements fetch their resource row (amount,
+category/instance) through LEFT JOINs in the same query. Referenced objects
+are returned once in lookup tables instead of being repeated in every node.
+
+`include` selects what is loaded; levels left out cost no query.
+"""
+
+from collections import defaultdict
+
+import equipment.models as equipment
+import realestate.models as realestate
+import resources.models as resources
+from farmplanning.models import (
+    FieldActivity,
+    FieldActivityElement,
+    FieldPlan,
+    RanchPlan,
+)
+
+
+INCLUDES = ('fields', 'activities', 'elements', 'categories', 'equipment')
+
+RESOURCE_KINDS = {
+    # kind -> (referenced field, lookup table)
+    'labor': ('category_id', 'labor'),
+    'material': ('category_id', 'material'),
+    'tractor': ('instance_id', 'tractors'),
+    'implement': ('instance_id', 'implements'),
+}
+
+# lookup table -> (model, fields)
+LOOKUPS = {
+    'fields': (realestate.Field, ['name', 'area', 'accounting_status']),
+    'activity': (
+        resources.ActivityHiCat,
+        ['name', 'code', 'parent_id', 'rate_benchmark'],
+    ),
+    'labor': (
+        resources.LaborHiCat,
+        ['name', 'code', 'parent_id', 'cost_dim', 'cost_per_si_unit'],
+    ),
+    'material': (
+        resources.MaterialHiCat,
+        ['name', 'code', 'parent_id', 'cost_dim', 'cost_per_si_unit'],
+    ),
+    'tractors': (
+        equipment.Tractor,
+        ['asset_id', 'model_id', 'cost_dim', 'cost_per_si_unit'],
+    ),
+    'implements': (
+        equipment.Implement,
+        ['asset_id', 'category_id', 'width', 'cost_dim', 'cost_per_si_unit'],
+    ),
+}
+CATEGORY_LOOKUPS = ('activity', 'labor', 'material')
+EQUIPMENT_LOOKUPS = ('tractors', 'implements')
+
+def load_grouped(queryset, parent_field: str, parent_ids, fields) -> dict:
+    """ {parent id: [rows]} in one query """
+    grouped = defaultdict(list)
+    if not parent_ids:
+        return grouped
+
+    rows = (
+        queryset
+        .filter(**{f'{parent_field}__in': list(parent_ids)})
+        .order_by(parent_field, 'pk')
+        .values('pk', parent_field, *fields)
+    )
+    for row in rows:
+        grouped[row[parent_field]].append(row)
+    return grouped
+
+def load_by_id(model, ids, fields) -> dict:
+    """ {pk: row} in one query """
+    if not ids:
+        return {}
+    return {
+        row['pk']: row
+        for row in model.objects.filter(pk__in=list(ids)).values('pk', *fields)
+    }
+
+def element_node(row) -> dict:
+    """ Collapses the four nullable resource joins into kind/amount/ref """
+    for kind in RESOURCE_KINDS:
+        if row[f'{kind}_id'] is not None:
+            ref_field, _ = RESOURCE_KINDS[kind]
+            return {
+                'pk': row['pk'],
+                'kind': kind,
+                'amount': row[f'{kind}__amount'],
+                ref_field: row[f'{kind}__{ref_field}'],
+            }
+    return {'pk': row['pk'], 'kind': None}
+
+def plan_tree(permissions, policy, ranch_plan_id, include=INCLUDES):
+    """
+    The RanchPlan as a nested dict, or None if it is not viewable.
+    `permissions` filters every level, `policy` (MaskPolicy) hides financial
+    columns of the lookup tables.
+    """
+    ranch_plan = (
+        permissions.filter(RanchPlan.objects.filter(pk=ranch_plan_id))
+        .values('pk', 'name', 'ranch_id')
+        .first()
+    )
+    if ranch_plan is None:
+        return None
+
+    field_plans = list(
+        permissions.filter(
+            FieldPlan.objects.filter(ranch_plan_id=ranch_plan_id)
+        )
+        .order_by('pk')
+        .values('pk', 'field_id', 'crop_plan_id')
+    )
+    references = defaultdict(set) # lookup table -> ids
+    references['fields'].update(plan['field_id'] for plan in field_plans)
+
+    if 'activities' in include:
+        activities = load_grouped(
+            FieldActivity.objects.filter(
+                organization_id=permissions.organization_id
+            ),
+            'field_plan_id',
+            [plan['pk'] for plan in field_plans],
+            ['category_id', 'time_from_ref_date', 'is_actual'],
+        )
+        for plan in field_plans:
+            plan['activities'] = activities.get(plan['pk'], [])
+            for activity in plan['activities']:
+                del activity['field_plan_id']
+                references['activity'].add(activity['category_id'])
+
+    if 'activities' in include and 'elements' in include:
+        resource_fields = [
+            f'{kind}__{field}'
+            for kind, (ref_field, _) in RESOURCE_KINDS.items()
+            for field in ('amount', ref_field)
+        ]
+        elements = load_grouped(
+            FieldActivityElement.objects.filter(
+                organization_id=permissions.organization_id
+            ),
+            'field_activity_id',
+            [
+                activity['pk']
+                for plan in field_plans
+                for activity in plan['activities']
+            ],
+            [f'{kind}_id' for kind in RESOURCE_KINDS] + resource_fields,
+        )
+        for plan in field_plans:
+            for activity in plan['activities']:
+                activity['elements'] = [
+                    element_node(row)
+                    for row in elements.get(activity['pk'], [])
+                ]
+                for element in activity['elements']:
+                    if element['kind'] is not None:
+                        ref_field, table = RESOURCE_KINDS[element['kind']]
+                        references[table].add(element[ref_field])
+
+    tables = ['fields'] if 'fields' in include else []
+    if 'categories' in include:
+        tables += CATEGORY_LOOKUPS
+    if 'equipment' in include:
+        tables += EQUIPMENT_LOOKUPS
+
+    lookups = {}
+    for table in tables:
+        model, fields = LOOKUPS[table]
+        lookups[table] = load_by_id(
+            model,
+            references[table],
+            policy.visible_fields(model, fields),
+        )
+
+    return {**ranch_plan, 'field_plans': field_plans, **lookups}
@@ -0,0 +1,47 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.worker import Worker, run_processes
+
+
+class Command(BaseCommand):
+    help = 'Runs background jobs from the database queue until interrupted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.JOBS_WORKER_CONCURRENCY,
+            help='Job loops (threads) per process',
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=0,
+            help='Spawn this many worker processes (for CPU-bound jobs)',
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        if options['processes']:
+            self.stdout.write(
+                f'Starting {options["processes"]} processes x '
+                f'{options["concurrency"]} threads'
+            )
+            run_processes(
+                options['processes'],
+                options['concurrency'],
+                options['poll_interval'],
+            )
+            return
+
+        worker = Worker(
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+        )
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        self.stdout.write(f'Starting {options["concurrency"]} threads')
+        worker.run()
@@ -0,0 +1,79 @@
+from django.db import models
+from django.utils import timezone
+
+from django.conf import settings
+import organizations.models as orgs
+
+
+class JobStatus(models.TextChoices):
+    QUEUED = 'queued', 'Queued'
+    RUNNING = 'running', 'Running'
+    SUCCEEDED = 'succeeded', 'Succeeded'
+    FAILED = 'failed', 'Failed'
+    CANCELLED = 'cancelled', 'Cancelled'
+
+class Job(orgs.OrgObject):
+    """ A unit of background work - see jobs.queue and jobs.worker """
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['-priority', 'run_after', 'id'],
+                condition=models.Q(status='queued'),
+                name='job_queued_idx'
+            ),
+            models.Index(
+                fields=['organization', 'status'],
+                name='job_org_status_idx'
+            ),
+        ]
+
+    kind = models.CharField(max_length=settings.DEFAULT_MAX_CHAR)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=9,
+        choices=JobStatus,
+        default=JobStatus.QUEUED
+    )
+    priority = models.SmallIntegerField(default=0)
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+
+    locked_by = models.CharField(max_length=128, blank=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+
+    progress = models.FloatField(default=0, help_text='0 to 1')
+    progress_message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True)
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f'{self.kind} ({self.status})'
+
+    def report_progress(self, progress: float, message: str = ''):
+        """
+        Also serves as heartbeat. Only visible to others once committed, so
+        handlers should commit in batches rather than run in one transaction.
+        """
+        self.progress = max(0.0, min(progress, 1.0))
+        self.progress_message = message[:255]
+        self.heartbeat_at = timezone.now()
+        Job.objects.filter(pk=self.pk).update(
+            progress=self.progress,
+            progress_message=self.progress_message,
+            heartbeat_at=self.heartbeat_at,
+        )
@@ -0,0 +1,184 @@
+"""
+# Job Queue
+A PostgreSQL table used as a queue - no external broker:
+- workers claim with `SELECT ... FOR UPDATE SKIP LOCKED`, so concurrent workers
+never block on, or double-claim, the same job
+- per-organization concurrency is enforced under a transaction-level advisory
+lock on the organization, so two workers cannot both take its last free slot
+- failures are retried with exponential backoff up to max_attempts
+- running jobs whose heartbeat goes stale (dead worker) are requeued
+
+Handlers are registered by kind and receive the job plus its payload:
+
+    @register('farmplanning.post_actuals')
+    def post_actuals(job, organization_id, posting_date): ...
+
+`<app>.tasks` modules are imported by JobsConfig.ready() to register handlers.
+"""
+
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from jobs.models import Job, JobStatus
+
+
+HANDLERS = {}
+
+def register(kind: str):
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+def enqueue(
+    kind: str,
+    organization,
+    payload: dict | None = None,
+    user=None,
+    priority: int = 0,
+    run_after=None,
+    max_attempts: int | None = None,
+) -> Job:
+    if kind not in HANDLERS:
+        raise ValueError(f'No job handler registered for "{kind}"')
+
+    return Job.objects.create(
+        kind=kind,
+        organization=organization,
+        payload=payload or {},
+        created_by=user,
+        priority=priority,
+        run_after=run_after or timezone.now(),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+# ==============================================================================
+# Claiming
+# ==============================================================================
+
+def lock_organization(organization_id) -> bool:
+    """ Held until the end of the current transaction """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_try_advisory_xact_lock(hashtext('jobs:' || %s))",
+            [str(organization_id)],
+        )
+        return cursor.fetchone()[0]
+
+def claim(worker_id: str, candidates: int = 10) -> Job | None:
+    limit = settings.JOBS_ORG_CONCURRENCY
+    with transaction.atomic():
+        saturated = (
+            Job.objects
+            .filter(status=JobStatus.RUNNING)
+            .values('organization_id')
+            .annotate(running=Count('pk'))
+            .filter(running__gte=limit)
+            .values('organization_id')
+        )
+        queued = (
+            Job.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=JobStatus.QUEUED, run_after__lte=timezone.now())
+            .exclude(organization_id__in=saturated)
+            .order_by('-priority', 'run_after', 'id')[:candidates]
+        )
+        for job in queued:
+            if not lock_organization(job.organization_id):
+                continue # another worker is claiming for this organization
+
+            running = Job.objects.filter(
+                organization_id=job.organization_id,
+                status=JobStatus.RUNNING,
+            ).count()
+            if running >= limit:
+                continue
+
+            now = timezone.now()
+            job.status = JobStatus.RUNNING
+            job.locked_by = worker_id
+            job.attempts += 1
+            job.started_at = now
+            job.heartbeat_at = now
+            job.save(update_fields=[
+                'status',
+                'locked_by',
+                'attempts',
+                'started_at',
+                'heartbeat_at',
+            ])
+            return job
+
+    return None
+
+# ==============================================================================
+# Completion
+# ==============================================================================
+
+def finish(job: Job, result=None):
+    job.status = JobStatus.SUCCEEDED
+    job.progress = 1
+    job.result = result
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'progress', 'result', 'finished_at'])
+
+def fail(job: Job, exc: BaseException):
+    job.error = ''.join(traceback.format_exception(exc))
+    if job.attempts < job.max_attempts:
+        backoff = settings.JOBS_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+        job.status = JobStatus.QUEUED
+        job.run_after = timezone.now() + timedelta(seconds=backoff)
+    else:
+        job.status = JobStatus.FAILED
+        job.finished_at = timezone.now()
+
+    job.locked_by = ''
+    job.save(update_fields=[
+        'status',
+        'run_after',
+        'finished_at',
+        'locked_by',
+        'error',
+    ])
+
+def run(job: Job):
+    try:
+        handler = HANDLERS[job.kind]
+    except KeyError:
+        job.attempts = job.max_attempts # retrying cannot help
+        fail(job, LookupError(f'No job handler registered for "{job.kind}"'))
+        return
+
+    try:
+        result = handler(job, **job.payload)
+    except Exception as e:
+        fail(job, e)
+    else:
+        finish(job, result)
+
+def requeue_stale(timeout_seconds: int | None = None) -> int:
+    """
+    Requeues running jobs whose worker stopped heartbeating. Jobs out of
+    attempts fail instead, so a job that kills its worker isn't retried forever.
+    Returns the number of jobs requeued or failed.
+    """
+    timeout = timeout_seconds or settings.JOBS_HEARTBEAT_TIMEOUT
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=JobStatus.RUNNING,
+        heartbeat_at__lt=now - timedelta(seconds=timeout),
+    )
+    with transaction.atomic():
+        failed = stale.filter(attempts__gte=F('max_attempts')).update(
+            status=JobStatus.FAILED,
+            locked_by='',
+            finished_at=now,
+            error='Worker stopped heartbeating during the last attempt',
+        )
+        requeued = stale.update(status=JobStatus.QUEUED, locked_by='')
+    return failed + requeued
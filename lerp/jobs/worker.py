@@ -0,0 +1,111 @@
+"""
+# Job Worker
+Runs `concurrency` job loops in threads (I/O- and database-bound jobs) or in
+processes (CPU-bound jobs such as shapefile parsing). Each loop claims one job
+at a time; a background thread heartbeats every running job so long handlers
+are not mistaken for dead ones.
+"""
+
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from core.rls import organization_context, rls_bypass
+from jobs import queue
+from jobs.models import Job
+
+
+def worker_name(suffix='') -> str:
+    return f'{socket.gethostname()}:{os.getpid()}{suffix}'
+
+class Worker:
+    def __init__(self, concurrency: int = 4, poll_interval: float = 1.0):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+        self.running = {} # thread name -> job id
+        self.lock = threading.Lock()
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+    def loop(self, index: int):
+        name = worker_name(f':{index}')
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+                with rls_bypass():
+                    job = queue.claim(name)
+                if job is None:
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+
+                with self.lock:
+                    self.running[name] = job.pk
+                try:
+                    with organization_context(job.organization_id):
+                        queue.run(job)
+                finally:
+                    with self.lock:
+                        self.running.pop(name, None)
+        finally:
+            connections.close_all()
+
+    def heartbeat(self):
+        try:
+            while not self.stop_event.wait(settings.JOBS_HEARTBEAT_TIMEOUT / 3):
+                with self.lock:
+                    job_ids = list(self.running.values())
+                with rls_bypass():
+                    if job_ids:
+                        Job.objects.filter(pk__in=job_ids).update(
+                            heartbeat_at=timezone.now()
+                        )
+                    queue.requeue_stale()
+                close_old_connections()
+        finally:
+            connections.close_all()
+
+    def run(self):
+        heartbeat = threading.Thread(target=self.heartbeat, daemon=True)
+        heartbeat.start()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for index in range(self.concurrency):
+                pool.submit(self.loop, index)
+
+def run_process(concurrency: int, poll_interval: float):
+    """ Entry point of a spawned worker process """
+    django.setup()
+    worker = Worker(concurrency=concurrency, poll_interval=poll_interval)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+def run_processes(processes: int, threads: int, poll_interval: float):
+    context = multiprocessing.get_context('spawn')
+    children = [
+        context.Process(
+            target=run_process,
+            args=(threads, poll_interval),
+            daemon=False,
+        )
+        for _ in range(processes)
+    ]
+    for child in children:
+        child.start()
+    try:
+        for child in children:
+            child.join()
+    except KeyboardInterrupt:
+        for child in children:
+            child.terminate()
+        for child in children:
+            child.join()
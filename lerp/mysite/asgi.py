@@ -2,6 +2,8 @@
 ASGI config for mysite project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django; WebSockets on CHANGEFEED_PATH go to the change feed
+(core.changefeed).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from core.changefeed import changefeed_app # needs the app registry
+
+
+CHANGEFEED_PATH = '/ws/changes/'
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        if scope['path'] == CHANGEFEED_PATH:
+            return await changefeed_app(scope, receive, send)
+
+        await receive() # websocket.connect
+        return await send({'type': 'websocket.close', 'code': 4404})
+
+    return await django_application(scope, receive, send)
@@ -0,0 +1,79 @@
+"""
+Read-replica routing.
+
+Reads go to the `replica` alias only when explicitly requested with
+`use_replica()` (reports, rollups, exports) and only while it is safe:
+- nothing has been written through this router in the current request/context
+- the primary connection is not inside a transaction
+Everything else, including all writes, uses `default`. ReplicaMiddleware
+resets the write marker at the start of every request. The replica connection
+gets the request's row-level security organization on first use, and
+OrganizationMiddleware clears it again afterwards (see
+core.rls.reset_organizations).
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+from core.rls import ensure_organization
+
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+
+_replica_requested = ContextVar('replica_requested', default=False)
+_wrote = ContextVar('wrote_to_primary', default=False)
+
+@contextmanager
+def use_replica():
+    token = _replica_requested.set(True)
+    try:
+        yield
+    finally:
+        _replica_requested.reset(token)
+
+def replica_reads(func):
+    """ Decorator form of use_replica() """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with use_replica():
+            return func(*args, **kwargs)
+    return wrapper
+
+def reset_write_marker():
+    _wrote.set(False)
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if REPLICA not in settings.DATABASES:
+            return PRIMARY
+        if not _replica_requested.get() or _wrote.get():
+            return PRIMARY
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+
+        ensure_organization(REPLICA)
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reset_write_marker()
+        return self.get_response(request)
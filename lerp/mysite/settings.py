@@ -28,7 +28,6 @@ CSRF_TRUSTED_ORIGINS = getenv(
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = (getenv('DEBUG') == "True")
-print(f'{DEBUG = }')
 if not DEBUG:
     SECURE_SSL_REDIRECT = True
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -51,6 +50,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.gis',
+    'django.contrib.postgres',
 
     'allauth',
     'allauth.account',
@@ -70,6 +70,7 @@ INSTALLED_APPS = [
     'realestate.apps.RealestateConfig',
     'accounting.apps.AccountingConfig',
     'farmplanning.apps.FarmplanningConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 if DEBUG:
@@ -79,17 +80,25 @@ if DEBUG:
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.queries.QueryInstrumentationMiddleware',
+    'mysite.routers.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware', # DEBUG TOOLBAR
+    'core.rls.OrganizationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'simple_history.middleware.HistoryRequestMiddleware',
     'allauth.account.middleware.AccountMiddleware',
 ]
 
+if DEBUG:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('core.rls.OrganizationMiddleware') + 1,
+        'debug_toolbar.middleware.DebugToolbarMiddleware', # DEBUG TOOLBAR
+    )
+
 ROOT_URLCONF = 'mysite.urls'
 
 TEMPLATES = [
@@ -113,6 +122,22 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# Connection pooling (psycopg[pool]) is on unless POSTGRES_POOL_MAX_SIZE=0,
+# otherwise persistent connections are reused for CONN_MAX_AGE seconds
+POSTGRES_POOL_MAX_SIZE = int(getenv('POSTGRES_POOL_MAX_SIZE', 10))
+if POSTGRES_POOL_MAX_SIZE:
+    DB_OPTIONS = {
+        'pool': {
+            'min_size': int(getenv('POSTGRES_POOL_MIN_SIZE', 2)),
+            'max_size': POSTGRES_POOL_MAX_SIZE,
+            'timeout': float(getenv('POSTGRES_POOL_TIMEOUT', 10)),
+        },
+    }
+    CONN_MAX_AGE = 0 # must be 0 when pooling
+else:
+    DB_OPTIONS = {}
+    CONN_MAX_AGE = int(getenv('CONN_MAX_AGE', 60))
+
 DATABASES = { # temp overwritten below
     'default': {
         'ENGINE': 'django.contrib.gis.db.backends.postgis',
@@ -121,6 +146,45 @@ DATABASES = { # temp overwritten below
         'PASSWORD': getenv('POSTGRES_PASSWORD'),
         'HOST': getenv('POSTGRES_HOST', 'db'),
         'PORT': getenv('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': DB_OPTIONS,
+    }
+}
+# Report/rollup reads (mysite.routers.use_replica) - defaults to the primary
+# host so dev and tests work against a single database
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'HOST': getenv('POSTGRES_REPLICA_HOST', DATABASES['default']['HOST']),
+    'PORT': getenv('POSTGRES_REPLICA_PORT', DATABASES['default']['PORT']),
+    'OPTIONS': {**DB_OPTIONS},
+    'TEST': {'MIRROR': 'default'},
+}
+DATABASE_ROUTERS = ['mysite.routers.ReplicaRouter']
+
+# Cache - see core.cache. Data versions must be shared by every worker and
+# incremented atomically: `redis` or `memcached` (locmem is for DEBUG only, a
+# system check enforces this)
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+}
+CACHE_LOCATIONS = { # defaults
+    'locmem': 'lerp',
+    'redis': 'redis://127.0.0.1:6379',
+    'memcached': '127.0.0.1:11211',
+}
+CACHE_BACKEND = getenv('CACHE_BACKEND', 'locmem' if DEBUG else 'redis')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': getenv('CACHE_LOCATION', CACHE_LOCATIONS[CACHE_BACKEND]),
+        'TIMEOUT': 60 * 60,
+        **(
+            {'OPTIONS': {'MAX_ENTRIES': 10_000}}
+            if CACHE_BACKEND == 'locmem' else {}
+        ),
     }
 }
 
@@ -227,6 +291,73 @@ CURRENCIES = (
 
 SRID=4326
 
+# simple-history rows older than this are collapsed by `compact_history`
+HISTORY_COMPACTION_AFTER_DAYS = int(getenv('HISTORY_COMPACTION_AFTER_DAYS', 90))
+HISTORY_COMPACTION_GRANULARITY = getenv('HISTORY_COMPACTION_GRANULARITY', 'day')
+
+# Background jobs - see jobs.queue
+JOBS_WORKER_CONCURRENCY = int(getenv('JOBS_WORKER_CONCURRENCY', 4))
+JOBS_ORG_CONCURRENCY = int(getenv('JOBS_ORG_CONCURRENCY', 2))
+JOBS_MAX_ATTEMPTS = 3
+JOBS_RETRY_BACKOFF = 30 # seconds, doubled on every attempt
+JOBS_HEARTBEAT_TIMEOUT = 300 # seconds without heartbeat before requeue
+
+# `manage.py profile_startup --check` fails above this cold start time
+STARTUP_BUDGET_MS = int(getenv('STARTUP_BUDGET_MS', 3000))
+
+# Query instrumentation (core.queries) - share of requests sampled, 0 to 1
+QUERY_SAMPLE_RATE = float(getenv('QUERY_SAMPLE_RATE', 1 if DEBUG else 0.01))
+QUERY_WARN_COUNT = 50 # queries per request logged as a warning
+QUERY_WARN_DUPLICATES = 5 # same statement repeated, usually an N+1
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.queries': {
+            'handlers': ['console'],
+            'level': getenv('QUERY_LOG_LEVEL', 'INFO' if DEBUG else 'WARNING'),
+        },
+    },
+}
+
+# `manage.py check_query_budgets` - admin changelists, per model label override
+ADMIN_QUERY_BUDGET = 15
+ADMIN_QUERY_BUDGETS = {}
+
+# `manage.py run_benchmarks` appends one JSON line per run here
+BENCHMARK_RESULTS_FILE = getenv(
+    'BENCHMARK_RESULTS_FILE',
+    BASE_DIR / 'benchmark_results.jsonl'
+)
+
+# WebSocket change feed (core.changefeed): `postgres` (LISTEN/NOTIFY, works
+# across processes) or `local` (in-process, single-process dev servers)
+CHANGEFEED_BACKEND = getenv('CHANGEFEED_BACKEND', 'postgres')
+CHANGEFEED_QUEUE_SIZE = 1000 # pending messages per client before a resync
+
+# Offline device sync (core.sync, farmplanning.sync)
+SYNC_PAGE_SIZE = 1000 # change log entries per pull
+SYNC_MAX_BATCH = 500 # offline writes per push
+SYNC_RETENTION_DAYS = int(getenv('SYNC_RETENTION_DAYS', 90))
+
+# Analytics exports (farmplanning.exports) - rows per record batch/row group
+EXPORT_CHUNK_SIZE = int(getenv('EXPORT_CHUNK_SIZE', 50000))
+
+# Crop plan template imports (farmplanning.imports) - sheet rows per transaction
+IMPORT_BATCH_SIZE = int(getenv('IMPORT_BATCH_SIZE', 2000))
+
+# Table partitioning (core.partitioning, `manage.py partitions`)
+PARTITION_ORGANIZATION_BUCKETS = 8 # hash partitions, fixed once converted
+PARTITION_PREMAKE = 2 # seasons/months of partitions created ahead
+PARTITION_ARCHIVE_SCHEMA = 'archive' # detached partitions are moved here
+
+# Compiled per-user permissions (farmplanning.permissions) - seconds
+PERMISSION_CACHE_TIMEOUT = 60 * 60
+
 LEAFLET_CONFIG = {
     "DEFAULT_CENTER": (37.25, -119.5),   # California-ish default (lat, lon)
     "DEFAULT_ZOOM": 8,
@@ -241,7 +372,7 @@ LEAFLET_CONFIG = {
         (
             "MapTiler Satellite",
             "https://api.maptiler.com/tiles/satellite/{z}/{x}/{y}.jpg?key="
-            + getenv('MAP_KEY'),
+            + getenv('MAP_KEY', ''),
             {"attribution": "© MapTiler"}
         ),
     ],
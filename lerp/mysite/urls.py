@@ -35,6 +35,16 @@ urlpatterns = [
 
     path('', include('pages.urls')),
     path('farmplanning/', include('farmplanning.urls')),
+
+    # Organization selection (core.rls) - required by the API and change feed
+    path('api/organization/', include('core.rls')),
+
+    # Async read API - serve through mysite.asgi for concurrency
+    path('api/farmplanning/', include('farmplanning.api')),
+    path('api/realestate/', include('realestate.api')),
+    path('api/resources/', include('resources.api')),
+    path('api/farmplanning/sync/', include('farmplanning.sync')),
+    path('api/search/', include('core.search')),
 ]
 
 if settings.DEBUG:
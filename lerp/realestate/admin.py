@@ -1,6 +1,8 @@
 from django.contrib.gis import admin
 from leaflet.admin import LeafletGeoAdmin
 
+from core.search import SearchAdminMixin
+
 from .models import (
     Ranch,
     Field,
@@ -12,21 +14,24 @@ from .models import (
 # ==============================================================================
 
 @admin.register(FieldState) # consider adding inline in field
-class FieldStateAdmin(admin.ModelAdmin):
-    search_fields = ['field', 'date']
+class FieldStateAdmin(SearchAdminMixin, admin.ModelAdmin):
+    search_fields = ['field__name']
+    search_related = ['field']
 
 @admin.register(Field)
-class FieldAdmin(LeafletGeoAdmin):
-    list_display = ['ranch__name', 'name', 'area', 'ranch__organization__name']
-    search_fields = ['ranch__name', 'name', 'ranch__organization__name']
-    list_filter = ['ranch__organization__name', 'ranch__name']
+class FieldAdmin(SearchAdminMixin, LeafletGeoAdmin):
+    list_display = ['ranch__name', 'name', 'area', 'organization__name']
+    list_select_related = ['ranch', 'organization'] # '__' columns aren't auto-joined
+    search_fields = ['name', 'ranch__name'] # indexed, see core.search
+    search_related = ['ranch']
+    list_filter = ['organization__name', 'ranch__name']
 
 class FieldInLine(admin.TabularInline):
     model = Field
     extra = 3
 
 @admin.register(Ranch)
-class RanchAdmin(LeafletGeoAdmin):
+class RanchAdmin(SearchAdminMixin, LeafletGeoAdmin):
     """
     fieldsets = [
         (None, {'fields': ['name', 'abbreviation']}),
@@ -37,4 +42,4 @@ class RanchAdmin(LeafletGeoAdmin):
     #inlines = [FieldInLine]
     list_display = ['name', 'abbreviation', 'organization'] # 'field_count', 'total_area'] etc.
     list_filter = ['organization']
-    search_fields = ['name'] # TODO this (& filter?) not working with foreignkey (e.g. organization)
+    search_fields = ['name', 'abbreviation'] # indexed, see core.search
@@ -0,0 +1,149 @@
+"""
+Async read endpoints for sites and fields. Geometry is rendered by PostGIS
+(ST_AsGeoJSON) instead of being parsed into GEOS objects in Python.
+"""
+
+from datetime import date
+
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.http import JsonResponse
+from django.urls import path
+
+from core.api import (
+    api_view,
+    conditional,
+    filter_params,
+    page_size,
+    paginated,
+    paginated_rows,
+    param_value,
+    run_sync,
+)
+from realestate.models import Field, FieldState, Ranch
+from realestate.selectors import (
+    field_list,
+    latest_field_states,
+    ranch_list,
+    soil_quality_series,
+)
+
+
+@api_view
+@conditional('sites')
+async def ranches(request):
+    rows = await run_sync(ranch_list, request.organization_id)
+    return paginated_rows(request, rows, Ranch._meta.pk)
+
+@api_view
+@conditional('sites')
+async def fields(request):
+    """ Served from the cached field list unless `?geometry=1` """
+    if request.GET.get('geometry') != '1':
+        ranch_id = (
+            param_value(request, 'ranch', Field._meta.get_field('ranch'))
+            if 'ranch' in request.GET else None
+        )
+        rows = await run_sync(field_list, request.organization_id, ranch_id)
+        return paginated_rows(request, rows, Field._meta.pk)
+
+    queryset = filter_params(
+        request,
+        Field.objects.filter(organization_id=request.organization_id),
+        {'ranch': 'ranch_id'},
+    ).annotate(geojson=AsGeoJSON('mpoly'))
+    return await paginated(
+        request,
+        queryset,
+        ['ranch_id', 'name', 'area', 'accounting_status', 'geojson'],
+    )
+
+@api_view
+@conditional('field_states')
+async def field_states(request):
+    queryset = filter_params(
+        request,
+        FieldState.objects.filter(organization_id=request.organization_id),
+        {'field': 'field_id', 'since': 'date__gte', 'until': 'date__lte'},
+    )
+    return await paginated(
+        request,
+        queryset,
+        ['field_id', 'date', 'soil_quality', 'product_id', 'plant_date'],
+    )
+
+@api_view
+@conditional('sites', 'field_states')
+async def latest_states(request):
+    """ Current state of every field of `?ranch=` """
+    ranch = request.GET.get('ranch', '')
+    if not ranch.isdigit():
+        return JsonResponse({'detail': 'ranch is required'}, status=400)
+
+    states = await run_sync(
+        latest_field_states,
+        request.organization_id,
+        int(ranch),
+    )
+    return JsonResponse({'results': states})
+
+@api_view
+@conditional('sites', 'field_states')
+async def soil_quality(request):
+    """
+    Soil quality over time for charts, one row per field:
+    {"field_id": 3, "dates": [...], "soil_quality": [...]}. Fields come from
+    `?ranch=` or `?fields=1,2,...`, dates are limited by `?since=&until=`;
+    pages go by field id.
+    """
+    try:
+        field_ids = [
+            int(pk) for pk in request.GET.get('fields', '').split(',') if pk
+        ]
+        since, until = (
+            date.fromisoformat(request.GET[param]) if param in request.GET
+            else None
+            for param in ('since', 'until')
+        )
+    except ValueError:
+        return JsonResponse(
+            {'detail': 'fields must be comma separated ids, since/until dates'},
+            status=400,
+        )
+
+    fields = Field.objects.filter(organization_id=request.organization_id)
+    if field_ids:
+        fields = fields.filter(pk__in=field_ids)
+    elif request.GET.get('ranch', '').isdigit():
+        fields = fields.filter(ranch_id=request.GET['ranch'])
+    else:
+        return JsonResponse({'detail': 'ranch or fields is required'}, status=400)
+
+    after = request.GET.get('after', '')
+    if after.isdigit():
+        fields = fields.filter(pk__gt=after)
+
+    limit = page_size(request)
+    field_ids = [
+        pk async for pk in
+        fields.order_by('pk').values_list('pk', flat=True)[:limit]
+    ]
+    rows = [
+        row async for row in soil_quality_series(
+            request.organization_id,
+            field_ids,
+            since,
+            until,
+        )
+    ]
+    return JsonResponse({
+        'results': rows,
+        'next': field_ids[-1] if len(field_ids) == limit else None,
+    })
+
+urlpatterns = [
+    path('ranches/', ranches),
+    path('fields/', fields),
+    path('field-states/', field_states),
+    path('field-states/latest/', latest_states),
+    path('field-states/soil-quality/', soil_quality),
+]
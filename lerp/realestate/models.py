@@ -5,6 +5,11 @@ from django.contrib.gis.db.models.functions import Area
 from datetime import date
 
 from django.conf import settings
+import core.models as core
+from core.cache import register_group
+from core.partitioning import by_time, register_partitioning
+from core.search import register_search, search_indexes
+from core.sync import register_sync
 import organizations.models as orgs
 import accounting.models as accounting
 import resources.models as resources
@@ -38,6 +43,7 @@ class Site(orgs.OrgObject, MPolyAreaObject):
             ('organization', 'name'),
             ('organization', 'abbreviation')
         ]
+        indexes = [*search_indexes('site', ['name', 'abbreviation'])]
 
     name = models.CharField(max_length=25, unique=True)
     abbreviation = models.CharField(max_length=5, unique=True)
@@ -70,10 +76,13 @@ class Ranch(Site):
     class Meta:
         verbose_name_plural = "Ranches"
 
-class Field(MPolyAreaObject):
+class Field(core.InheritedOrgObject, MPolyAreaObject):
     class Meta:
         unique_together = [('ranch', 'name')]
         ordering = ['ranch__name', 'name']
+        indexes = [*search_indexes('field', ['name'])]
+
+    organization_parent = 'ranch'
 
     ranch = models.ForeignKey(Ranch, on_delete=models.PROTECT)
     name = models.CharField(max_length=10)
@@ -86,12 +95,23 @@ class Field(MPolyAreaObject):
     def __str__(self):
         return f'{self.ranch.abbreviation}_{self.name}'
 
-class FieldState(models.Model):
+class FieldState(core.InheritedOrgObject):
     class Meta:
         unique_together = [('field', 'date')]
+        indexes = [
+            # Newest state first per field, covering the state columns so
+            # latest-state and soil quality reads are index-only scans
+            models.Index(
+                fields=['field', '-date'],
+                include=['soil_quality', 'product', 'plant_date'],
+                name='field_state_latest',
+            ),
+        ]
         verbose_name = 'Field State'
         verbose_name_plural = 'Field States'
 
+    organization_parent = 'field'
+
     field = models.ForeignKey(Field, on_delete=models.PROTECT)
     date = models.DateField(default=date.today)
     soil_quality = models.FloatField(
@@ -101,3 +121,25 @@ class FieldState(models.Model):
     )
     product = models.ForeignKey(resources.ProductHiCat, on_delete=models.PROTECT)
     plant_date = models.DateField(blank=True, null=True)
+
+# ==============================================================================
+# Signals
+# ==============================================================================
+
+register_group('sites', Ranch, Field)
+register_group('field_states', FieldState)
+
+# Ranch rows live in the Site table, which carries the indexes
+register_search(Ranch, 'ranch', names=['name', 'abbreviation'])
+register_search(Field, 'field', names=['name'])
+
+# Field states are recorded on offline devices (see core.sync)
+register_sync(
+    FieldState,
+    fields=['field_id', 'date', 'soil_quality', 'product_id', 'plant_date'],
+    writable=['date', 'soil_quality', 'product_id', 'plant_date'],
+    creatable=True,
+    initial=['field_id'],
+)
+
+register_partitioning(FieldState, by_time('date'))
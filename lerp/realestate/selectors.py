@@ -0,0 +1,86 @@
+"""
+Cached reads of ranch and field lists (see core.cache), and field state reads
+served by the field_state_latest index.
+"""
+
+from django.contrib.postgres.aggregates import ArrayAgg
+
+from core.cache import cached
+from realestate.models import Field, FieldState, Ranch
+
+
+def ranch_list(organization_id) -> list:
+    return cached(
+        organization_id,
+        ('sites',),
+        'ranch_list',
+        lambda: list(
+            Ranch.objects
+            .filter(organization_id=organization_id)
+            .order_by('name')
+            .values('pk', 'name', 'abbreviation', 'status', 'area')
+        ),
+    )
+
+def field_list(organization_id, ranch_id=None) -> list:
+    """ Without geometry - fields of one ranch or of the whole organization """
+    fields = Field.objects.filter(organization_id=organization_id)
+    if ranch_id is not None:
+        fields = fields.filter(ranch_id=ranch_id)
+
+    return cached(
+        organization_id,
+        ('sites',),
+        f'field_list:{ranch_id}',
+        lambda: list(
+            fields
+            .order_by('ranch_id', 'name')
+            .values('pk', 'ranch_id', 'name', 'area', 'accounting_status')
+        ),
+    )
+
+def latest_field_states(organization_id, ranch_id) -> list:
+    """ Newest FieldState of every field of a ranch: one DISTINCT ON query """
+    return cached(
+        organization_id,
+        ('sites', 'field_states'),
+        f'latest_field_states:{ranch_id}',
+        lambda: list(
+            FieldState.objects
+            .filter(organization_id=organization_id, field__ranch_id=ranch_id)
+            .order_by('field_id', '-date')
+            .distinct('field_id')
+            .values(
+                'field_id',
+                'date',
+                'soil_quality',
+                'product_id',
+                'plant_date',
+            )
+        ),
+    )
+
+def soil_quality_series(organization_id, field_ids, since=None, until=None):
+    """
+    Queryset of {'field_id', 'dates', 'soil_quality'} with both arrays in
+    date order - one row per field instead of one wide row per state
+    """
+    states = FieldState.objects.filter(
+        organization_id=organization_id,
+        field_id__in=field_ids,
+        soil_quality__isnull=False,
+    )
+    if since is not None:
+        states = states.filter(date__gte=since)
+    if until is not None:
+        states = states.filter(date__lte=until)
+
+    return (
+        states
+        .values('field_id')
+        .annotate(
+            dates=ArrayAgg('date', order_by='date'),
+            soil_quality=ArrayAgg('soil_quality', order_by='date'),
+        )
+        .order_by('field_id')
+    )
@@ -0,0 +1,129 @@
+"""
+Async read endpoints for categories, assets and inventory. Tag filters use the
+denormalized tag index (see resources.tags): `?tags=1,2` (all) / `?any_tags=1,2`.
+"""
+
+from django.core.exceptions import BadRequest
+from django.http import JsonResponse
+from django.urls import path
+
+from core.api import (
+    api_view,
+    conditional,
+    filter_params,
+    paginated,
+    paginated_rows,
+    param_value,
+    run_sync,
+)
+from farmplanning.masking import MaskPolicy
+from farmplanning.permissions import PERMISSIONS_GROUP, request_permissions
+from resources.models import (
+    ActivityHiCat,
+    Asset,
+    LaborHiCat,
+    MaterialHiCat,
+    MaterialInventory,
+    ProductHiCat,
+    ProductInventory,
+)
+from resources.selectors import category_tree
+
+
+CATEGORY_FIELDS = ['name', 'code', 'description', 'parent_id', 'level']
+CATEGORY_MODELS = {
+    'activity': (ActivityHiCat, ['rate_benchmark']),
+    'labor': (LaborHiCat, ['cost_dim', 'cost_per_si_unit']),
+    'material': (MaterialHiCat, ['cost_dim', 'cost_per_si_unit']),
+    'product': (ProductHiCat, ['price_dim', 'price_per_si_unit']),
+}
+
+def tag_param(request, param: str) -> list[int]:
+    try:
+        return [int(pk) for pk in request.GET[param].split(',') if pk]
+    except ValueError:
+        raise BadRequest(f'{param} must be comma separated tag ids')
+
+def tag_filters(request, queryset):
+    if request.GET.get('tags'):
+        queryset = queryset.with_all_tags(tag_param(request, 'tags'))
+    if request.GET.get('any_tags'):
+        queryset = queryset.with_any_tags(tag_param(request, 'any_tags'))
+    return queryset
+
+@api_view
+@conditional('categories', PERMISSIONS_GROUP, per_user=True)
+async def categories(request, kind):
+    if kind not in CATEGORY_MODELS:
+        return JsonResponse({'detail': 'Not found'}, status=404)
+
+    model, extra_fields = CATEGORY_MODELS[kind]
+    perms = await run_sync(
+        request_permissions,
+        request,
+        request.organization_id
+    )
+    fields = MaskPolicy(perms).visible_fields(
+        model,
+        CATEGORY_FIELDS + extra_fields,
+    )
+    rows = await run_sync(
+        category_tree,
+        request.organization_id,
+        model,
+        ['pk', *fields],
+    )
+    if 'parent' in request.GET:
+        parent_field = model._meta.get_field('parent')
+        parent_id = param_value(request, 'parent', parent_field)
+        rows = [row for row in rows if row['parent_id'] == parent_id]
+    return paginated_rows(request, rows, model._meta.pk)
+
+@api_view
+async def assets(request):
+    queryset = tag_filters(
+        request,
+        Asset.objects.filter(organization_id=request.organization_id),
+    )
+    return await paginated(
+        request,
+        queryset,
+        ['asset_id', 'description', 'accounting_status', 'tag_ids'],
+    )
+
+@api_view
+async def material_inventory(request):
+    queryset = filter_params(
+        request,
+        MaterialInventory.objects.filter(
+            organization_id=request.organization_id
+        ),
+        {'category': 'material_category_id'},
+    )
+    return await paginated(
+        request,
+        queryset,
+        ['name', 'amount', 'dimension', 'material_category_id'],
+    )
+
+@api_view
+async def product_inventory(request):
+    queryset = tag_filters(request, filter_params(
+        request,
+        ProductInventory.objects.filter(
+            organization_id=request.organization_id
+        ),
+        {'category': 'product_category_id'},
+    ))
+    return await paginated(
+        request,
+        queryset,
+        ['name', 'amount', 'dimension', 'product_category_id', 'tag_ids'],
+    )
+
+urlpatterns = [
+    path('categories/<str:kind>/', categories),
+    path('assets/', assets),
+    path('material-inventory/', material_inventory),
+    path('product-inventory/', product_inventory),
+]
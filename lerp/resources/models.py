@@ -1,13 +1,28 @@
 from django.db import models
+from django.db.models.signals import m2m_changed, post_delete
+from django.contrib.postgres.indexes import GinIndex
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 from taggit.managers import TaggableManager
+from taggit.models import Tag
 from simple_history.models import HistoricalRecords
 
 from django.conf import settings
 import core.models as core
 import organizations.models as orgs
 import accounting.models as accounting
+from core.cache import register_group
+from core.changefeed import register_channel, register_feed
+from core.partitioning import by_time, register_partitioning
+from core.search import register_search, search_indexes
+from core.sync import register_sync
+from resources.tags import (
+    TagIndexModel,
+    TagIndexQuerySet,
+    remove_deleted_tag,
+    sync_tag_index,
+    tag_ids_field,
+)
 
 
 # ==============================================================================
@@ -18,6 +33,9 @@ class ActivityHiCat(orgs.HierarchicalOrgCode):
     class Meta:
         verbose_name = 'Activity Category'
         verbose_name_plural = 'Activity Categories'
+        indexes = [
+            *search_indexes('activityhicat', ['name', 'code'], ['description'])
+        ]
 
     rate_numerator_dimension = models.CharField(
         help_text='Usually area or length (distance)',
@@ -36,6 +54,14 @@ class ActivityHiCat(orgs.HierarchicalOrgCode):
         null=True
     )
     rate_benchmark = models.FloatField(blank=True, null=True)
+    accounting_activity = models.ForeignKey(
+        accounting.AccountingActivityHiCat,
+        on_delete=models.PROTECT,
+        blank=True,
+        null=True,
+        related_name='+',
+        help_text='Used when posting actuals to accounting',
+    )
 
     """
     '''
@@ -59,6 +85,9 @@ class LaborHiCat(orgs.HierarchicalOrgCode):
     class Meta:
         verbose_name = 'Labor Category'
         verbose_name_plural = 'Labor Categories'
+        indexes = [
+            *search_indexes('laborhicat', ['name', 'code'], ['description'])
+        ]
 
     cost_dim = models.CharField(
         blank=True,
@@ -73,11 +102,22 @@ class LaborHiCat(orgs.HierarchicalOrgCode):
         validators=[MinValueValidator(0)],
         verbose_name='Cost per SI unit',
     )
+    accounting_bucket = models.ForeignKey(
+        accounting.AccountingBucketHiCat,
+        on_delete=models.PROTECT,
+        blank=True,
+        null=True,
+        related_name='+',
+        help_text='Used when posting actuals to accounting',
+    )
 
 class MaterialHiCat(orgs.HierarchicalOrgCode):
     class Meta:
         verbose_name = 'Material Category'
         verbose_name_plural = 'Material Categories'
+        indexes = [
+            *search_indexes('materialhicat', ['name', 'code'], ['description'])
+        ]
 
     cost_dim = models.CharField(
         blank=True,
@@ -91,11 +131,22 @@ class MaterialHiCat(orgs.HierarchicalOrgCode):
         validators=[MinValueValidator(0)],
         verbose_name='Cost per SI unit',
     )
+    accounting_bucket = models.ForeignKey(
+        accounting.AccountingBucketHiCat,
+        on_delete=models.PROTECT,
+        blank=True,
+        null=True,
+        related_name='+',
+        help_text='Used when posting actuals to accounting',
+    )
 
 class ProductHiCat(orgs.HierarchicalOrgCode):
     class Meta:
         verbose_name = 'Product Category'
         verbose_name_plural = 'Product Categories'
+        indexes = [
+            *search_indexes('producthicat', ['name', 'code'], ['description'])
+        ]
 
     price_dim = models.CharField(
         blank=True,
@@ -128,13 +179,30 @@ class AssetABC(orgs.OrgObject):
         choices=accounting.AccountingStatus,
         default=accounting.AccountingStatus.RENTED
     )
+    accounting_bucket = models.ForeignKey(
+        accounting.AccountingBucketHiCat,
+        on_delete=models.PROTECT,
+        blank=True,
+        null=True,
+        related_name='+',
+        help_text='Used when posting actuals to accounting',
+    )
 
     def __str__(self):
         return self.asset_id
 
-class Asset(AssetABC):
+class Asset(TagIndexModel, AssetABC):
+    class Meta(AssetABC.Meta):
+        indexes = [
+            GinIndex(fields=['tag_ids'], name='asset_tag_ids_gin'),
+            *search_indexes('asset', ['asset_id'], ['description']),
+        ]
+
     #name = models.CharField(max_length=settings.DEFAULT_MAX_CHAR)
     tags = TaggableManager(blank=True)
+    tag_ids = tag_ids_field() # denormalized from tags, see resources.tags
+
+    objects = TagIndexQuerySet.as_manager()
 
 class Inventory(models.Model):
     class Meta:
@@ -149,10 +217,13 @@ class Inventory(models.Model):
     )
     description = models.TextField(blank=True, null=True)
 
-class MaterialInventory(Inventory):
+class MaterialInventory(core.InheritedOrgObject, Inventory):
+    organization_parent = 'material_category'
+
     class Meta:
         verbose_name = 'Material Inventory'
         verbose_name_plural = 'Material Inventories'
+        indexes = [*search_indexes('matinv', ['name'], ['description'])]
 
     material_category = models.ForeignKey(
         MaterialHiCat,
@@ -160,15 +231,105 @@ class MaterialInventory(Inventory):
     )
     history = HistoricalRecords()
 
-class ProductInventory(Inventory):
+class ProductInventory(core.InheritedOrgObject, TagIndexModel, Inventory):
+    organization_parent = 'product_category'
+
     class Meta:
         verbose_name = 'Product Inventory'
         verbose_name_plural = 'Product Inventories'
+        indexes = [
+            GinIndex(fields=['tag_ids'], name='prodinv_tag_ids_gin'),
+            *search_indexes('prodinv', ['name'], ['description']),
+        ]
 
     product_category = models.ForeignKey(ProductHiCat, on_delete=models.PROTECT)
     tags = TaggableManager(blank=True)
+    tag_ids = tag_ids_field() # denormalized from tags, see resources.tags
+
+    objects = TagIndexQuerySet.as_manager()
 
     history = HistoricalRecords()
 
     def __str__(self):
         return self.name
+
+# ==============================================================================
+# Signals
+# ==============================================================================
+
+# taggit sends m2m_changed with its through model as sender for every model
+m2m_changed.connect(sync_tag_index, dispatch_uid='resources_sync_tag_index')
+post_delete.connect(
+    remove_deleted_tag,
+    sender=Tag,
+    dispatch_uid='resources_remove_deleted_tag'
+)
+
+register_group('categories', ActivityHiCat, LaborHiCat, MaterialHiCat, ProductHiCat)
+
+register_search(
+    ActivityHiCat,
+    'activity_category',
+    names=['name', 'code'],
+    texts=['description'],
+)
+register_search(
+    LaborHiCat,
+    'labor_category',
+    names=['name', 'code'],
+    texts=['description'],
+)
+register_search(
+    MaterialHiCat,
+    'material_category',
+    names=['name', 'code'],
+    texts=['description'],
+)
+register_search(
+    ProductHiCat,
+    'product_category',
+    names=['name', 'code'],
+    texts=['description'],
+)
+register_search(Asset, 'asset', names=['asset_id'], texts=['description'])
+register_search(
+    MaterialInventory,
+    'material_inventory',
+    names=['name'],
+    texts=['description'],
+)
+register_search(
+    ProductInventory,
+    'product_inventory',
+    names=['name'],
+    texts=['description'],
+)
+
+# Inventory deltas go to every member of the organization (core.changefeed)
+register_channel('inventory', lambda user, organization_id, container_id: True)
+register_feed(
+    MaterialInventory,
+    'inventory',
+    lambda inventory: '',
+    fields=['name', 'amount', 'dimension', 'material_category_id'],
+)
+register_feed(
+    ProductInventory,
+    'inventory',
+    lambda inventory: '',
+    fields=['name', 'amount', 'dimension', 'product_category_id'],
+)
+
+register_sync(
+    MaterialInventory,
+    fields=['name', 'amount', 'dimension', 'material_category_id'],
+    writable=['amount'],
+)
+register_sync(
+    ProductInventory,
+    fields=['name', 'amount', 'dimension', 'product_category_id'],
+    writable=['amount'],
+)
+
+register_partitioning(MaterialInventory.history.model, by_time('history_date'))
+register_partitioning(ProductInventory.history.model, by_time('history_date'))
@@ -0,0 +1,32 @@
+"""
+Cached reads of organization category trees (see core.cache).
+"""
+
+from core.cache import cached
+
+
+CATEGORY_TREE_FIELDS = [
+    'pk',
+    'name',
+    'code',
+    'description',
+    'parent_id',
+    'level',
+    'tree_id',
+    'lft',
+    'rght',
+]
+
+def category_tree(organization_id, model, fields=CATEGORY_TREE_FIELDS) -> list:
+    """ Every category of `model`, in tree (depth-first) order """
+    return cached(
+        organization_id,
+        ('categories',),
+        f'category_tree:{model._meta.label_lower}:{",".join(fields)}',
+        lambda: list(
+            model.objects
+            .filter(organization_id=organization_id)
+            .order_by('tree_id', 'lft')
+            .values(*fields)
+        ),
+    )
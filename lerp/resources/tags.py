@@ -0,0 +1,138 @@
+"""
+# Tag Index
+taggit stores tags through a generic relation, so every tag filter is a join on
+taggit_taggeditem + content type. Models using TagIndexQuerySet keep a sorted
+copy of their tag ids in `tag_ids` (GIN indexed) which turns:
+    - AND filters into `tag_ids @> ARRAY[...]`
+    - OR filters into `tag_ids && ARRAY[...]`
+    - facet counts into a single unnest/GROUP BY over the filtered set
+
+`tag_ids` is kept in sync by `sync_tag_index` (taggit sends m2m_changed on every
+add/remove/set/clear) and `remove_deleted_tag` (deleting a Tag cascades to its
+TaggedItems without m2m_changed). Anything that writes taggit_taggeditem
+directly must call `rebuild_tag_index` afterwards.
+
+Models inherit TagIndexModel so regular saves never write `tag_ids`: an
+instance loaded before a tag change would write the stale array back.
+"""
+
+from django.apps import apps
+from django.db import connections, models
+from django.db.models import F, Func, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.fields import ArrayField
+
+from taggit.models import Tag, TaggedItem
+
+
+def tag_id_list(tags) -> list[int]:
+    """ Accepts Tag instances or ids """
+    return sorted({tag.pk if isinstance(tag, Tag) else int(tag) for tag in tags})
+
+def tag_ids_for_names(names) -> list[int]:
+    return sorted(Tag.objects.filter(name__in=names).values_list('pk', flat=True))
+
+class TagIndexQuerySet(models.QuerySet):
+    def with_all_tags(self, tags):
+        """ AND filter """
+        return self.filter(tag_ids__contains=tag_id_list(tags))
+
+    def with_any_tags(self, tags):
+        """ OR filter """
+        return self.filter(tag_ids__overlap=tag_id_list(tags))
+
+    def tag_facets(self) -> list[tuple[int, str, int]]:
+        """
+        Returns (tag_id, tag_name, count) for every tag in the filtered set,
+        most common first, in one query.
+        """
+        subquery, params = (
+            self.order_by().values('tag_ids').query.sql_with_params()
+        )
+        sql = (
+            'SELECT t.tag_id, tag.name, count(*) AS n '
+            f'FROM ({subquery}) AS s '
+            'CROSS JOIN LATERAL unnest(s.tag_ids) AS t(tag_id) '
+            f'JOIN {Tag._meta.db_table} AS tag ON tag.id = t.tag_id '
+            'GROUP BY t.tag_id, tag.name '
+            'ORDER BY n DESC, tag.name'
+        )
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+class TagIndexModel(models.Model):
+    """ Declare `tag_ids = tag_ids_field()` and `tags` on the model """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key
+                ]
+            kwargs['update_fields'] = [
+                name for name in update_fields if name != 'tag_ids'
+            ]
+
+        super().save(*args, **kwargs)
+
+def tag_ids_field():
+    return ArrayField(
+        models.IntegerField(),
+        default=list,
+        blank=True,
+        editable=False,
+    )
+
+def refresh_tag_index(instance):
+    tag_ids = sorted(instance.tags.values_list('pk', flat=True))
+    type(instance)._base_manager.filter(pk=instance.pk).update(tag_ids=tag_ids)
+    instance.tag_ids = tag_ids
+
+def rebuild_tag_index(model) -> int:
+    """ Recomputes `tag_ids` for every row of `model` in one UPDATE """
+    content_type = ContentType.objects.get_for_model(model)
+    tagged = (
+        TaggedItem.objects
+        .filter(content_type=content_type, object_id=OuterRef('pk'))
+        .values('object_id')
+        .annotate(ids=ArrayAgg('tag_id', order_by='tag_id'))
+        .values('ids')
+    )
+    return model._base_manager.update(
+        tag_ids=Coalesce(
+            Subquery(tagged),
+            Value([]),
+            output_field=ArrayField(models.IntegerField()),
+        )
+    )
+
+def sync_tag_index(sender, instance, action, reverse, **kwargs):
+    """ m2m_changed receiver for taggit's through model """
+    if reverse or action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not hasattr(instance, 'tag_ids'):
+        return
+
+    refresh_tag_index(instance)
+
+def remove_deleted_tag(sender, instance, **kwargs):
+    """ post_delete receiver for Tag, one UPDATE per tag-indexed model """
+    for model in apps.get_models():
+        if not issubclass(model, TagIndexModel):
+            continue
+        model._base_manager.filter(tag_ids__contains=[instance.pk]).update(
+            tag_ids=Func(
+                F('tag_ids'),
+                Value(instance.pk),
+                function='array_remove',
+                output_field=ArrayField(models.IntegerField()),
+            )
+        )